@@ -3,16 +3,28 @@ Client Azure ML pour l'inférence du modèle CLIP
 Application de classification de produits avec prétraitement identique au notebook
 """
 
+from __future__ import annotations
+
 import os
 import json
 import base64
-import requests
 import re
-import streamlit as st
-from PIL import Image
 import io
+import time
+import threading
 from typing import Dict, Any
 
+from lazy_imports import lazy_import
+from client_metrics import get_client_metrics, timed_stage
+from trace_logging import current_trace, emit_trace, request_headers, trace_prediction
+from rerun_profiler import profiled
+from payload_codec import PayloadNegotiator, wire_bytes
+
+# Modules lourds importés à la première utilisation (démarrage plus rapide des pages et des outils)
+requests = lazy_import('requests')
+st = lazy_import('streamlit')
+Image = lazy_import('PIL.Image')
+
 class AzureMLClient:
     """
     Client pour interagir avec l'API Azure ML PyTorch
@@ -51,11 +63,35 @@ class AzureMLClient:
         # Vérifier que c'est bien un endpoint PyTorch
         self.is_pytorch = True  # Maintenant on utilise PyTorch
         
+        # Backend d'inférence : 'azure' (endpoint cloud) ou 'local' (modèle fine-tuné sur CPU, sans réseau)
+        self.backend = os.getenv('CLIP_INFERENCE_BACKEND', 'azure').lower()
+        
+        # Cascade de niveaux locaux devant le modèle complet (PREDICTION_CASCADE, désactivée par défaut)
+        from prediction_cascade import create_cascade
+        self.cascade = create_cascade()
+        
+        # Sonde de santé de l'endpoint et préchauffage (démarrés seulement pour le client partagé de l'application)
+        self.health = None
+        self.warmup = None
+        # Session HTTP créée au premier appel (préchauffage, sonde ou prédiction, éventuellement concurrents)
+        self._session = None
+        self._session_lock = threading.Lock()
+        
+        # Négociation des encodages avec l'endpoint (compression des requêtes, format des résultats)
+        self.codec = PayloadNegotiator()
+        
+        # Enregistrement anonymisé du trafic pour le rejouer hors ligne (TRAFFIC_RECORD_FILE, désactivé par défaut)
+        from traffic_recorder import create_traffic_recorder
+        self.recorder = create_traffic_recorder()
+        
         # Afficher le statut de la configuration
         if show_warning:
             st.success("✅ Client Azure ML initialisé - Modèle PyTorch finetuné")
             st.info(f"🔗 Endpoint: {self.endpoint_url}")
             st.info(f"🎯 Source: {self.config_source}")
+            if self.backend == 'local':
+                st.info("💻 Backend: modèle CLIP local (CPU)")
+    @timed_stage('image_preprocessing')
     def _preprocess_image_like_notebook(self, image: Image.Image) -> Image.Image:
         """
         Prétraitement de l'image identique au notebook (extract_image_features)
@@ -66,6 +102,16 @@ class AzureMLClient:
         Returns:
             Image.Image: Image prétraitée
         """
+        processed_image = self._resize_like_notebook(image)
+        # Déposée sur la trace de la requête : l'empreinte du contenu est calculée sur cette image réduite
+        trace = current_trace()
+        if trace is not None:
+            trace.processed_image = processed_image
+        return processed_image
+    
+    @staticmethod
+    def _resize_like_notebook(image: Image.Image) -> Image.Image:
+        """Conversion RGB et réduction à 128 pixels maximum (sans mesure ni trace)"""
         try:
             # Convertir en RGB si nécessaire
             if image.mode != 'RGB':
@@ -83,7 +129,8 @@ class AzureMLClient:
             print(f"⚠️ Erreur prétraitement image: {str(e)}")
             return image
     
-    def _process_specs_like_notebook(self, spec_string: str) -> str:
+    @staticmethod
+    def _process_specs_like_notebook(spec_string: str) -> str:
         """
         Nettoyage des spécifications identique au notebook (process_specs function)
         
@@ -102,7 +149,8 @@ class AzureMLClient:
         # Créer la chaîne nettoyée
         return ". ".join(f"{k.strip().lower()} {v.strip().lower()}" for k, v in matches if k.strip() and v.strip())
     
-    def _clean_text_like_notebook(self, text: str) -> str:
+    @staticmethod
+    def _clean_text_like_notebook(text: str) -> str:
         """
         Nettoyage du texte identique au notebook (clean_text function)
         Applique des centaines de règles de nettoyage pour normaliser le texte
@@ -200,7 +248,8 @@ class AzureMLClient:
         
         return text
     
-    def _extract_keywords_like_notebook(self, text: str, top_n: int = 15) -> list:
+    @staticmethod
+    def _extract_keywords_like_notebook(text: str, top_n: int = 15) -> list:
         """
         Extraction des mots-clés identique au notebook (extract_keywords function)
         
@@ -277,10 +326,28 @@ class AzureMLClient:
         # Retourner les mots les plus fréquents
         return [word for word, count in word_counts.most_common(top_n)]
     
+    @timed_stage('text_preprocessing')
     def _preprocess_text_like_notebook(self, brand: str, product_name: str, description: str, specifications: str) -> str:
         """
         Prétraitement du texte identique au notebook (combined_text format)
         
+        Args:
+            brand (str): Marque du produit
+            product_name (str): Nom du produit
+            description (str): Description du produit
+            specifications (str): Spécifications du produit
+            
+        Returns:
+            str: Texte prétraité sous forme de mots-clés
+        """
+        return self._keywords_like_notebook(brand, product_name, description, specifications)
+    
+    @staticmethod
+    def _keywords_like_notebook(brand: str, product_name: str, description: str, specifications: str) -> str:
+        """
+        Mots-clés d'un produit comme dans le notebook, sans instance du client ni mesure d'étape
+        (utilisé aussi pour compter les mots-clés de tout le catalogue, voir keyword_engine)
+        
         Args:
             brand (str): Marque du produit
             product_name (str): Nom du produit
@@ -292,7 +359,7 @@ class AzureMLClient:
         """
         try:
             # Nettoyer les spécifications comme dans le notebook
-            cleaned_specs = self._process_specs_like_notebook(specifications)
+            cleaned_specs = AzureMLClient._process_specs_like_notebook(specifications)
             
             # Créer le combined_text identique au notebook
             # Ne pas inclure "Marque non spécifiée" dans le texte de prédiction
@@ -305,10 +372,10 @@ class AzureMLClient:
             )
             
             # Appliquer le nettoyage identique au notebook
-            processed_text = self._clean_text_like_notebook(combined_text)
+            processed_text = AzureMLClient._clean_text_like_notebook(combined_text)
             
             # Extraire les mots-clés comme dans le notebook
-            keywords = self._extract_keywords_like_notebook(processed_text)
+            keywords = AzureMLClient._extract_keywords_like_notebook(processed_text)
             
             # Retourner les mots-clés sous forme de chaîne
             return ", ".join(keywords) if keywords else "no_keywords_found"
@@ -317,6 +384,7 @@ class AzureMLClient:
             print(f"⚠️ Erreur prétraitement texte: {str(e)}")
             return f"{brand} {product_name} {description} {specifications}"
     
+    @timed_stage('keywords')
     def _predict_local_keywords(self, brand: str, product_name: str, description: str, specifications: str) -> Dict[str, Any]:
         """
         Prédiction locale basée sur l'analyse des mots-clés
@@ -421,6 +489,187 @@ class AzureMLClient:
                 'source': 'local_prediction_exception'
             }
     
+    @timed_stage('prototypes')
+    def _predict_prototypes(self, image: Image.Image, brand: str, product_name: str, description: str, specifications: str):
+        """
+        Pré-filtre par prototypes des catégories (un produit matrice-vecteur 7 x D)
+        
+        Args:
+            image (Image.Image): Image du produit
+            brand (str): Marque du produit
+            product_name (str): Nom du produit
+            description (str): Description du produit
+            specifications (str): Spécifications du produit
+            
+        Returns:
+            Dict[str, Any]: Résultat avec l'écart top-2 ('margin'), ou None si les prototypes manquent
+        """
+        try:
+            from category_prototypes import predict_prototypes
+            from local_clip_engine import get_local_clip_engine
+            
+            return predict_prototypes(get_local_clip_engine(), image, brand, product_name, description, specifications)
+        except Exception as e:
+            print(f"⚠️ Erreur du pré-filtre par prototypes: {str(e)}")
+            return None
+    
+    @timed_stage('knn')
+    def _predict_knn(self, image: Image.Image, brand: str, product_name: str, description: str, specifications: str):
+        """
+        Niveau de repli kNN : vote des produits du catalogue les plus proches (confiance calibrée)
+        
+        Args:
+            image (Image.Image): Image du produit
+            brand (str): Marque du produit
+            product_name (str): Nom du produit
+            description (str): Description du produit
+            specifications (str): Spécifications du produit
+            
+        Returns:
+            Dict[str, Any]: Résultat de la prédiction, ou None si le magasin d'embeddings ou le modèle local manque
+        """
+        try:
+            from knn_classifier import predict_knn
+            from local_clip_engine import get_local_clip_engine
+            
+            return predict_knn(get_local_clip_engine(), image, brand, product_name, description, specifications)
+        except Exception as e:
+            print(f"⚠️ Erreur du niveau kNN: {str(e)}")
+            return None
+    
+    @timed_stage('serialization')
+    def _encode_score_payload(self, processed_image: Image.Image, brand: str, product_name: str, description: str, specifications: str) -> bytes:
+        """
+        Sérialiser une requête /score (JPEG en base64 dans un corps JSON, format identique au notebook)
+        
+        Args:
+            processed_image (Image.Image): Image déjà prétraitée
+            brand (str): Marque du produit
+            product_name (str): Nom du produit
+            description (str): Description du produit
+            specifications (str): Spécifications du produit
+            
+        Returns:
+            bytes: Corps JSON de la requête
+        """
+        # Convertir l'image en base64
+        buffer = io.BytesIO()
+        processed_image.save(buffer, format='JPEG', quality=85)
+        img_bytes = buffer.getvalue()
+        image_base64 = base64.b64encode(img_bytes).decode('utf-8')
+        
+        # Préparer les données pour l'API PyTorch (format identique au notebook)
+        data = {
+            'image': image_base64,
+            'brand': brand,
+            'product_name': product_name,
+            'description': description,
+            'specifications': specifications
+        }
+        body = json.dumps(data).encode('utf-8')
+        trace = current_trace()
+        if trace is not None:
+            trace.set(payload_bytes=len(body))
+        return body
+    
+    def _send_score(self, body: bytes):
+        """
+        Envoyer un corps JSON déjà sérialisé à l'endpoint /score (compressé en gzip si l'endpoint l'accepte)
+        
+        Args:
+            body (bytes): Corps JSON de la requête
+            
+        Returns:
+            requests.Response: Réponse HTTP de l'endpoint
+        """
+        metrics = get_client_metrics()
+        compressed = self.codec.should_compress(len(body))
+        wire_body = body
+        if compressed:
+            with metrics.span('compression'):
+                wire_body = self.codec.compress(body)
+        
+        response = self._post_body(wire_body, compressed)
+        if compressed and response.status_code == 415:
+            # Corps compressé refusé : renvoyer le corps brut (la négociation ne compressera plus)
+            compressed, wire_body = False, body
+            response = self._post_body(wire_body, compressed)
+        
+        # Octets réellement transférés et octets économisés par la compression, dans chaque sens
+        request_encoding = 'gzip' if compressed else 'identity'
+        response_encoding = response.headers.get('Content-Encoding', 'identity')
+        received = wire_bytes(response)
+        metrics.increment('request_bytes', len(wire_body), encoding=request_encoding)
+        metrics.increment('response_bytes', received, encoding=response_encoding)
+        if compressed:
+            metrics.increment('bytes_saved', len(body) - len(wire_body), direction='request')
+        if len(response.content) > received:
+            metrics.increment('bytes_saved', len(response.content) - received, direction='response')
+        
+        trace = current_trace()
+        if trace is not None:
+            trace.set(
+                http_status=response.status_code, response_bytes=received, payload_wire_bytes=len(wire_body),
+                request_encoding=request_encoding, response_encoding=response_encoding
+            )
+        return response
+    
+    @timed_stage('http')
+    def _post_body(self, wire_body: bytes, compressed: bool):
+        """
+        Requête HTTP vers /score avec les en-têtes de négociation
+        
+        Args:
+            wire_body (bytes): Corps envoyé tel quel
+            compressed (bool): Le corps est compressé en gzip
+            
+        Returns:
+            requests.Response: Réponse HTTP de l'endpoint
+        """
+        # Appel à l'API Azure ML PyTorch (identifiant de requête transmis pour corréler avec les logs du serveur)
+        response = self._http_session().post(
+            self.endpoint_url,
+            data=wire_body,
+            headers={**self.codec.headers(compressed), **request_headers()},
+            timeout=30
+        )
+        self.codec.observe_response(response, compressed)
+        return response
+    
+    def _decode_score_response(self, response) -> Dict[str, Any]:
+        """
+        Décoder une réponse /score (JSON, format binaire compact ou msgpack selon le Content-Type)
+        
+        Args:
+            response (requests.Response): Réponse HTTP de l'endpoint
+            
+        Returns:
+            Dict[str, Any]: Réponse décodée
+        """
+        result = self.codec.decode(response)
+        content_type = response.headers.get('Content-Type', 'application/json').split(';')[0].strip()
+        get_client_metrics().increment('responses', content_type=content_type)
+        return result
+    
+    def _post_score(self, image: Image.Image, brand: str, product_name: str, description: str, specifications: str):
+        """
+        Appel brut à l'endpoint /score (sans repli)
+        
+        Args:
+            image (Image.Image): Image du produit
+            brand (str): Marque du produit
+            product_name (str): Nom du produit
+            description (str): Description du produit
+            specifications (str): Spécifications du produit
+            
+        Returns:
+            requests.Response: Réponse HTTP de l'endpoint
+        """
+        # Prétraiter l'image comme dans le notebook
+        processed_image = self._preprocess_image_like_notebook(image)
+        body = self._encode_score_payload(processed_image, brand, product_name, description, specifications)
+        return self._send_score(body)
+    
     def _predict_azure(self, image: Image.Image, brand: str, product_name: str, description: str, specifications: str) -> Dict[str, Any]:
         """
         Prédiction via l'endpoint Azure ML PyTorch (modèle finetuné réel)
@@ -435,35 +684,23 @@ class AzureMLClient:
         Returns:
             Dict[str, Any]: Résultat de la prédiction
         """
-        try:
-            # Prétraiter l'image comme dans le notebook
-            processed_image = self._preprocess_image_like_notebook(image)
-            
-            # Convertir l'image en base64
-            buffer = io.BytesIO()
-            processed_image.save(buffer, format='JPEG', quality=85)
-            img_bytes = buffer.getvalue()
-            image_base64 = base64.b64encode(img_bytes).decode('utf-8')
-            
-            # Préparer les données pour l'API PyTorch (format identique au notebook)
-            data = {
-                'image': image_base64,
-                'brand': brand,
-                'product_name': product_name,
-                'description': description,
-                'specifications': specifications
+        # Endpoint connu comme hors service par la sonde : repli immédiat, sans attendre le délai HTTP
+        # ni signaler un nouvel échec (seuls les vrais appels à /score réveillent la sonde)
+        if self.endpoint_known_down():
+            get_client_metrics().increment('errors', stage='http', error='endpoint_down')
+            error = {
+                'success': False,
+                'error': f"Erreur lors de la prédiction Azure ML: endpoint hors service selon la sonde de santé ({self.health.last_error or self.health.last_status_code})",
+                'source': 'azure_ml_exception'
             }
-            
-            # Appel à l'API Azure ML PyTorch
-            response = requests.post(
-                self.endpoint_url,
-                json=data,
-                headers={'Content-Type': 'application/json'},
-                timeout=30
-            )
+            return self._fallback_after_error(error, image, brand, product_name, description, specifications)
+        
+        try:
+            response = self._post_score(image, brand, product_name, description, specifications)
             
             if response.status_code == 200:
-                result = response.json()
+                with get_client_metrics().span('parsing'):
+                    result = self._decode_score_response(response)
                 
                 # Vérifier si c'est une réponse PyTorch réelle
                 if result.get('source') == 'azure_ml_pytorch_real':
@@ -476,28 +713,40 @@ class AzureMLClient:
                         'message': result.get('message', 'Prédiction réalisée avec le modèle PyTorch CLIP fine-tuné')
                     }
                 else:
-                    # Fallback vers l'analyse locale si nécessaire
-                    st.info("ℹ️ Utilisation de l'analyse intelligente des mots-clés (identique au notebook)")
-                    return self._predict_local_keywords(brand, product_name, description, specifications)
+                    # Fallback vers le vote kNN, puis vers l'analyse locale si nécessaire
+                    fallback_reason = f"Réponse de l'endpoint non fine-tunée (source: {result.get('source')})"
+                    knn_result = self._predict_knn(image, brand, product_name, description, specifications)
+                    if knn_result is None:
+                        st.info("ℹ️ Utilisation de l'analyse intelligente des mots-clés (identique au notebook)")
+                        knn_result = self._predict_local_keywords(brand, product_name, description, specifications)
+                    knn_result['fallback_reason'] = fallback_reason
+                    return knn_result
             else:
-                return {
+                get_client_metrics().increment('errors', stage='http', error=f'status_{response.status_code}')
+                self._report_endpoint_failure()
+                error = {
                     'success': False,
                     'error': f'Erreur API: {response.status_code} - {response.text}',
                     'source': 'azure_ml_error'
                 }
                 
         except Exception as e:
-            return {
+            self._report_endpoint_failure()
+            error = {
                 'success': False,
                 'error': f'Erreur lors de la prédiction Azure ML: {str(e)}',
                 'source': 'azure_ml_exception'
             }
+        
+        return self._fallback_after_error(error, image, brand, product_name, description, specifications)
     
-    def predict_category(self, image: Image.Image, brand: str, product_name: str, description: str, specifications: str) -> Dict[str, Any]:
+    def _fallback_after_error(self, error: Dict[str, Any], image: Image.Image, brand: str, product_name: str,
+                              description: str, specifications: str) -> Dict[str, Any]:
         """
-        Prédiction de catégorie de produit via Azure ML PyTorch
+        Endpoint indisponible : repli sur le vote kNN s'il est disponible, sinon l'erreur elle-même
         
         Args:
+            error (Dict[str, Any]): Résultat d'erreur de l'appel Azure ML
             image (Image.Image): Image du produit
             brand (str): Marque du produit
             product_name (str): Nom du produit
@@ -505,18 +754,181 @@ class AzureMLClient:
             specifications (str): Spécifications du produit
             
         Returns:
-            Dict[str, Any]: Résultat de la prédiction avec catégorie et confiance
+            Dict[str, Any]: Résultat du vote kNN (avec fallback_reason) ou erreur
+        """
+        knn_result = self._predict_knn(image, brand, product_name, description, specifications)
+        if knn_result is not None:
+            knn_result['fallback_reason'] = error['error']
+            return knn_result
+        return error
+    
+    @timed_stage('local_inference')
+    def _predict_local_clip(self, image: Image.Image, brand: str, product_name: str, description: str, specifications: str) -> Dict[str, Any]:
         """
+        Prédiction avec le modèle CLIP fine-tuné exécuté localement (sans aller-retour HTTP)
+        Les appels concurrents des sessions sont regroupés en micro-lots par l'ordonnanceur partagé
+        
+        Args:
+            image (Image.Image): Image du produit
+            brand (str): Marque du produit
+            product_name (str): Nom du produit
+            description (str): Description du produit
+            specifications (str): Spécifications du produit
+            
+        Returns:
+            Dict[str, Any]: Résultat de la prédiction
+        """
+        from batch_scheduler import get_batch_scheduler
+        
+        scheduler = get_batch_scheduler()
+        if not scheduler.engine.is_available():
+            print(f"⚠️ Modèle CLIP local indisponible ({scheduler.engine.model_path}), analyse des mots-clés")
+            result = self._predict_local_keywords(brand, product_name, description, specifications)
+            result['fallback_reason'] = f'Modèle CLIP local indisponible ({scheduler.engine.model_path})'
+            return result
+        
+        result = scheduler.predict_category(image, brand, product_name, description, specifications)
+        if not result.get('success'):
+            print(f"⚠️ {result.get('error')}")
+            fallback_reason = result.get('error')
+            result = self._predict_local_keywords(brand, product_name, description, specifications)
+            result['fallback_reason'] = fallback_reason
+        return result
+    
+    def _predict_full_model(self, image: Image.Image, brand: str, product_name: str, description: str, specifications: str) -> Dict[str, Any]:
+        """
+        Prédiction par le modèle CLIP complet (dernier niveau de la cascade)
+        
+        Args:
+            image (Image.Image): Image du produit
+            brand (str): Marque du produit
+            product_name (str): Nom du produit
+            description (str): Description du produit
+            specifications (str): Spécifications du produit
+            
+        Returns:
+            Dict[str, Any]: Résultat de la prédiction
+        """
+        if self.backend == 'local':
+            return self._predict_local_clip(image, brand, product_name, description, specifications)
+        
         # Utiliser exclusivement l'endpoint Azure ML PyTorch
         return self._predict_azure(image, brand, product_name, description, specifications)
     
+    @profiled('predict_category')
+    def predict_category(self, image: Image.Image, brand: str, product_name: str, description: str, specifications: str) -> Dict[str, Any]:
+        """
+        Prédiction de catégorie de produit via Azure ML PyTorch (ou le modèle local si CLIP_INFERENCE_BACKEND=local)
+        
+        Args:
+            image (Image.Image): Image du produit
+            brand (str): Marque du produit
+            product_name (str): Nom du produit
+            description (str): Description du produit
+            specifications (str): Spécifications du produit
+            
+        Returns:
+            Dict[str, Any]: Résultat de la prédiction avec catégorie et confiance
+        """
+        metrics = get_client_metrics()
+        arrival = self.recorder.arrival() if self.recorder is not None else None
+        with trace_prediction() as trace:
+            # Empreinte sur l'image réduite même si la réponse vient d'un niveau sans prétraitement (kNN, erreur)
+            trace.preprocess_image = self._resize_like_notebook
+            with metrics.span('total'):
+                # Cascade : les niveaux locaux suffisamment sûrs répondent, les cas ambigus sont escaladés
+                if self.cascade.enabled:
+                    result = self.cascade.predict(self, image, brand, product_name, description, specifications)
+                else:
+                    result = self._predict_full_model(image, brand, product_name, description, specifications)
+            
+            result['request_id'] = trace.request_id
+            metrics.increment('predictions', source=result.get('source', 'unknown'), success=bool(result.get('success')))
+            emit_trace(trace, result, image, (brand, product_name, description, specifications))
+            if self.recorder is not None:
+                self.recorder.record(arrival, trace, result, image, (brand, product_name, description, specifications))
+        return result
+    
+    def _http_session(self):
+        """
+        Session HTTP partagée : connexions TCP/TLS gardées ouvertes et réutilisées entre les requêtes
+        
+        Returns:
+            requests.Session: Session avec un pool de HTTP_POOL_SIZE connexions
+        """
+        if self._session is None:
+            with self._session_lock:
+                # Revérifié sous le verrou : le préchauffage et la sonde partagent une seule session
+                if self._session is None:
+                    session = requests.Session()
+                    pool_size = int(os.getenv('HTTP_POOL_SIZE', '10'))
+                    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    self._session = session
+        return self._session
+    
+    def start_warmup(self):
+        """
+        Préchauffer le client en arrière-plan (DNS, connexions et /health, ou chargement du modèle local)
+        """
+        from client_warmup import ClientWarmup
+        
+        if self.warmup is None:
+            engine = None
+            if self.backend == 'local':
+                from batch_scheduler import get_batch_scheduler
+                engine = get_batch_scheduler().engine
+            self.warmup = ClientWarmup(self, engine).start()
+    
+    def is_ready(self) -> bool:
+        """Préchauffage terminé (toujours vrai sans préchauffage)"""
+        return self.warmup is None or self.warmup.ready
+    
+    def start_health_prober(self):
+        """
+        Démarrer la sonde de santé de l'endpoint en arrière-plan (client partagé de l'application)
+        """
+        from endpoint_health import EndpointHealthProber
+        
+        if self.health is None:
+            self.health = EndpointHealthProber(self.endpoint_url, session=self._http_session()).start()
+            print(f"🩺 Sonde de santé démarrée: {self.health.url}")
+    
+    def endpoint_known_down(self) -> bool:
+        """L'endpoint est-il connu comme hors service par la sonde de santé"""
+        return self.health is not None and self.health.is_down()
+    
+    def _report_endpoint_failure(self):
+        """Signaler à la sonde l'échec d'un appel réel (revérification immédiate de /health)"""
+        if self.health is not None:
+            self.health.report_failure()
+    
     def get_service_status(self) -> Dict[str, Any]:
         """
         Vérifier le statut du service Azure ML
+        Réponse instantanée depuis l'état de la sonde de santé si elle tourne, sinon appel direct à /health
         
         Returns:
-            Dict[str, Any]: Statut du service
+            Dict[str, Any]: Statut du service (et détails de la sonde si disponible)
         """
+        if self.health is not None:
+            health = self.health.snapshot()
+            if health['state'] == 'unknown':
+                return {'status': 'unknown', 'message': 'Première vérification de /health en cours', 'health': health}
+            if health['state'] == 'down' or health['last_status_code'] is None:
+                status = 'error' if health['last_error'] else 'unhealthy'
+            else:
+                status = 'healthy' if health['last_status_code'] == 200 else 'unhealthy'
+            age = time.time() - health['last_checked']
+            detail = health['last_error'] or f"Status: {health['last_status_code']}"
+            return {
+                'status': status,
+                'message': f"Service Azure ML - {detail} (état {health['state']}, vérifié il y a {age:.0f} s, "
+                           f"disponibilité {health['availability']:.0%} sur {health['probes']} sondes)",
+                'health': health
+            }
+        
         try:
             # Test simple de connectivité
             response = requests.get(
@@ -533,11 +945,26 @@ class AzureMLClient:
                 'message': f'Impossible de contacter le service: {str(e)}'
             }
 
-# Instance globale du client
-@st.cache_resource
+def _create_azure_client(show_warning=True):
+    """Créer le client Azure ML (mis en cache par get_azure_client)"""
+    from endpoint_health import PROBE_ENABLED
+    from client_warmup import WARMUP_ENABLED
+    
+    client = AzureMLClient(show_warning=show_warning)
+    if WARMUP_ENABLED:
+        client.start_warmup()
+    if PROBE_ENABLED and client.backend == 'azure':
+        client.start_health_prober()
+    return client
+
+
+# Fabrique mise en cache, créée au premier appel pour ne pas importer Streamlit à l'import du module
+_cached_client_factory = None
+
+
 def get_azure_client(show_warning=True):
     """
-    Obtenir l'instance du client Azure ML
+    Obtenir l'instance du client Azure ML (partagée via st.cache_resource)
     
     Args:
         show_warning (bool): Afficher les messages de configuration
@@ -545,4 +972,7 @@ def get_azure_client(show_warning=True):
     Returns:
         AzureMLClient: Instance du client Azure ML
     """
-    return AzureMLClient(show_warning=show_warning)
\ No newline at end of file
+    global _cached_client_factory
+    if _cached_client_factory is None:
+        _cached_client_factory = st.cache_resource(_create_azure_client)
+    return _cached_client_factory(show_warning=show_warning)
\ No newline at end of file
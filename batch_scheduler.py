@@ -0,0 +1,240 @@
+"""
+Ordonnanceur de micro-lots pour l'inférence locale
+Regroupe les prédictions concurrentes en une seule passe avant du modèle CLIP
+"""
+
+from __future__ import annotations
+
+import os
+import time
+import queue
+import threading
+from collections import Counter, deque
+from concurrent.futures import Future
+from typing import Dict, Any, List
+
+from lazy_imports import lazy_import
+
+st = lazy_import('streamlit')
+# asyncio importé seulement par predict_category_async (import du module plus rapide)
+asyncio = lazy_import('asyncio')
+
+# Configuration
+MAX_BATCH_SIZE = int(os.getenv('LOCAL_CLIP_MAX_BATCH_SIZE', '8'))
+MAX_WAIT_MS = float(os.getenv('LOCAL_CLIP_MAX_WAIT_MS', '10'))
+
+# Fenêtre glissante des temps d'attente conservés pour les statistiques
+WAIT_WINDOW = 1000
+
+
+class _PendingRequest:
+    """Requête en file : entrées prétraitées et future du demandeur"""
+
+    __slots__ = ('image', 'keywords', 'future', 'enqueued_at')
+
+    def __init__(self, image, keywords: str):
+        self.image = image
+        self.keywords = keywords
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class MicroBatchScheduler:
+    """
+    File d'attente devant le moteur local : un thread forme des lots de taille
+    max_batch_size au plus, ou après max_wait_ms, et résout la future de chaque demandeur
+    """
+
+    def __init__(self, engine, max_batch_size: int = MAX_BATCH_SIZE, max_wait_ms: float = MAX_WAIT_MS):
+        """
+        Initialise l'ordonnanceur (le thread de traitement démarre à la première requête)
+
+        Args:
+            engine: Moteur d'inférence (LocalClipEngine)
+            max_batch_size (int): Taille maximale d'un lot
+            max_wait_ms (float): Attente maximale après la première requête d'un lot
+        """
+        self.engine = engine
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_ms = max(0.0, max_wait_ms)
+        self._queue = queue.Queue()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+        self._batch_sizes = Counter()
+        self._wait_ms = deque(maxlen=WAIT_WINDOW)
+        self._batch_ms = deque(maxlen=WAIT_WINDOW)
+        self._processed = 0
+
+    def _ensure_worker(self):
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name='clip-micro-batch', daemon=True)
+                self._worker.start()
+
+    def _next_batch(self) -> List[_PendingRequest]:
+        """Attendre une requête puis compléter le lot jusqu'à la taille ou au délai maximal"""
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait_ms / 1000
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    @staticmethod
+    def _error_result(e: Exception) -> Dict[str, Any]:
+        return {
+            'success': False,
+            'error': f'Erreur lors de la prédiction locale CLIP: {str(e)}',
+            'source': 'local_clip_exception'
+        }
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            started = time.perf_counter()
+            try:
+                probabilities = self.engine.predict_logits(
+                    [request.image for request in batch],
+                    [request.keywords for request in batch]
+                )
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                for request, row in zip(batch, probabilities):
+                    # Résultat construit requête par requête : une erreur de mise en forme n'atteint que son demandeur
+                    try:
+                        total_ms = (time.perf_counter() - request.enqueued_at) * 1000
+                        result = self.engine.format_result(row, request.keywords, total_ms)
+                        result['batch_size'] = len(batch)
+                    except Exception as e:
+                        result = self._error_result(e)
+                    if not request.future.done():
+                        request.future.set_result(result)
+            except Exception as e:
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_result(self._error_result(e))
+            # Demandeurs sans résultat (lot plus court que prévu) : jamais laissés en attente jusqu'au délai
+            for request in batch:
+                if not request.future.done():
+                    request.future.set_result(self._error_result(RuntimeError('aucun résultat pour cette requête')))
+
+            with self._metrics_lock:
+                self._batch_sizes[len(batch)] += 1
+                self._batch_ms.append(elapsed_ms)
+                self._wait_ms.extend((started - request.enqueued_at) * 1000 for request in batch)
+                self._processed += len(batch)
+
+    def submit(self, image, brand: str, product_name: str, description: str, specifications: str) -> Future:
+        """
+        Prétraiter un produit dans le thread appelant puis le placer en file
+
+        Args:
+            image (Image.Image): Image du produit
+            brand (str): Marque du produit
+            product_name (str): Nom du produit
+            description (str): Description du produit
+            specifications (str): Spécifications du produit
+
+        Returns:
+            Future: Future résolue avec le résultat au format predict_category
+        """
+        processed_image, keywords = self.engine.preprocess(image, brand, product_name, description, specifications)
+        request = _PendingRequest(processed_image, keywords)
+        self._ensure_worker()
+        self._queue.put(request)
+        return request.future
+
+    def predict_category(self, image, brand: str, product_name: str, description: str,
+                         specifications: str, timeout: float = 60) -> Dict[str, Any]:
+        """
+        Prédiction bloquante via la file de micro-lots (même contrat que LocalClipEngine)
+
+        Args:
+            image (Image.Image): Image du produit
+            brand (str): Marque du produit
+            product_name (str): Nom du produit
+            description (str): Description du produit
+            specifications (str): Spécifications du produit
+            timeout (float): Attente maximale du résultat en secondes
+
+        Returns:
+            Dict[str, Any]: Résultat de la prédiction avec catégorie et confiance
+        """
+        try:
+            return self.submit(image, brand, product_name, description, specifications).result(timeout=timeout)
+        except Exception as e:
+            return {
+                'success': False,
+                'error': f'Erreur lors de la prédiction locale CLIP: {str(e)}',
+                'source': 'local_clip_exception'
+            }
+
+    async def predict_category_async(self, image, brand: str, product_name: str,
+                                     description: str, specifications: str) -> Dict[str, Any]:
+        """Variante asyncio de predict_category (le prétraitement s'exécute hors de la boucle)"""
+        loop = asyncio.get_running_loop()
+        future = await loop.run_in_executor(
+            None, self.submit, image, brand, product_name, description, specifications
+        )
+        return await asyncio.wrap_future(future)
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Statistiques de l'ordonnanceur
+
+        Returns:
+            Dict[str, Any]: Profondeur de file, histogramme des tailles de lot et temps d'attente
+        """
+        with self._metrics_lock:
+            waits = sorted(self._wait_ms)
+            batch_ms = list(self._batch_ms)
+            histogram = dict(sorted(self._batch_sizes.items()))
+            processed = self._processed
+
+        def percentile(values, q):
+            return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+        n_batches = sum(histogram.values())
+        return {
+            'queue_depth': self._queue.qsize(),
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait_ms,
+            'processed': processed,
+            'batches': n_batches,
+            'mean_batch_size': processed / n_batches if n_batches else 0.0,
+            'batch_size_histogram': histogram,
+            'wait_ms_p50': percentile(waits, 0.50),
+            'wait_ms_p95': percentile(waits, 0.95),
+            'batch_ms_mean': sum(batch_ms) / len(batch_ms) if batch_ms else 0.0
+        }
+
+
+def _create_batch_scheduler(max_batch_size: int = MAX_BATCH_SIZE, max_wait_ms: float = MAX_WAIT_MS):
+    """Créer l'ordonnanceur devant le moteur local partagé (mis en cache par get_batch_scheduler)"""
+    from local_clip_engine import get_local_clip_engine
+    return MicroBatchScheduler(get_local_clip_engine(), max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+
+
+# Fabrique mise en cache, créée au premier appel pour ne pas importer Streamlit à l'import du module
+_cached_scheduler_factory = None
+
+
+def get_batch_scheduler(max_batch_size: int = MAX_BATCH_SIZE, max_wait_ms: float = MAX_WAIT_MS) -> MicroBatchScheduler:
+    """
+    Obtenir l'ordonnanceur partagé entre toutes les sessions (via st.cache_resource)
+
+    Args:
+        max_batch_size (int): Taille maximale d'un lot
+        max_wait_ms (float): Attente maximale après la première requête d'un lot
+
+    Returns:
+        MicroBatchScheduler: Ordonnanceur de micro-lots
+    """
+    global _cached_scheduler_factory
+    if _cached_scheduler_factory is None:
+        _cached_scheduler_factory = st.cache_resource(_create_batch_scheduler)
+    return _cached_scheduler_factory(max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
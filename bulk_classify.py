@@ -0,0 +1,414 @@
+#!/usr/bin/env python3
+"""
+Classification en masse du catalogue en ligne de commande
+Lecture du CSV par blocs, prédictions concurrentes via le client (endpoint, modèle local ou cascade),
+résultats écrits au fil de l'eau en JSONL et reprise après interruption
+"""
+
+import os
+import ast
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, Any, Iterator, Optional, Set
+
+import numpy as np
+import pandas as pd
+
+OUTPUT_PATH = os.path.join('cache', 'bulk_predictions.jsonl')
+IMAGES_DIR = 'Images'
+CHUNK_SIZE = 256
+CHECKPOINT_EVERY = 50
+PROGRESS_EVERY = 100
+
+
+def checkpoint_path(output_path: str) -> str:
+    """Fichier de reprise associé à un fichier de résultats"""
+    return f"{output_path}.checkpoint.json"
+
+
+def _text(value) -> str:
+    return '' if pd.isna(value) else str(value)
+
+
+def _main_category(tree) -> str:
+    try:
+        return ast.literal_eval(tree)[0].split(' >> ')[0].strip()
+    except Exception:
+        return ''
+
+
+def iter_products(csv_path: str, images_dir: str = IMAGES_DIR, chunk_size: int = CHUNK_SIZE,
+                  limit: int = 0) -> Iterator[Dict[str, Any]]:
+    """
+    Parcourir les produits du CSV sans le charger entièrement
+
+    Args:
+        csv_path (str): CSV au format de produits_original.csv
+        images_dir (str): Dossier des images
+        chunk_size (int): Nombre de lignes lues à la fois
+        limit (int): Nombre maximal de produits (0 = tous)
+
+    Returns:
+        Iterator[Dict[str, Any]]: Produits (identifiant, champs texte, chemin de l'image, catégorie réelle)
+    """
+    row = 0
+    for chunk in pd.read_csv(csv_path, chunksize=chunk_size):
+        for record in chunk.to_dict('records'):
+            if limit and row >= limit:
+                return
+            image = _text(record.get('image'))
+            yield {
+                'row': row,
+                'uniq_id': _text(record.get('uniq_id')) or str(row),
+                'brand': _text(record.get('brand')),
+                'product_name': _text(record.get('product_name')),
+                'description': _text(record.get('description')),
+                'specifications': _text(record.get('product_specifications')),
+                'image_path': os.path.join(images_dir, image) if image else '',
+                'true_category': _main_category(record.get('product_category_tree'))
+            }
+            row += 1
+
+
+def load_latest_rows(output_path: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Dernière tentative de chaque produit (un produit en erreur est réessayé à la reprise et réécrit)
+
+    Args:
+        output_path (str): Fichier JSONL des résultats (une dernière ligne tronquée est ignorée)
+
+    Returns:
+        Dict[str, Dict[str, Any]]: Ligne la plus récente par uniq_id, dans l'ordre de première écriture
+    """
+    latest = {}
+    if not os.path.exists(output_path):
+        return latest
+    with open(output_path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+                latest[row['uniq_id']] = row
+            except (ValueError, KeyError, TypeError):
+                continue
+    return latest
+
+
+def load_done_ids(output_path: str) -> Set[str]:
+    """
+    Identifiants déjà classés avec succès (le fichier JSONL fait foi)
+    Les produits dont la dernière tentative a échoué (panne passagère de l'endpoint...) sont réessayés
+
+    Args:
+        output_path (str): Fichier JSONL des résultats
+
+    Returns:
+        Set[str]: Identifiants des produits à ne pas reclasser
+    """
+    return {uniq_id for uniq_id, row in load_latest_rows(output_path).items() if row.get('success')}
+
+
+def _truncate_partial_line(output_path: str):
+    """Supprimer une éventuelle ligne incomplète laissée par un arrêt brutal"""
+    if not os.path.exists(output_path):
+        return
+    with open(output_path, 'rb+') as f:
+        data = f.read()
+        if data and not data.endswith(b'\n'):
+            f.truncate(data.rfind(b'\n') + 1)
+
+
+def classify_product(client, product: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Classer un produit et mettre le résultat à plat pour l'export
+
+    Args:
+        client (AzureMLClient): Client de prédiction
+        product (Dict[str, Any]): Produit issu de iter_products
+
+    Returns:
+        Dict[str, Any]: Ligne de résultat (catégorie, confiance, source, raison d'un repli, erreur, latence)
+    """
+    from PIL import Image
+
+    start = time.perf_counter()
+    try:
+        if not product['image_path'] or not os.path.exists(product['image_path']):
+            raise FileNotFoundError(f"image introuvable: {product['image_path'] or '(vide)'}")
+        with Image.open(product['image_path']) as image:
+            result = client.predict_category(
+                image.convert('RGB'), product['brand'], product['product_name'],
+                product['description'], product['specifications']
+            )
+    except Exception as e:
+        result = {'success': False, 'error': str(e), 'source': 'bulk_exception'}
+    return {
+        'uniq_id': product['uniq_id'],
+        'row': product['row'],
+        'success': bool(result.get('success')),
+        'predicted_category': result.get('predicted_category'),
+        'confidence': result.get('confidence'),
+        'source': result.get('source'),
+        'cascade_tier': result.get('cascade_tier'),
+        'true_category': product['true_category'],
+        'fallback_reason': result.get('fallback_reason'),
+        'error': result.get('error'),
+        'latency_ms': (time.perf_counter() - start) * 1000
+    }
+
+
+class BulkRun:
+    """
+    Écriture des résultats, point de reprise et statistiques d'une exécution
+    """
+
+    def __init__(self, output_path: str, csv_path: str):
+        """
+        Args:
+            output_path (str): Fichier JSONL des résultats (ouvert en ajout)
+            csv_path (str): CSV source, enregistré dans le point de reprise
+        """
+        self.output_path = output_path
+        self.csv_path = csv_path
+        self.latencies = []
+        self.errors = {}
+        # Prédictions réussies mais issues d'un repli (endpoint ou modèle indisponible), par source
+        self.fallbacks = {}
+        self.correct = 0
+        self.labeled = 0
+        self._lock = threading.Lock()
+        self._since_checkpoint = 0
+        os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+        _truncate_partial_line(output_path)
+        self._file = open(output_path, 'a', encoding='utf-8')
+
+    def write(self, line: Dict[str, Any]):
+        """Ajouter un résultat (ligne JSON complète, vidée sur disque par lots)"""
+        with self._lock:
+            self._file.write(json.dumps(line, ensure_ascii=False) + '\n')
+            self.latencies.append(line['latency_ms'])
+            if not line['success']:
+                self.errors[line['source'] or 'unknown'] = self.errors.get(line['source'] or 'unknown', 0) + 1
+            elif line.get('fallback_reason'):
+                self.fallbacks[line['source'] or 'unknown'] = self.fallbacks.get(line['source'] or 'unknown', 0) + 1
+            if line['success'] and line['true_category']:
+                self.labeled += 1
+                self.correct += line['predicted_category'] == line['true_category']
+            self._since_checkpoint += 1
+            if self._since_checkpoint >= CHECKPOINT_EVERY:
+                self._checkpoint()
+
+    def _checkpoint(self, finished: bool = False):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        state = {
+            'csv': os.path.abspath(self.csv_path),
+            'output': os.path.abspath(self.output_path),
+            'updated_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'finished': finished,
+            'processed_this_run': len(self.latencies),
+            'errors_this_run': dict(self.errors),
+            'fallbacks_this_run': dict(self.fallbacks)
+        }
+        tmp_path = f"{checkpoint_path(self.output_path)}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, checkpoint_path(self.output_path))
+        self._since_checkpoint = 0
+
+    def close(self, finished: bool):
+        """Vider les résultats et enregistrer le point de reprise final"""
+        with self._lock:
+            self._checkpoint(finished)
+            self._file.close()
+
+    def summary(self, elapsed_s: float, skipped: int) -> Dict[str, Any]:
+        """
+        Statistiques de l'exécution
+
+        Args:
+            elapsed_s (float): Durée de l'exécution
+            skipped (int): Produits déjà classés lors d'une exécution précédente
+
+        Returns:
+            Dict[str, Any]: Débit, percentiles de latence, erreurs, replis et exactitude
+        """
+        latencies = np.asarray(self.latencies) if self.latencies else np.zeros(1)
+        return {
+            'processed': len(self.latencies),
+            'skipped': skipped,
+            'elapsed_s': elapsed_s,
+            'rows_per_s': len(self.latencies) / elapsed_s if elapsed_s > 0 else 0.0,
+            'latency_ms_p50': float(np.percentile(latencies, 50)),
+            'latency_ms_p95': float(np.percentile(latencies, 95)),
+            'latency_ms_p99': float(np.percentile(latencies, 99)),
+            'errors': sum(self.errors.values()),
+            'errors_by_source': dict(self.errors),
+            'fallbacks': sum(self.fallbacks.values()),
+            'fallbacks_by_source': dict(self.fallbacks),
+            'accuracy': self.correct / self.labeled if self.labeled else None
+        }
+
+
+def run_bulk(client, csv_path: str, output_path: str = OUTPUT_PATH, workers: int = 4, limit: int = 0,
+             images_dir: str = IMAGES_DIR, resume: bool = True) -> Dict[str, Any]:
+    """
+    Classer tout un CSV avec un nombre borné de prédictions en vol
+
+    Args:
+        client (AzureMLClient): Client de prédiction
+        csv_path (str): CSV des produits
+        output_path (str): Fichier JSONL des résultats
+        workers (int): Prédictions concurrentes
+        limit (int): Nombre maximal de produits lus (0 = tous)
+        images_dir (str): Dossier des images
+        resume (bool): Ignorer les produits déjà présents dans le fichier de résultats
+
+    Returns:
+        Dict[str, Any]: Statistiques de l'exécution (voir BulkRun.summary), 'interrupted' si Ctrl-C
+    """
+    if not resume and os.path.exists(output_path):
+        os.remove(output_path)
+    latest = load_latest_rows(output_path)
+    done = {uniq_id for uniq_id, row in latest.items() if row.get('success')}
+    if latest:
+        retried = f", {len(latest) - len(done)} en erreur réessayés" if len(latest) > len(done) else ''
+        print(f"⏩ Reprise: {len(done)} produits déjà classés dans {output_path}{retried}")
+
+    run = BulkRun(output_path, csv_path)
+    skipped = 0
+    interrupted = False
+    start = time.perf_counter()
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bulk')
+    pending = set()
+    next_report = PROGRESS_EVERY
+    try:
+        for product in iter_products(csv_path, images_dir, limit=limit):
+            if product['uniq_id'] in done:
+                skipped += 1
+                continue
+            # File bornée : on ne lit pas le CSV plus vite que les prédictions ne se terminent
+            if len(pending) >= workers * 2:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    run.write(future.result())
+            pending.add(executor.submit(classify_product, client, product))
+            if len(run.latencies) >= next_report:
+                next_report += PROGRESS_EVERY
+                print(f"📈 {len(run.latencies)} produits classés "
+                      f"({len(run.latencies) / (time.perf_counter() - start):.1f} produits/s)")
+        for future in pending:
+            run.write(future.result())
+        pending = set()
+    except KeyboardInterrupt:
+        interrupted = True
+        print("\n⏸️ Interruption: enregistrement des prédictions terminées...")
+        for future in pending:
+            future.cancel()
+        for future in pending:
+            if future.done() and not future.cancelled():
+                run.write(future.result())
+    finally:
+        executor.shutdown(wait=not interrupted, cancel_futures=True)
+        run.close(finished=not interrupted)
+
+    summary = run.summary(time.perf_counter() - start, skipped)
+    summary['interrupted'] = interrupted
+    # État du fichier complet, dédoublonné par produit (la dernière tentative fait foi)
+    latest = load_latest_rows(output_path)
+    summary['output_products'] = len(latest)
+    summary['output_errors'] = sum(not row.get('success') for row in latest.values())
+    return summary
+
+
+def export_parquet(output_path: str, parquet_path: str) -> Optional[str]:
+    """
+    Convertir le fichier JSONL complet en Parquet, une ligne par produit (sa dernière tentative)
+
+    Args:
+        output_path (str): Fichier JSONL des résultats
+        parquet_path (str): Fichier Parquet à écrire
+
+    Returns:
+        str: Chemin écrit, ou None si pyarrow / fastparquet n'est pas installé
+    """
+    try:
+        pd.DataFrame(list(load_latest_rows(output_path).values())).to_parquet(parquet_path, index=False)
+        return parquet_path
+    except ImportError as e:
+        print(f"⚠️ Export Parquet impossible: {str(e)}")
+        return None
+
+
+def print_summary(summary: Dict[str, Any]):
+    """Afficher le bilan de l'exécution"""
+    print("=" * 60)
+    print(f"📊 {summary['processed']} produits classés en {summary['elapsed_s']:.1f} s "
+          f"({summary['rows_per_s']:.1f} produits/s), {summary['skipped']} déjà faits")
+    print(f"⏱️ Latence p50 {summary['latency_ms_p50']:.0f} ms | p95 {summary['latency_ms_p95']:.0f} ms | "
+          f"p99 {summary['latency_ms_p99']:.0f} ms")
+    if summary['accuracy'] is not None:
+        print(f"🎯 Exactitude (catégorie du CSV): {summary['accuracy']:.3f}")
+    if summary['errors']:
+        print(f"❌ {summary['errors']} erreurs: " +
+              ', '.join(f"{source}={count}" for source, count in summary['errors_by_source'].items()))
+    if summary['fallbacks']:
+        print(f"⚠️ {summary['fallbacks']} prédictions de repli (modèle complet indisponible): " +
+              ', '.join(f"{source}={count}" for source, count in summary['fallbacks_by_source'].items()))
+    if not summary['errors'] and not summary['fallbacks']:
+        print("✅ Aucune erreur ni prédiction de repli")
+    if 'output_products' in summary:
+        pending = f", dont {summary['output_errors']} en erreur (relancer pour les réessayer)" if summary['output_errors'] else ''
+        print(f"📁 Fichier: {summary['output_products']} produits distincts{pending}")
+
+
+def main():
+    """Classer un CSV de produits en ligne de commande"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Classification en masse du catalogue")
+    parser.add_argument('--csv', default='produits_original.csv', help="CSV des produits")
+    parser.add_argument('--images', default=IMAGES_DIR, help="Dossier des images")
+    parser.add_argument('--output', default=OUTPUT_PATH, help="Fichier JSONL des résultats")
+    parser.add_argument('--parquet', default=None, help="Exporter aussi les résultats en Parquet")
+    parser.add_argument('--workers', type=int, default=4, help="Prédictions concurrentes")
+    parser.add_argument('--limit', type=int, default=0, help="Nombre maximal de produits (0 = tous)")
+    parser.add_argument('--backend', choices=['azure', 'local'], default=None,
+                        help="Modèle complet (par défaut CLIP_INFERENCE_BACKEND)")
+    parser.add_argument('--cascade', default=None, help="Niveaux de cascade, ex. keywords,prototypes,knn")
+    parser.add_argument('--restart', action='store_true', help="Ignorer les résultats existants")
+    parser.add_argument('--allow-fallbacks', action='store_true',
+                        help="Code de sortie 0 même si des prédictions viennent d'un repli")
+    parser.add_argument('--trace-log', default='', help="Journal JSONL des traces de prédiction ('' = désactivé)")
+    args = parser.parse_args()
+
+    if args.cascade is not None:
+        os.environ['PREDICTION_CASCADE'] = args.cascade
+    from trace_logging import configure_trace_log
+    from azure_client import AzureMLClient
+
+    # Traces de prédiction désactivées par défaut ou écrites dans --trace-log, jamais mêlées à la progression affichée
+    configure_trace_log(args.trace_log)
+
+    client = AzureMLClient(show_warning=False)
+    if args.backend:
+        client.backend = args.backend
+    print(f"🚀 Classification de {args.csv} ({args.workers} en parallèle, backend {client.backend}"
+          f"{', cascade ' + ','.join(client.cascade.tiers) if client.cascade.enabled else ''})")
+
+    summary = run_bulk(client, args.csv, args.output, workers=args.workers, limit=args.limit,
+                       images_dir=args.images, resume=not args.restart)
+    print_summary(summary)
+    print(f"💾 Résultats: {args.output}")
+    if summary['interrupted']:
+        print("▶️ Relancez la même commande pour reprendre")
+        return False
+    if args.parquet and export_parquet(args.output, args.parquet):
+        print(f"💾 Parquet: {args.parquet}")
+    return summary['errors'] == 0 and (args.allow_fallbacks or summary['fallbacks'] == 0)
+
+
+if __name__ == "__main__":
+    success = main()
+    exit(0 if success else 1)
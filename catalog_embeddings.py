@@ -0,0 +1,484 @@
+"""
+Magasin d'embeddings du catalogue et index des produits similaires
+Embeddings CLIP précalculés (float16, .npy en mémoire partagée) et recherche cosinus top-k
+"""
+
+import os
+import ast
+import json
+import time
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from lazy_imports import lazy_import
+
+st = lazy_import('streamlit')
+
+# Configuration
+EMBEDDING_STORE_DIR = os.path.join('cache', 'embeddings')
+STORE_FORMAT = 1
+SIMILAR_K = 5
+
+# Produits similaires avec le backend Azure : charger le modèle local dans le processus de l'application
+# (plusieurs centaines de Mo) seulement sur demande explicite ; sinon la recherche n'a lieu que s'il est déjà chargé
+SIMILAR_LOAD_MODEL = os.getenv('SIMILAR_PRODUCTS_LOAD_MODEL', '0').lower() in ('1', 'true', 'yes')
+
+# Poids du texte dans l'embedding produit (combine_features du notebook, alpha=0.6)
+TEXT_WEIGHT = 0.6
+
+# Compression optionnelle de l'index : PCA (nombre de composantes) et IVF (nombre de listes)
+INDEX_PCA_COMPONENTS = int(os.getenv('CATALOG_INDEX_PCA', '0'))
+INDEX_IVF_LISTS = int(os.getenv('CATALOG_INDEX_IVF_LISTS', '0'))
+INDEX_IVF_NPROBE = int(os.getenv('CATALOG_INDEX_NPROBE', '4'))
+
+# Lignes du catalogue converties en float32 à la fois lors d'un produit matriciel (le reste reste en float16 mappé)
+SIMILARITY_BLOCK_ROWS = 4096
+
+
+def load_labeled_catalog(csv_path: str = 'produits_original.csv', limit: int = 0) -> pd.DataFrame:
+    """
+    Charger les produits du catalogue qui ont une image et une catégorie
+
+    Args:
+        csv_path (str): Chemin du CSV des produits
+        limit (int): Nombre maximal de produits (0 = tous)
+
+    Returns:
+        pd.DataFrame: Produits avec main_category et image_path
+    """
+    df = pd.read_csv(csv_path)
+    df['main_category'] = df['product_category_tree'].apply(
+        lambda x: ast.literal_eval(x)[0].split(' >> ')[0].strip() if isinstance(x, str) else 'Unknown'
+    )
+    df['image_path'] = df['image'].apply(lambda x: f"Images/{x}" if isinstance(x, str) else '')
+    df = df[df['image_path'].apply(os.path.exists)].reset_index(drop=True)
+    return df.head(limit) if limit else df
+
+
+def l2_normalize(matrix: np.ndarray) -> np.ndarray:
+    """Normaliser chaque ligne (norme L2)"""
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+def combine_embeddings(image_embeds: np.ndarray, text_embeds: np.ndarray, alpha: float = TEXT_WEIGHT) -> np.ndarray:
+    """
+    Embedding produit : moyenne pondérée des embeddings texte et image normalisés (notebook)
+
+    Args:
+        image_embeds (np.ndarray): Embeddings image (n x D)
+        text_embeds (np.ndarray): Embeddings texte (n x D)
+        alpha (float): Poids du texte
+
+    Returns:
+        np.ndarray: Embeddings produit normalisés float32 (n x D)
+    """
+    image_embeds = l2_normalize(np.asarray(image_embeds, dtype=np.float32))
+    text_embeds = l2_normalize(np.asarray(text_embeds, dtype=np.float32))
+    return l2_normalize(alpha * text_embeds + (1 - alpha) * image_embeds)
+
+
+def similarity_matrix(queries: np.ndarray, matrix: np.ndarray, block_rows: int = SIMILARITY_BLOCK_ROWS) -> np.ndarray:
+    """
+    Produits scalaires requêtes x catalogue, sans copie float32 du catalogue entier
+
+    Args:
+        queries (np.ndarray): Requêtes (m x D)
+        matrix (np.ndarray): Vecteurs du catalogue (n x D), typiquement float16 en mémoire partagée
+        block_rows (int): Lignes du catalogue converties en float32 à la fois
+
+    Returns:
+        np.ndarray: Similarités float32 (m x n)
+    """
+    queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+    scores = np.empty((len(queries), len(matrix)), dtype=np.float32)
+    for start in range(0, len(matrix), block_rows):
+        block = np.asarray(matrix[start:start + block_rows], dtype=np.float32)
+        scores[:, start:start + len(block)] = queries @ block.T
+    return scores
+
+
+def model_fingerprint(engine) -> str:
+    """
+    Identifier les poids du modèle ayant produit les embeddings
+
+    Args:
+        engine: Moteur local (LocalClipEngine)
+
+    Returns:
+        str: Empreinte (fichier, taille, date de modification, quantification)
+    """
+    stat = os.stat(engine.model_path)
+    return f"{os.path.basename(engine.model_path)}:{stat.st_size}:{int(stat.st_mtime)}:{engine.quantization}"
+
+
+class SimilarityIndex:
+    """
+    Recherche cosinus top-k vectorisée sur des vecteurs normalisés
+    Optionnellement compressée par PCA et/ou partitionnée en listes IVF (k-means sphérique)
+    """
+
+    def __init__(self, matrix: np.ndarray, pca_components: int = 0, ivf_lists: int = 0,
+                 nprobe: int = INDEX_IVF_NPROBE, seed: int = 42):
+        """
+        Args:
+            matrix (np.ndarray): Vecteurs normalisés du catalogue (n x D)
+            pca_components (int): Dimensions conservées après PCA (0 = pas de PCA)
+            ivf_lists (int): Nombre de listes IVF (0 = recherche exhaustive)
+            nprobe (int): Listes explorées par requête en mode IVF
+            seed (int): Graine du k-means
+        """
+        self.mean = None
+        self.components = None
+        if 0 < pca_components < matrix.shape[1]:
+            matrix = np.asarray(matrix, dtype=np.float32)
+            self.mean = matrix.mean(axis=0)
+            _, _, vt = np.linalg.svd(matrix - self.mean, full_matrices=False)
+            self.components = vt[:pca_components].T
+            self.vectors = self._project(matrix)
+        else:
+            # Sans PCA : vecteurs du magasin tels quels (float16 mappé, pas de copie), normes corrigées à la volée
+            self.vectors = matrix
+        norms = np.concatenate([
+            np.linalg.norm(np.asarray(self.vectors[start:start + SIMILARITY_BLOCK_ROWS], dtype=np.float32), axis=1)
+            for start in range(0, len(self.vectors), SIMILARITY_BLOCK_ROWS)
+        ])
+        self.inverse_norms = (1 / np.maximum(norms, 1e-12)).astype(np.float32)
+
+        self.centroids = None
+        self.lists = None
+        self.nprobe = nprobe
+        if ivf_lists > 1 and len(self.vectors) > ivf_lists:
+            self._train_ivf(ivf_lists, seed)
+
+    def _project(self, vectors: np.ndarray) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.components is not None:
+            vectors = (vectors - self.mean) @ self.components
+        return l2_normalize(vectors)
+
+    def _scores(self, queries: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Similarités cosinus des requêtes avec tout le catalogue (ou ses lignes rows)"""
+        if rows is None:
+            return similarity_matrix(queries, self.vectors) * self.inverse_norms
+        return similarity_matrix(queries, self.vectors[rows]) * self.inverse_norms[rows]
+
+    def _train_ivf(self, n_lists: int, seed: int, iterations: int = 10):
+        rng = np.random.default_rng(seed)
+        seeds = rng.choice(len(self.vectors), n_lists, replace=False)
+        centroids = np.asarray(self.vectors[seeds], dtype=np.float32) * self.inverse_norms[seeds, None]
+        for _ in range(iterations):
+            assignments = np.argmax(self._scores(centroids), axis=0)
+            for c in range(n_lists):
+                members = np.flatnonzero(assignments == c)
+                if len(members):
+                    centroids[c] = (np.asarray(self.vectors[members], dtype=np.float32)
+                                    * self.inverse_norms[members, None]).mean(axis=0)
+            centroids = l2_normalize(centroids)
+        assignments = np.argmax(self._scores(centroids), axis=0)
+        self.centroids = centroids
+        self.lists = [np.flatnonzero(assignments == c) for c in range(n_lists)]
+
+    @staticmethod
+    def _top_k(scores: np.ndarray, k: int):
+        k = min(k, scores.shape[1])
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+
+    def search(self, queries: np.ndarray, k: int = SIMILAR_K):
+        """
+        Rechercher les k vecteurs les plus proches de chaque requête
+
+        Args:
+            queries (np.ndarray): Requêtes normalisées (m x D)
+            k (int): Nombre de voisins
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Indices (m x k) et similarités cosinus (m x k)
+        """
+        queries = self._project(np.atleast_2d(queries))
+        if self.centroids is None:
+            return self._top_k(self._scores(queries), k)
+
+        # IVF : recherche exhaustive limitée aux listes des nprobe centroïdes les plus proches
+        probes = np.argsort(-(queries @ self.centroids.T), axis=1)[:, :self.nprobe]
+        all_indices, all_scores = [], []
+        for query, query_probes in zip(queries, probes):
+            candidates = np.concatenate([self.lists[c] for c in query_probes])
+            if len(candidates) < k:
+                candidates = np.arange(len(self.vectors))
+            indices, scores = self._top_k(self._scores(query, candidates), k)
+            all_indices.append(candidates[indices[0]])
+            all_scores.append(scores[0])
+        return np.vstack(all_indices), np.vstack(all_scores)
+
+
+class CatalogEmbeddingStore:
+    """
+    Embeddings image, texte et produit de tout le catalogue, indexés par uniq_id
+    Les matrices float16 sont ouvertes en mémoire partagée (np.load avec mmap_mode='r')
+    """
+
+    def __init__(self, store_dir: str, metadata: Dict[str, Any]):
+        self.store_dir = store_dir
+        self.metadata = metadata
+        self.uniq_ids = metadata['uniq_ids']
+        self.categories = metadata['categories']
+        self.product_names = metadata['product_names']
+        self.images = metadata['images']
+        self.row_of = {uniq_id: row for row, uniq_id in enumerate(self.uniq_ids)}
+        self.image_embeddings = np.load(os.path.join(store_dir, 'image_embeddings.npy'), mmap_mode='r')
+        self.text_embeddings = np.load(os.path.join(store_dir, 'text_embeddings.npy'), mmap_mode='r')
+        self.product_embeddings = np.load(os.path.join(store_dir, 'product_embeddings.npy'), mmap_mode='r')
+        self._index = None
+
+    def __len__(self) -> int:
+        return len(self.uniq_ids)
+
+    @property
+    def model(self) -> str:
+        return self.metadata.get('model', '')
+
+    @classmethod
+    def load(cls, store_dir: str = EMBEDDING_STORE_DIR):
+        """
+        Ouvrir un magasin existant
+
+        Args:
+            store_dir (str): Dossier du magasin
+
+        Returns:
+            CatalogEmbeddingStore: Magasin, ou None s'il est absent ou d'un autre format
+        """
+        path = os.path.join(store_dir, 'index.json')
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                metadata = json.load(f)
+            if metadata.get('format') != STORE_FORMAT:
+                return None
+            return cls(store_dir, metadata)
+        except Exception as e:
+            print(f"⚠️ Magasin d'embeddings illisible ({store_dir}): {str(e)}")
+            return None
+
+    @property
+    def index(self) -> SimilarityIndex:
+        """Index de similarité sur les embeddings produit (construit au premier accès)"""
+        if self._index is None:
+            self._index = SimilarityIndex(
+                self.product_embeddings, pca_components=INDEX_PCA_COMPONENTS, ivf_lists=INDEX_IVF_LISTS
+            )
+        return self._index
+
+    def vector(self, uniq_id: str) -> Optional[np.ndarray]:
+        """Embedding produit d'un article du catalogue (None s'il est inconnu)"""
+        row = self.row_of.get(uniq_id)
+        return None if row is None else np.asarray(self.product_embeddings[row], dtype=np.float32)
+
+    def search(self, queries: np.ndarray, k: int = SIMILAR_K) -> List[List[Dict[str, Any]]]:
+        """
+        Produits du catalogue les plus proches de chaque requête
+
+        Args:
+            queries (np.ndarray): Embeddings produit des requêtes (m x D)
+            k (int): Nombre de produits par requête
+
+        Returns:
+            List[List[Dict[str, Any]]]: Pour chaque requête, uniq_id, nom, catégorie, image et similarité
+        """
+        indices, scores = self.index.search(queries, k)
+        return [
+            [{
+                'uniq_id': self.uniq_ids[row],
+                'product_name': self.product_names[row],
+                'main_category': self.categories[row],
+                'image': self.images[row],
+                'similarity': float(score)
+            } for row, score in zip(rows, row_scores)]
+            for rows, row_scores in zip(indices, scores)
+        ]
+
+
+def _save_npy(path: str, array: np.ndarray):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+
+
+def build_embedding_store(engine, csv_path: str = 'produits_original.csv', store_dir: str = EMBEDDING_STORE_DIR,
+                          batch_size: int = 32) -> CatalogEmbeddingStore:
+    """
+    Calculer et sauvegarder les embeddings de tout le catalogue
+
+    Args:
+        engine: Moteur local (LocalClipEngine)
+        csv_path (str): Chemin du CSV des produits
+        store_dir (str): Dossier du magasin
+        batch_size (int): Taille des lots d'encodage
+
+    Returns:
+        CatalogEmbeddingStore: Magasin construit
+    """
+    from PIL import Image
+
+    df = load_labeled_catalog(csv_path)
+    image_batches, text_batches = [], []
+    for start in range(0, len(df), batch_size):
+        images, texts = [], []
+        for _, row in df.iloc[start:start + batch_size].iterrows():
+            with Image.open(row['image_path']) as image:
+                processed_image, keywords = engine.preprocess(
+                    image.copy(), str(row['brand']) if pd.notna(row['brand']) else '', str(row['product_name']),
+                    str(row['description']) if pd.notna(row['description']) else '',
+                    str(row['product_specifications']) if pd.notna(row['product_specifications']) else ''
+                )
+            images.append(processed_image)
+            texts.append(keywords)
+        image_batches.append(engine.embed_images(images).numpy())
+        text_batches.append(engine.embed_texts(texts).numpy())
+        print(f"⏳ {min(start + batch_size, len(df))}/{len(df)} produits encodés")
+
+    image_embeddings = np.vstack(image_batches)
+    text_embeddings = np.vstack(text_batches)
+
+    os.makedirs(store_dir, exist_ok=True)
+    _save_npy(os.path.join(store_dir, 'image_embeddings.npy'), image_embeddings.astype(np.float16))
+    _save_npy(os.path.join(store_dir, 'text_embeddings.npy'), text_embeddings.astype(np.float16))
+    _save_npy(os.path.join(store_dir, 'product_embeddings.npy'),
+              combine_embeddings(image_embeddings, text_embeddings).astype(np.float16))
+
+    metadata = {
+        'format': STORE_FORMAT,
+        'model': model_fingerprint(engine),
+        'text_weight': TEXT_WEIGHT,
+        'uniq_ids': df['uniq_id'].tolist(),
+        'categories': df['main_category'].tolist(),
+        'product_names': df['product_name'].tolist(),
+        'images': df['image'].tolist()
+    }
+    # L'index est écrit en dernier : un magasin incomplet n'est jamais chargé
+    tmp_path = os.path.join(store_dir, 'index.json.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(metadata, f, ensure_ascii=False)
+    os.replace(tmp_path, os.path.join(store_dir, 'index.json'))
+    return CatalogEmbeddingStore(store_dir, metadata)
+
+
+def _load_catalog_store(store_dir: str, version: float):
+    """Ouvrir le magasin (mis en cache par get_catalog_store ; version = date de l'index)"""
+    return CatalogEmbeddingStore.load(store_dir)
+
+
+# Fabrique mise en cache, créée au premier appel pour ne pas importer Streamlit à l'import du module
+_cached_store_factory = None
+
+
+def get_catalog_store(store_dir: str = EMBEDDING_STORE_DIR) -> Optional[CatalogEmbeddingStore]:
+    """
+    Obtenir le magasin d'embeddings partagé entre les sessions (via st.cache_resource)
+    Rechargé automatiquement lorsque le magasin est reconstruit
+
+    Args:
+        store_dir (str): Dossier du magasin
+
+    Returns:
+        CatalogEmbeddingStore: Magasin, ou None s'il n'a pas encore été construit
+    """
+    global _cached_store_factory
+    path = os.path.join(store_dir, 'index.json')
+    if not os.path.exists(path):
+        return None
+    if _cached_store_factory is None:
+        _cached_store_factory = st.cache_resource(show_spinner=False)(_load_catalog_store)
+    return _cached_store_factory(store_dir, os.path.getmtime(path))
+
+
+def find_similar_products(image, brand: str, product_name: str, description: str, specifications: str,
+                          k: int = SIMILAR_K, load_model: bool = SIMILAR_LOAD_MODEL) -> Optional[List[Dict[str, Any]]]:
+    """
+    Produits du catalogue les plus proches d'un produit saisi
+    Complément facultatif de la prédiction : toute erreur (magasin ou poids corrompus, mémoire) est journalisée
+    et le panneau est simplement omis
+
+    Args:
+        image (Image.Image): Image du produit
+        brand (str): Marque du produit
+        product_name (str): Nom du produit
+        description (str): Description du produit
+        specifications (str): Spécifications du produit
+        k (int): Nombre de produits similaires
+        load_model (bool): Charger le modèle local s'il ne l'est pas encore (backend local ou option explicite)
+
+    Returns:
+        List[Dict[str, Any]]: Produits similaires, ou None si le magasin ou le modèle local est indisponible
+    """
+    try:
+        from local_clip_engine import get_local_clip_engine
+
+        store = get_catalog_store()
+        if store is None:
+            return None
+        engine = get_local_clip_engine()
+        if not engine.is_loaded and not load_model:
+            return None
+        if not engine.is_available():
+            return None
+        if store.model != model_fingerprint(engine):
+            print("⚠️ Magasin d'embeddings construit avec un autre modèle, à reconstruire")
+            return None
+
+        # Avec le backend local, les embeddings de la prédiction sont déjà dans les caches du moteur
+        processed_image, keywords = engine.preprocess(image, brand, product_name, description, specifications)
+        query = combine_embeddings(engine.embed_images([processed_image]).numpy(), engine.embed_texts([keywords]).numpy())
+        return store.search(query, k)[0]
+    except Exception as e:
+        print(f"⚠️ Recherche de produits similaires impossible: {str(e)}")
+        return None
+
+
+def main():
+    """Construire le magasin d'embeddings du catalogue en ligne de commande"""
+    import argparse
+    from local_clip_engine import LocalClipEngine, LOCAL_MODEL_PATH
+
+    parser = argparse.ArgumentParser(description="Magasin d'embeddings CLIP du catalogue")
+    parser.add_argument('--model', default=LOCAL_MODEL_PATH, help="State_dict fine-tuné (.pth)")
+    parser.add_argument('--csv', default='produits_original.csv', help="CSV des produits")
+    parser.add_argument('--output', default=EMBEDDING_STORE_DIR, help="Dossier du magasin")
+    parser.add_argument('--batch-size', type=int, default=32, help="Taille des lots d'encodage")
+    args = parser.parse_args()
+
+    engine = LocalClipEngine(model_path=args.model)
+    if not engine.is_available():
+        print(f"❌ Modèle local indisponible: {args.model}")
+        return False
+
+    start = time.perf_counter()
+    store = build_embedding_store(engine, args.csv, args.output, args.batch_size)
+    print(f"✅ {len(store)} produits encodés en {time.perf_counter() - start:.1f}s -> {args.output}")
+
+    # Calibration du vote kNN écrite avec le magasin : jamais calculée sur le chemin des requêtes
+    from knn_classifier import calibrate_store
+    calibrate_store(store)
+
+    # Temps de recherche d'un produit du catalogue
+    queries = np.asarray(store.product_embeddings[:100], dtype=np.float32)
+    store.search(queries[:1])  # construction de l'index hors chronométrage
+    start = time.perf_counter()
+    for query in queries:
+        store.search(query[None, :])
+    elapsed_ms = (time.perf_counter() - start) * 1000 / len(queries)
+    print(f"🔎 Recherche top-{SIMILAR_K}: {elapsed_ms:.2f} ms par requête")
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    exit(0 if success else 1)
@@ -0,0 +1,293 @@
+"""
+Prototypes d'embeddings par catégorie
+Un embedding moyen (image, texte et produit) par catégorie : classification par un seul produit matrice-vecteur
+"""
+
+import os
+import time
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+from catalog_embeddings import CatalogEmbeddingStore, EMBEDDING_STORE_DIR, combine_embeddings, l2_normalize
+
+# Configuration
+PROTOTYPE_SOURCE = 'local_category_prototypes'
+PROTOTYPE_FORMAT = 1
+
+# Écart minimal de similarité entre les deux meilleures catégories pour répondre sans le modèle complet
+# (0 = pré-filtre désactivé)
+PROTOTYPE_MARGIN = float(os.getenv('PROTOTYPE_PREFILTER_MARGIN', '0'))
+
+# Prompts textuels optionnels (même style que les mots-clés d'entraînement), mélangés au prototype texte
+PROMPT_TEMPLATE = "{category}"
+PROMPT_WEIGHT = 0.3
+
+TEMPERATURE_GRID = np.geomspace(0.005, 1.0, 30)
+
+
+def prototypes_path(model_path: str) -> str:
+    """
+    Fichier des prototypes, rangé à côté des poids du modèle
+
+    Args:
+        model_path (str): Chemin du state_dict fine-tuné (.pth)
+
+    Returns:
+        str: Chemin du fichier .npz des prototypes
+    """
+    return f"{os.path.splitext(model_path)[0]}_prototypes.npz"
+
+
+class CategoryPrototypes:
+    """
+    Table des prototypes (catégories x D) et classification par similarité cosinus
+    """
+
+    def __init__(self, labels: List[str], image: np.ndarray, text: np.ndarray, temperature: float = 0.05,
+                 model: str = ''):
+        """
+        Args:
+            labels (List[str]): Catégories
+            image (np.ndarray): Prototypes image normalisés (catégories x D)
+            text (np.ndarray): Prototypes texte normalisés (catégories x D)
+            temperature (float): Température du softmax des similarités
+            model (str): Empreinte du modèle ayant produit les embeddings
+        """
+        self.labels = list(labels)
+        self.image = np.asarray(image, dtype=np.float32)
+        self.text = np.asarray(text, dtype=np.float32)
+        self.product = combine_embeddings(self.image, self.text)
+        self.temperature = temperature
+        self.model = model
+
+    @classmethod
+    def from_store(cls, store: CatalogEmbeddingStore, engine=None, use_prompts: bool = False) -> 'CategoryPrototypes':
+        """
+        Moyenne des embeddings du catalogue par catégorie
+
+        Args:
+            store (CatalogEmbeddingStore): Magasin d'embeddings étiquetés
+            engine: Moteur local, requis pour encoder les prompts
+            use_prompts (bool): Mélanger un prompt textuel par catégorie au prototype texte
+
+        Returns:
+            CategoryPrototypes: Prototypes calibrés sur le catalogue
+        """
+        labels = sorted(set(store.categories))
+        categories = np.asarray(store.categories)
+        image_embeddings = l2_normalize(np.asarray(store.image_embeddings, dtype=np.float32))
+        text_embeddings = l2_normalize(np.asarray(store.text_embeddings, dtype=np.float32))
+        image = l2_normalize(np.vstack([image_embeddings[categories == label].mean(axis=0) for label in labels]))
+        text = l2_normalize(np.vstack([text_embeddings[categories == label].mean(axis=0) for label in labels]))
+
+        if use_prompts and engine is not None:
+            prompts = [PROMPT_TEMPLATE.format(category=label.lower()) for label in labels]
+            prompt_embeddings = l2_normalize(engine.embed_texts(prompts).numpy())
+            text = l2_normalize((1 - PROMPT_WEIGHT) * text + PROMPT_WEIGHT * prompt_embeddings)
+
+        prototypes = cls(labels, image, text, model=store.model)
+        prototypes.calibrate(np.asarray(store.product_embeddings, dtype=np.float32), store.categories)
+        return prototypes
+
+    def similarities(self, queries: np.ndarray) -> np.ndarray:
+        """
+        Similarités cosinus avec chaque prototype produit
+
+        Args:
+            queries (np.ndarray): Embeddings produit normalisés (m x D) ou un seul vecteur (D)
+
+        Returns:
+            np.ndarray: Similarités (m x catégories)
+        """
+        return np.atleast_2d(queries).astype(np.float32) @ self.product.T
+
+    def _softmax(self, similarities: np.ndarray, temperature: float) -> np.ndarray:
+        logits = similarities / temperature
+        weights = np.exp(logits - logits.max(axis=1, keepdims=True))
+        return weights / weights.sum(axis=1, keepdims=True)
+
+    def calibrate(self, vectors: np.ndarray, categories: List[str]) -> float:
+        """
+        Choisir la température minimisant la log-vraisemblance négative sur des produits étiquetés
+
+        Args:
+            vectors (np.ndarray): Embeddings produit normalisés
+            categories (List[str]): Catégories réelles
+
+        Returns:
+            float: Température retenue
+        """
+        label_index = {label: i for i, label in enumerate(self.labels)}
+        targets = np.array([label_index[c] for c in categories])
+        similarities = self.similarities(vectors)
+        rows = np.arange(len(targets))
+        nlls = [
+            -np.mean(np.log(np.maximum(self._softmax(similarities, t)[rows, targets], 1e-12)))
+            for t in TEMPERATURE_GRID
+        ]
+        self.temperature = float(TEMPERATURE_GRID[int(np.argmin(nlls))])
+        return self.temperature
+
+    def classify(self, queries: np.ndarray) -> List[Dict[str, Any]]:
+        """
+        Classer un lot d'embeddings produit
+
+        Args:
+            queries (np.ndarray): Embeddings produit normalisés (m x D)
+
+        Returns:
+            List[Dict[str, Any]]: Résultats au format predict_category, avec l'écart top-2 ('margin')
+        """
+        similarities = self.similarities(queries)
+        probabilities = self._softmax(similarities, self.temperature)
+        ranked = np.argsort(-similarities, axis=1)
+        results = []
+        for row, order, probs in zip(similarities, ranked, probabilities):
+            best = int(order[0])
+            results.append({
+                'success': True,
+                'predicted_category': self.labels[best],
+                'confidence': float(probs[best]),
+                'margin': float(row[best] - row[order[1]]) if len(order) > 1 else 1.0,
+                'source': PROTOTYPE_SOURCE,
+                'message': 'Prédiction par similarité aux prototypes des catégories',
+                'category_scores': {label: float(p) for label, p in zip(self.labels, probs)}
+            })
+        return results
+
+    def save(self, path: str):
+        """Sauvegarder les prototypes (.npz, écriture atomique)"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(
+                f, format=PROTOTYPE_FORMAT, labels=np.asarray(self.labels), image=self.image, text=self.text,
+                temperature=self.temperature, model=self.model
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional['CategoryPrototypes']:
+        """
+        Charger des prototypes sauvegardés
+
+        Args:
+            path (str): Fichier .npz
+
+        Returns:
+            CategoryPrototypes: Prototypes, ou None s'ils sont absents ou d'un autre format
+        """
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                if int(data['format']) != PROTOTYPE_FORMAT:
+                    return None
+                return cls(data['labels'].tolist(), data['image'], data['text'],
+                           temperature=float(data['temperature']), model=str(data['model']))
+        except Exception as e:
+            print(f"⚠️ Prototypes illisibles ({path}): {str(e)}")
+            return None
+
+
+# Prototypes chargés par fichier (rechargés si le fichier change)
+_loaded_prototypes = {}
+
+
+def get_category_prototypes(model_path: str) -> Optional[CategoryPrototypes]:
+    """
+    Obtenir les prototypes associés à un modèle
+
+    Args:
+        model_path (str): Chemin du state_dict fine-tuné (.pth)
+
+    Returns:
+        CategoryPrototypes: Prototypes, ou None s'ils n'ont pas été calculés
+    """
+    path = prototypes_path(model_path)
+    if not os.path.exists(path):
+        return None
+    version = os.path.getmtime(path)
+    cached = _loaded_prototypes.get(path)
+    if cached is None or cached[0] != version:
+        cached = (version, CategoryPrototypes.load(path))
+        _loaded_prototypes[path] = cached
+    return cached[1]
+
+
+def predict_prototypes(engine, image, brand: str, product_name: str, description: str,
+                       specifications: str) -> Optional[Dict[str, Any]]:
+    """
+    Prédiction par prototypes d'un produit saisi (embeddings calculés par le moteur local)
+
+    Args:
+        engine: Moteur local (LocalClipEngine)
+        image (Image.Image): Image du produit
+        brand (str): Marque du produit
+        product_name (str): Nom du produit
+        description (str): Description du produit
+        specifications (str): Spécifications du produit
+
+    Returns:
+        Dict[str, Any]: Résultat avec 'margin', ou None si les prototypes ou le modèle local manquent
+    """
+    from catalog_embeddings import model_fingerprint
+
+    if not engine.is_available():
+        return None
+    prototypes = get_category_prototypes(engine.model_path)
+    if prototypes is None or prototypes.model != model_fingerprint(engine):
+        return None
+    start = time.perf_counter()
+    processed_image, keywords = engine.preprocess(image, brand, product_name, description, specifications)
+    query = combine_embeddings(engine.embed_images([processed_image]).numpy(), engine.embed_texts([keywords]).numpy())
+    result = prototypes.classify(query)[0]
+    result['inference_time_ms'] = (time.perf_counter() - start) * 1000
+    return result
+
+
+def main():
+    """Calculer les prototypes des catégories à partir du magasin d'embeddings"""
+    import argparse
+    from local_clip_engine import LocalClipEngine, LOCAL_MODEL_PATH
+    from quantization_report import macro_f1
+
+    parser = argparse.ArgumentParser(description="Prototypes d'embeddings par catégorie")
+    parser.add_argument('--model', default=LOCAL_MODEL_PATH, help="State_dict fine-tuné (.pth)")
+    parser.add_argument('--store', default=EMBEDDING_STORE_DIR, help="Dossier du magasin d'embeddings")
+    parser.add_argument('--prompts', action='store_true', help="Mélanger un prompt textuel par catégorie")
+    parser.add_argument('--output', default=None, help="Fichier .npz (par défaut à côté du modèle)")
+    args = parser.parse_args()
+
+    store = CatalogEmbeddingStore.load(args.store)
+    if store is None:
+        print(f"❌ Magasin d'embeddings introuvable: {args.store} (python catalog_embeddings.py)")
+        return False
+
+    engine = LocalClipEngine(model_path=args.model) if args.prompts else None
+    prototypes = CategoryPrototypes.from_store(store, engine=engine, use_prompts=args.prompts)
+    output = args.output or prototypes_path(args.model)
+    prototypes.save(output)
+    print(f"✅ {len(prototypes.labels)} prototypes ({prototypes.product.shape[1]} dimensions) -> {output}")
+
+    # Qualité sur le catalogue et part des produits tranchés sans le modèle complet
+    vectors = np.asarray(store.product_embeddings, dtype=np.float32)
+    start = time.perf_counter()
+    results = prototypes.classify(vectors)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    predictions = [r['predicted_category'] for r in results]
+    margins = np.array([r['margin'] for r in results])
+    correct = np.asarray(predictions) == np.asarray(store.categories)
+    print(f"🎯 Exactitude {correct.mean():.3f} | macro-F1 {macro_f1(store.categories, predictions):.3f} | "
+          f"{elapsed_ms * 1000 / len(results):.1f} µs par produit | T={prototypes.temperature:.3f}")
+    for threshold in (0.01, 0.02, 0.05, 0.1):
+        routed = margins >= threshold
+        accuracy = correct[routed].mean() if routed.any() else float('nan')
+        print(f"   écart >= {threshold:.2f}: {routed.mean():.1%} des produits tranchés localement, exactitude {accuracy:.3f}")
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    exit(0 if success else 1)
@@ -0,0 +1,301 @@
+"""
+Instrumentation du client de prédiction
+Durée de chaque étape (prétraitement, sérialisation, HTTP, décodage...) agrégée en histogrammes,
+compteurs de prédictions, d'erreurs et de caches, export au format texte Prometheus (fichier ou endpoint local)
+"""
+
+import os
+import sys
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from functools import wraps
+from typing import Dict, Any, List
+
+from trace_logging import current_trace
+
+# Bornes des histogrammes de durée (secondes), cumulées comme dans Prometheus
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Export optionnel : port HTTP local (/metrics) et/ou fichier texte (collecteur textfile de node_exporter)
+METRICS_PORT = int(os.getenv('CLIENT_METRICS_PORT', '0'))
+METRICS_FILE = os.getenv('CLIENT_METRICS_FILE', '')
+
+PREFIX = 'clip_client'
+
+
+class StageHistogram:
+    """Histogramme cumulatif des durées d'une étape"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def quantile(self, q: float) -> float:
+        """Quantile estimé par interpolation linéaire dans le seau concerné (comme histogram_quantile)"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for i, count in enumerate(self.counts):
+            if cumulative + count >= rank and count:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-1]
+
+
+class ClientMetrics:
+    """
+    Registre des mesures du client (partagé par toutes les sessions du processus)
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, StageHistogram] = {}
+        self._counters: Dict[tuple, float] = {}
+        self.started_at = time.time()
+
+    @staticmethod
+    def _in_shadow() -> bool:
+        """Appel fantôme en cours (comparaison de la cascade) : rien n'est compté"""
+        trace = current_trace()
+        return trace is not None and trace.shadow
+
+    def observe(self, stage: str, seconds: float):
+        """Enregistrer la durée d'une étape"""
+        if self._in_shadow():
+            return
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = StageHistogram()
+            histogram.observe(seconds)
+
+    def increment(self, name: str, amount: float = 1, **labels):
+        """Incrémenter un compteur (ex. increment('errors', stage='http', source='azure_ml_error'))"""
+        if self._in_shadow():
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    @contextmanager
+    def span(self, stage: str):
+        """
+        Chronométrer un bloc comme une étape ; une exception est comptée comme erreur de l'étape
+
+        Args:
+            stage (str): Nom de l'étape
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            self.increment('errors', stage=stage, error=type(e).__name__)
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            self.observe(stage, elapsed)
+            # Durée reportée aussi dans la trace de la prédiction en cours
+            trace = current_trace()
+            if trace is not None:
+                trace.add_stage(stage, elapsed)
+
+    def stage_summary(self) -> List[Dict[str, Any]]:
+        """
+        Résumé par étape pour l'affichage
+
+        Returns:
+            List[Dict[str, Any]]: Étape, nombre d'appels, moyenne et quantiles estimés (ms)
+        """
+        with self._lock:
+            return [
+                {
+                    'stage': stage,
+                    'count': h.count,
+                    'mean_ms': h.sum / h.count * 1000 if h.count else 0.0,
+                    'p50_ms': h.quantile(0.50) * 1000,
+                    'p95_ms': h.quantile(0.95) * 1000,
+                    'p99_ms': h.quantile(0.99) * 1000
+                }
+                for stage, h in sorted(self._histograms.items())
+            ]
+
+    def counters(self) -> Dict[str, Dict[tuple, float]]:
+        """Compteurs regroupés par nom, puis par étiquettes"""
+        grouped = {}
+        with self._lock:
+            for (name, labels), value in self._counters.items():
+                grouped.setdefault(name, {})[labels] = value
+        return grouped
+
+    def render_prometheus(self) -> str:
+        """
+        Export au format texte Prometheus (version 0.0.4)
+
+        Returns:
+            str: Histogrammes, compteurs et statistiques des caches d'embeddings
+        """
+        lines = [
+            f"# HELP {PREFIX}_stage_duration_seconds Durée de chaque étape d'une prédiction",
+            f"# TYPE {PREFIX}_stage_duration_seconds histogram"
+        ]
+        with self._lock:
+            for stage, h in sorted(self._histograms.items()):
+                cumulative = 0
+                for bound, count in zip(h.buckets, h.counts):
+                    cumulative += count
+                    lines.append(f'{PREFIX}_stage_duration_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'{PREFIX}_stage_duration_seconds_bucket{{stage="{stage}",le="+Inf"}} {h.count}')
+                lines.append(f'{PREFIX}_stage_duration_seconds_sum{{stage="{stage}"}} {h.sum:.6f}')
+                lines.append(f'{PREFIX}_stage_duration_seconds_count{{stage="{stage}"}} {h.count}')
+
+        for name, series in sorted(self.counters().items()):
+            lines.append(f"# TYPE {PREFIX}_{name}_total counter")
+            for labels, value in sorted(series.items()):
+                lines.append(f"{PREFIX}_{name}_total{_format_labels(labels)} {value:g}")
+
+        cache_stats = embedding_cache_stats()
+        if cache_stats:
+            for field, kind in (('hits', 'counter'), ('misses', 'counter'), ('evictions', 'counter'),
+                                ('entries', 'gauge'), ('bytes', 'gauge')):
+                metric = f"{PREFIX}_embedding_cache_{field}{'_total' if kind == 'counter' else ''}"
+                lines.append(f"# TYPE {metric} {kind}")
+                for stats in cache_stats:
+                    lines.append(f'{metric}{{cache="{stats["name"]}"}} {stats[field]}')
+
+        lines.append(f"# TYPE {PREFIX}_start_time_seconds gauge")
+        lines.append(f"{PREFIX}_start_time_seconds {self.started_at:.0f}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str):
+        """Écrire l'export dans un fichier (remplacement atomique)"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.render_prometheus())
+        os.replace(tmp_path, path)
+
+
+def _format_labels(labels: tuple) -> str:
+    """Étiquettes Prometheus ({clé="valeur",...}) avec échappement des barres obliques inverses et guillemets"""
+    if not labels:
+        return ''
+    pairs = []
+    for key, value in labels:
+        value = str(value).lower() if isinstance(value, bool) else str(value)
+        value = value.replace('\\', '\\\\').replace('"', '\\"')
+        pairs.append(f'{key}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+def embedding_cache_stats() -> List[Dict[str, Any]]:
+    """
+    Statistiques des caches d'embeddings du moteur local, s'il a déjà été créé
+    (l'export ne déclenche jamais le chargement du modèle)
+
+    Returns:
+        List[Dict[str, Any]]: Statistiques de chaque cache (vide sans moteur local)
+    """
+    engine_module = sys.modules.get('local_clip_engine')
+    if engine_module is None or engine_module._cached_engine_factory is None:
+        return []
+    try:
+        return engine_module.get_local_clip_engine().cache_stats()
+    except Exception:
+        return []
+
+
+_metrics = ClientMetrics()
+_exporter_started = False
+_exporter_lock = threading.Lock()
+
+
+def get_client_metrics() -> ClientMetrics:
+    """
+    Obtenir le registre des mesures du processus (et démarrer l'export configuré au premier appel)
+
+    Returns:
+        ClientMetrics: Registre partagé
+    """
+    global _exporter_started
+    if not _exporter_started and (METRICS_PORT or METRICS_FILE):
+        with _exporter_lock:
+            if not _exporter_started:
+                _exporter_started = True
+                start_exporter(METRICS_PORT, METRICS_FILE)
+    return _metrics
+
+
+def timed_stage(stage: str):
+    """
+    Décorateur : chaque appel de la fonction est une étape chronométrée
+
+    Args:
+        stage (str): Nom de l'étape
+    """
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with get_client_metrics().span(stage):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def start_exporter(port: int = 0, path: str = '', interval_s: float = 15.0):
+    """
+    Démarrer l'export en arrière-plan : endpoint HTTP /metrics et/ou réécriture périodique d'un fichier
+
+    Args:
+        port (int): Port d'écoute sur 127.0.0.1 (0 = pas d'endpoint)
+        path (str): Fichier texte Prometheus ('' = pas de fichier)
+        interval_s (float): Période de réécriture du fichier
+    """
+    if port:
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = _metrics.render_prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        try:
+            server = ThreadingHTTPServer(('127.0.0.1', port), MetricsHandler)
+            server.daemon_threads = True
+            threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+            print(f"📈 Mesures du client exposées sur http://127.0.0.1:{port}/metrics")
+        except OSError as e:
+            print(f"⚠️ Endpoint des mesures indisponible (port {port}): {str(e)}")
+
+    if path:
+        def write_periodically():
+            while True:
+                try:
+                    _metrics.write_prometheus(path)
+                except Exception as e:
+                    print(f"⚠️ Écriture des mesures impossible ({path}): {str(e)}")
+                time.sleep(interval_s)
+
+        threading.Thread(target=write_periodically, name='metrics-file', daemon=True).start()
+        print(f"📈 Mesures du client écrites dans {path} toutes les {interval_s:.0f} s")
@@ -0,0 +1,158 @@
+"""
+Préchauffage du client de prédiction à sa création (en arrière-plan)
+Endpoint distant : résolution DNS, connexions TCP/TLS ouvertes dans le pool et réveil de l'App Service via /health ;
+modèle local : chargement des poids et une inférence factice. Un indicateur de disponibilité est exposé à l'interface
+"""
+
+import os
+import time
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
+from urllib.parse import urlsplit
+
+from client_metrics import get_client_metrics
+
+# Préchauffage du client partagé de l'application (CLIENT_WARMUP=0 pour le désactiver)
+WARMUP_ENABLED = os.getenv('CLIENT_WARMUP', '1').lower() in ('1', 'true', 'yes')
+
+# Connexions ouvertes d'avance dans le pool HTTP (requêtes /health simultanées)
+WARMUP_CONNECTIONS = int(os.getenv('WARMUP_CONNECTIONS', '2'))
+
+# Délai d'une requête de préchauffage : un App Service endormi peut mettre plusieurs dizaines de secondes à répondre
+WARMUP_TIMEOUT_S = float(os.getenv('WARMUP_TIMEOUT_S', '60'))
+
+
+class ClientWarmup:
+    """
+    Préchauffage d'un client dans un thread de fond, avec la durée de chaque étape
+    """
+
+    def __init__(self, client, engine=None):
+        """
+        Args:
+            client (AzureMLClient): Client à préchauffer
+            engine (LocalClipEngine): Moteur local partagé (obtenu dans le thread du script, backend local)
+        """
+        self.client = client
+        self.engine = engine
+        self.state = 'pending'
+        self.steps: List[Dict[str, Any]] = []
+        self.error: Optional[str] = None
+        self.started_at: Optional[float] = None
+        self.duration_s: Optional[float] = None
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def ready(self) -> bool:
+        """Préchauffage terminé (réussi ou non : le client reste utilisable dans tous les cas)"""
+        return self._ready.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Attendre la fin du préchauffage"""
+        return self._ready.wait(timeout)
+
+    def start(self) -> 'ClientWarmup':
+        """Lancer le préchauffage en arrière-plan"""
+        if self._thread is None:
+            self.started_at = time.time()
+            self.state = 'running'
+            self._thread = threading.Thread(target=self._run, name='client-warmup', daemon=True)
+            self._thread.start()
+        return self
+
+    def _step(self, name: str, function) -> Any:
+        start = time.perf_counter()
+        ok, detail = True, None
+        try:
+            detail = function()
+            return detail
+        except Exception as e:
+            ok, detail = False, str(e)
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            get_client_metrics().observe(f'warmup_{name}', elapsed)
+            with self._lock:
+                self.steps.append({'step': name, 'ms': elapsed * 1000, 'ok': ok, 'detail': detail})
+
+    def _run(self):
+        start = time.perf_counter()
+        try:
+            if self.client.backend == 'local':
+                self._warm_local_model()
+            else:
+                self._warm_endpoint()
+            self.state = 'ready'
+        except Exception as e:
+            self.state = 'failed'
+            self.error = str(e)
+            print(f"⚠️ Préchauffage du client incomplet: {str(e)}")
+        finally:
+            self.duration_s = time.perf_counter() - start
+            self._ready.set()
+        if self.state == 'ready':
+            steps = ', '.join(f"{step['step']} {step['ms']:.0f} ms" for step in self.steps)
+            print(f"🔥 Client préchauffé en {self.duration_s:.1f}s ({steps})")
+
+    def _warm_endpoint(self):
+        url = urlsplit(self.client.endpoint_url)
+        port = url.port or (443 if url.scheme == 'https' else 80)
+
+        def resolve():
+            addresses = socket.getaddrinfo(url.hostname, port, type=socket.SOCK_STREAM)
+            return f"{len(addresses)} adresse(s)"
+
+        self._step('dns', resolve)
+
+        # Requêtes /health simultanées : chacune ouvre sa connexion TCP/TLS, gardée ensuite dans le pool
+        session = self.client._http_session()
+        health_url = self.client.endpoint_url.replace('/score', '/health')
+
+        def open_connections():
+            with ThreadPoolExecutor(max_workers=WARMUP_CONNECTIONS) as pool:
+                statuses = list(pool.map(
+                    lambda _: session.get(health_url, timeout=WARMUP_TIMEOUT_S).status_code,
+                    range(WARMUP_CONNECTIONS)
+                ))
+            return f"{WARMUP_CONNECTIONS} connexion(s), /health {statuses}"
+
+        self._step('connections', open_connections)
+
+    def _warm_local_model(self):
+        from PIL import Image
+
+        engine = self.engine
+        if not engine.is_available():
+            raise FileNotFoundError(f"Modèle CLIP local indisponible ({engine.model_path})")
+        self._step('model_load', engine.load)
+
+        def dummy_inference():
+            result = engine.predict_category(Image.new('RGB', (224, 224), 'white'), 'warmup', 'warmup', 'warmup', '')
+            if not result.get('success'):
+                raise RuntimeError(result.get('error'))
+            return 'ok'
+
+        self._step('dummy_inference', dummy_inference)
+
+    def status(self) -> Dict[str, Any]:
+        """
+        État du préchauffage pour l'affichage
+
+        Returns:
+            Dict[str, Any]: État, disponibilité, durée totale, étapes et erreur éventuelle
+        """
+        with self._lock:
+            steps = list(self.steps)
+        elapsed = self.duration_s if self.duration_s is not None else (
+            time.time() - self.started_at if self.started_at else 0.0)
+        return {
+            'state': self.state,
+            'ready': self.ready,
+            'elapsed_s': elapsed,
+            'steps': steps,
+            'error': self.error
+        }
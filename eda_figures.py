@@ -0,0 +1,364 @@
+"""
+Fabrique de graphiques Plotly pour la page d'analyse exploratoire
+Les figures sont mémorisées sous forme JSON par version des données et options d'accessibilité
+"""
+
+import threading
+from collections import OrderedDict
+from itertools import product
+from typing import Any, Dict, Tuple
+
+import plotly.io as pio
+import streamlit as st
+
+from lazy_imports import lazy_import
+
+# plotly.express n'est nécessaire que pour construire une figure absente du cache
+px = lazy_import('plotly.express')
+
+# Configuration d'accessibilité pour les graphiques
+ACCESSIBLE_COLORS = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd',
+                     '#8c564b', '#e377c2', '#7f7f7f', '#bcbd22', '#17becf']
+
+# Palette optimisée pour le mode contraste élevé (couleurs vives sur fond sombre)
+HIGH_CONTRAST_COLORS = ['#FF6B6B', '#4ECDC4', '#45B7D1', '#96CEB4', '#FFEAA7',
+                        '#DDA0DD', '#98D8C8', '#F7DC6F', '#BB8FCE', '#85C1E9',
+                        '#F8C471', '#82E0AA', '#F1948A', '#85C1E9', '#D7BDE2']
+
+# (contraste élevé, texte agrandi, mode daltonien)
+AccessibilityKey = Tuple[bool, bool, bool]
+
+
+def accessibility_key(accessibility: Dict[str, bool]) -> AccessibilityKey:
+    """
+    Clé d'accessibilité normalisée à partir de st.session_state.accessibility
+
+    Args:
+        accessibility (Dict[str, bool]): Options d'accessibilité
+
+    Returns:
+        AccessibilityKey: (high_contrast, large_text, color_blind)
+    """
+    return (
+        bool(accessibility.get('high_contrast', False)),
+        bool(accessibility.get('large_text', False)),
+        bool(accessibility.get('color_blind', False))
+    )
+
+
+def plotly_colors(key: AccessibilityKey) -> list:
+    """Palette de couleurs selon le mode d'accessibilité"""
+    high_contrast, _, color_blind = key
+    if color_blind:
+        return px.colors.qualitative.Safe  # Accessible palette for color-blind users
+    if high_contrast:
+        return HIGH_CONTRAST_COLORS
+    return ACCESSIBLE_COLORS
+
+
+def _theme(key: AccessibilityKey) -> Tuple[str, str]:
+    """Couleurs de fond et de texte selon le mode d'accessibilité"""
+    high_contrast = key[0]
+    bg_color = '#000000' if high_contrast else '#FFFFFF'
+    text_color = '#FFFFFF' if high_contrast else '#000000'
+    return bg_color, text_color
+
+
+def build_category_bar(category_count, key: AccessibilityKey):
+    """Graphique en barres du nombre de produits par catégorie principale"""
+    _, large_text, _ = key
+    bg_color, text_color = _theme(key)
+
+    fig = px.bar(category_count, x=category_count.index, y=category_count.values,
+                 title="Nombre de Produits par Catégorie Principale",
+                 color=category_count.index,
+                 color_discrete_sequence=plotly_colors(key)[:len(category_count)])
+
+    fig.update_layout(
+        xaxis_title="Catégories",
+        yaxis_title="Nombre de produits",
+        plot_bgcolor=bg_color,
+        paper_bgcolor=bg_color,
+        font=dict(size=14 if not large_text else 18, color=text_color),
+        legend_title="Catégories",
+        legend=dict(font=dict(color=text_color)),
+        margin=dict(l=50, r=50, t=50, b=100),  # Ensure enough space for rotated labels
+        hoverlabel=dict(
+            bgcolor="white",
+            font_size=14 if not large_text else 16,
+            font_family="Arial, sans-serif",
+            font_color="black",
+            bordercolor="black"
+        )
+    )
+    fig.update_xaxes(
+        tickangle=45,
+        tickfont=dict(color=text_color, size=14 if not large_text else 16)
+    )
+    fig.update_yaxes(
+        tickfont=dict(color=text_color, size=14 if not large_text else 16)
+    )
+    return fig
+
+
+def build_subcategory_pie(subcat_count, key: AccessibilityKey):
+    """Graphique en camembert des top 20 branches de catégories"""
+    _, large_text, _ = key
+    bg_color, text_color = _theme(key)
+
+    fig = px.pie(subcat_count, values=subcat_count.values, names=subcat_count.index,
+                 title="Top 20 Branches de Catégories",
+                 color_discrete_sequence=plotly_colors(key))
+    fig.update_traces(
+        textposition='inside',
+        textinfo='percent+label',
+        hovertemplate='<b>%{label}</b><br>Valeur: %{value}<br>Pourcentage: %{percent}',
+        textfont=dict(color=text_color, size=14 if not large_text else 16)
+    )
+    fig.update_layout(
+        uniformtext_minsize=12 if not large_text else 16,
+        uniformtext_mode='hide',
+        legend=dict(orientation="v", yanchor="top", y=1, xanchor="left", x=1.02, font=dict(color=text_color, size=10)),
+        plot_bgcolor=bg_color,
+        paper_bgcolor=bg_color,
+        font=dict(color=text_color),
+        margin=dict(r=200),  # Ajouter une marge à droite pour la légende
+        hoverlabel=dict(
+            bgcolor="white",
+            font_size=14 if not large_text else 16,
+            font_family="Arial, sans-serif",
+            font_color="black",
+            bordercolor="black"
+        )
+    )
+    return fig
+
+
+def build_keyword_bar(keyword_freq_df, key: AccessibilityKey):
+    """Graphique en barres des fréquences des mots-clés (Top 50)"""
+    high_contrast, large_text, color_blind = key
+    bg_color, text_color = _theme(key)
+
+    fig = px.bar(keyword_freq_df.head(50), x='Mot Clé', y='Fréquence',
+                 title="Fréquence des Mots-Clés (Top 50)",
+                 color='Fréquence',
+                 color_continuous_scale='viridis' if color_blind
+                 else 'plasma' if high_contrast
+                 else 'Blues')
+    fig.update_layout(
+        xaxis_title="Mots-clés",
+        yaxis_title="Fréquence",
+        xaxis_tickangle=45,
+        plot_bgcolor=bg_color,
+        paper_bgcolor=bg_color,
+        font=dict(size=14 if not large_text else 18, color=text_color),
+        showlegend=False,
+        hoverlabel=dict(
+            bgcolor="white" if high_contrast else "rgba(255,255,255,0.8)",
+            font_size=14 if not large_text else 16,
+            font_family="Arial, sans-serif",
+            font_color="black"
+        )
+    )
+    fig.update_xaxes(
+        tickfont=dict(color=text_color, size=14 if not large_text else 16)
+    )
+    fig.update_yaxes(
+        tickfont=dict(color=text_color, size=14 if not large_text else 16)
+    )
+    return fig
+
+
+def build_keyword_pie(keyword_freq_df, key: AccessibilityKey):
+    """Graphique en camembert des top 20 mots-clés par fréquence"""
+    high_contrast, large_text, _ = key
+    bg_color, text_color = _theme(key)
+
+    fig = px.pie(keyword_freq_df.head(20), values='Fréquence', names='Mot Clé',
+                 title="Top 20 Mots-Clés par Fréquence",
+                 color_discrete_sequence=plotly_colors(key))
+    fig.update_traces(
+        textposition='inside',
+        textinfo='percent+label',
+        hovertemplate='<b>%{label}</b><br>Fréquence: %{value}<br>Pourcentage: %{percent}',
+        textfont=dict(color=text_color, size=14 if not large_text else 16)
+    )
+    fig.update_layout(
+        plot_bgcolor=bg_color,
+        paper_bgcolor=bg_color,
+        font=dict(color=text_color),
+        legend=dict(font=dict(color=text_color)),
+        hoverlabel=dict(
+            bgcolor="white" if high_contrast else "rgba(255,255,255,0.8)",
+            font_size=14 if not large_text else 16,
+            font_family="Arial, sans-serif",
+            font_color="black"
+        )
+    )
+    return fig
+
+
+def build_image_scatter(scatter, key: AccessibilityKey):
+    """Nuage de points du ratio hauteur/largeur vs nombre de pixels (niveau de détail précalculé)"""
+    _, large_text, _ = key
+    bg_color, text_color = _theme(key)
+    binned = scatter['mode'] == 'binned'
+
+    fig = px.scatter(scatter['data'], x='aspect_ratio', y='image_pixels',
+                     color='main_category',
+                     size='count' if binned else None,
+                     size_max=20,
+                     hover_data=['count'] if binned else None,
+                     title="Ratio Hauteur/Largeur vs Nombre de Pixels (Images Valides)",
+                     color_discrete_sequence=plotly_colors(key),
+                     labels={'aspect_ratio': 'Ratio Hauteur/Largeur', 'image_pixels': 'Nombre de Pixels',
+                             'count': "Nombre d'images"})
+    fig.update_layout(
+        plot_bgcolor=bg_color,
+        paper_bgcolor=bg_color,
+        font=dict(size=12 if not large_text else 16, color=text_color),
+        legend_title="Catégories principales",
+        legend=dict(font=dict(color=text_color)),
+        hoverlabel=dict(
+            bgcolor="white",
+            font_size=14 if not large_text else 16,
+            font_family="Arial, sans-serif",
+            font_color="black",
+            bordercolor="black"
+        )
+    )
+    fig.update_traces(
+        # En mode agrégé, la taille des marqueurs représente le nombre d'images
+        marker=dict(opacity=0.7) if binned else dict(size=8, opacity=0.7),
+        selector=dict(mode='markers')
+    )
+    fig.update_xaxes(
+        tickfont=dict(color=text_color, size=12 if not large_text else 16)
+    )
+    fig.update_yaxes(
+        tickfont=dict(color=text_color, size=12 if not large_text else 16)
+    )
+    return fig
+
+
+FIGURE_BUILDERS = {
+    'category_bar': build_category_bar,
+    'subcategory_pie': build_subcategory_pie,
+    'keyword_bar': build_keyword_bar,
+    'keyword_pie': build_keyword_pie,
+    'image_scatter': build_image_scatter
+}
+
+# Les 8 combinaisons possibles des options d'accessibilité
+ALL_ACCESSIBILITY_KEYS = list(product((False, True), repeat=3))
+
+
+class FigureFactory:
+    """
+    Mémorise le JSON des figures par (graphique, version des données, options d'accessibilité)
+    Au plus 8 variantes par graphique et par version, préchauffables en arrière-plan
+    """
+
+    def __init__(self, max_entries: int = 200):
+        """
+        Initialise la fabrique
+
+        Args:
+            max_entries (int): Nombre maximal de figures mémorisées (éviction LRU)
+        """
+        self.max_entries = max_entries
+        self._cache: 'OrderedDict[Tuple, str]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._prewarmed = set()
+        self.hits = 0
+        self.misses = 0
+
+    def get_json(self, chart: str, data_version: str, source: Any, key: AccessibilityKey) -> str:
+        """
+        JSON d'une figure, construit au premier appel puis mémorisé
+
+        Args:
+            chart (str): Nom du graphique (voir FIGURE_BUILDERS)
+            data_version (str): Version des données sources
+            source (Any): Données du graphique (utilisées seulement si la figure est absente)
+            key (AccessibilityKey): Options d'accessibilité
+
+        Returns:
+            str: Figure sérialisée
+        """
+        cache_key = (chart, data_version) + tuple(key)
+        with self._lock:
+            fig_json = self._cache.get(cache_key)
+            if fig_json is not None:
+                self._cache.move_to_end(cache_key)
+                self.hits += 1
+                return fig_json
+            self.misses += 1
+
+        fig_json = FIGURE_BUILDERS[chart](source, key).to_json()
+
+        with self._lock:
+            self._cache[cache_key] = fig_json
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return fig_json
+
+    def memory_bytes(self) -> int:
+        """Taille des figures mémorisées (JSON) en octets"""
+        with self._lock:
+            return sum(len(fig_json) for fig_json in self._cache.values())
+
+    def clear(self):
+        """Oublier les figures mémorisées (reconstruites à la demande)"""
+        with self._lock:
+            self._cache.clear()
+            self._prewarmed.clear()
+
+    def get_figure(self, chart: str, data_version: str, source: Any, key: AccessibilityKey):
+        """
+        Figure prête à afficher (désérialisée depuis le JSON mémorisé)
+
+        Args:
+            chart (str): Nom du graphique
+            data_version (str): Version des données sources
+            source (Any): Données du graphique
+            key (AccessibilityKey): Options d'accessibilité
+
+        Returns:
+            plotly.graph_objects.Figure: Figure Plotly
+        """
+        return pio.from_json(self.get_json(chart, data_version, source, key))
+
+    def prewarm(self, data_version: str, sources: Dict[str, Any]):
+        """
+        Construire en arrière-plan toutes les variantes d'accessibilité des graphiques
+
+        Args:
+            data_version (str): Version des données sources
+            sources (Dict[str, Any]): Données par graphique
+        """
+        with self._lock:
+            if data_version in self._prewarmed:
+                return
+            self._prewarmed.add(data_version)
+
+        def _run():
+            for chart, source in sources.items():
+                for key in ALL_ACCESSIBILITY_KEYS:
+                    try:
+                        self.get_json(chart, data_version, source, key)
+                    except Exception as e:
+                        print(f"⚠️ Préchauffage du graphique {chart} impossible: {str(e)}")
+
+        threading.Thread(target=_run, name="eda-figures-prewarm", daemon=True).start()
+
+
+@st.cache_resource
+def get_figure_factory() -> FigureFactory:
+    """
+    Obtenir la fabrique de graphiques partagée entre les sessions
+
+    Returns:
+        FigureFactory: Fabrique de graphiques
+    """
+    return FigureFactory()
@@ -0,0 +1,237 @@
+"""
+Agrégats précalculés pour la page d'analyse exploratoire
+Toutes les statistiques de la page EDA sont calculées une seule fois par version des données
+"""
+
+import os
+import hashlib
+import pickle
+from typing import Dict, Any
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+# Configuration
+SNAPSHOT_DIR = os.path.join('cache', 'eda')
+SNAPSHOT_FORMAT = 2
+
+# Catalogue source : sa version indexe les instantanés sans charger le DataFrame
+CATALOG_PATH = 'produits_original.csv'
+IMAGES_DIR = 'Images'
+REQUIRED_COLUMNS = ['main_category', 'sub_categories', 'image', 'image_exists', 'image_pixels', 'aspect_ratio']
+
+# Nombre de catégories illustrées par une image d'exemple
+SAMPLE_CATEGORIES = 3
+
+# Niveau de détail du nuage de points des images : au-delà de SCATTER_MAX_POINTS,
+# les points sont agrégés par cellule ('binned') ou échantillonnés par catégorie ('sample')
+SCATTER_MAX_POINTS = 5000
+SCATTER_BINS = 40
+SCATTER_LOD_MODE = os.getenv('EDA_SCATTER_LOD_MODE', 'binned')
+
+# Empreintes des fichiers déjà hachés : (chemin, date, taille) -> empreinte du contenu
+_file_hashes: Dict[tuple, str] = {}
+
+
+def catalog_file_version(csv_path: str = CATALOG_PATH, images_dir: str = IMAGES_DIR) -> str:
+    """
+    Version du catalogue sans le charger : date, taille et empreinte du CSV, date du dossier des images
+    L'empreinte du fichier n'est recalculée que si sa date ou sa taille change
+
+    Args:
+        csv_path (str): CSV des produits
+        images_dir (str): Dossier des images (un ajout ou une suppression change sa date)
+
+    Returns:
+        str: Version des données
+    """
+    stat = os.stat(csv_path)
+    key = (csv_path, stat.st_mtime_ns, stat.st_size)
+    content_hash = _file_hashes.get(key)
+    if content_hash is None:
+        digest = hashlib.sha1()
+        with open(csv_path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        content_hash = _file_hashes[key] = digest.hexdigest()
+    images_mtime = os.stat(images_dir).st_mtime_ns if os.path.isdir(images_dir) else 0
+    version = f"{SNAPSHOT_FORMAT}:{content_hash}:{stat.st_size}:{images_mtime}"
+    return hashlib.sha1(version.encode('utf-8')).hexdigest()[:16]
+
+
+def snapshot_version(catalog_version: str) -> str:
+    """
+    Version d'un instantané et de ses figures : version du catalogue et réglages du nuage de points
+    (changer EDA_SCATTER_LOD_MODE, le seuil ou la grille ne ressert jamais un ancien instantané)
+
+    Args:
+        catalog_version (str): Version du catalogue (catalog_file_version)
+
+    Returns:
+        str: Version de l'instantané
+    """
+    version = f"{catalog_version}:{SCATTER_LOD_MODE}:{SCATTER_MAX_POINTS}:{SCATTER_BINS}"
+    return hashlib.sha1(version.encode('utf-8')).hexdigest()[:16]
+
+
+def compute_scatter_lod(points: pd.DataFrame, max_points: int = SCATTER_MAX_POINTS,
+                        bins: int = SCATTER_BINS, mode: str = SCATTER_LOD_MODE) -> Dict[str, Any]:
+    """
+    Réduire le nuage de points ratio/pixels à une taille bornée
+
+    Args:
+        points (pd.DataFrame): Colonnes aspect_ratio, image_pixels et main_category
+        max_points (int): Nombre de points au-delà duquel les données sont réduites
+        bins (int): Nombre de cellules par axe en mode agrégé
+        mode (str): 'binned' (histogramme 2D par catégorie) ou 'sample' (échantillon stratifié)
+
+    Returns:
+        Dict[str, Any]: Mode retenu ('points', 'binned' ou 'sample'), données à tracer et nombre de points d'origine
+    """
+    n_points = len(points)
+    if n_points <= max_points:
+        return {'mode': 'points', 'data': points, 'n_points': n_points}
+
+    if mode == 'sample':
+        # Échantillon proportionnel à la taille de chaque catégorie (au moins un point par catégorie)
+        fraction = max_points / n_points
+        sizes = points['main_category'].value_counts()
+        quotas = sizes.apply(lambda size: min(size, max(1, int(round(size * fraction)))))
+        shuffled = points.sample(frac=1, random_state=42)
+        rank = shuffled.groupby('main_category').cumcount()
+        sampled = shuffled[rank < shuffled['main_category'].map(quotas)]
+        return {'mode': 'sample', 'data': sampled, 'n_points': n_points}
+
+    # Histogramme 2D commun à toutes les catégories : un point par cellule non vide,
+    # placé au barycentre de ses images et pondéré par leur nombre
+    x_edges = np.linspace(points['aspect_ratio'].min(), points['aspect_ratio'].max(), bins + 1)
+    y_edges = np.linspace(points['image_pixels'].min(), points['image_pixels'].max(), bins + 1)
+    binned = points.assign(
+        x_bin=np.clip(np.digitize(points['aspect_ratio'], x_edges) - 1, 0, bins - 1),
+        y_bin=np.clip(np.digitize(points['image_pixels'], y_edges) - 1, 0, bins - 1)
+    ).groupby(['main_category', 'x_bin', 'y_bin'], observed=True).agg(
+        aspect_ratio=('aspect_ratio', 'mean'),
+        image_pixels=('image_pixels', 'mean'),
+        count=('aspect_ratio', 'size')
+    ).reset_index(level='main_category').reset_index(drop=True)
+    return {'mode': 'binned', 'data': binned, 'n_points': n_points}
+
+
+def compute_eda_snapshot(df: pd.DataFrame) -> Dict[str, Any]:
+    """
+    Calculer toutes les statistiques affichées par la page EDA
+
+    Args:
+        df (pd.DataFrame): Catalogue traité (colonnes main_category, image_pixels, etc.)
+
+    Returns:
+        Dict[str, Any]: Agrégats prêts à afficher
+    """
+    numerical_cols = df.select_dtypes(include=['float64', 'int64']).columns
+    categorical_cols = df.select_dtypes(include=['object', 'bool']).columns
+
+    # Un seul masque pour toutes les catégories (au lieu d'un filtre booléen par catégorie)
+    valid_mask = df['image_exists'].astype(bool) & (df['image_pixels'] > 0)
+    sample_categories = list(df['main_category'].unique()[:SAMPLE_CATEGORIES])
+    valid_counts = df.loc[valid_mask, 'main_category'].value_counts()
+
+    image_availability = {}
+    sample_images = {}
+    for category in sample_categories:
+        image_availability[category] = int(valid_counts.get(category, 0))
+        filtered = df.loc[valid_mask & (df['main_category'] == category), 'image']
+        sample_images[category] = filtered.sample(n=1, random_state=42).iloc[0] if not filtered.empty else None
+
+    valid_image_df = df[df['image_pixels'] > 0][['image_pixels', 'aspect_ratio']]
+
+    return {
+        'format': SNAPSHOT_FORMAT,
+        'columns': list(df.columns),
+        'n_rows': len(df),
+        'missing_values': df.isna().sum(),
+        'numerical_describe': df[numerical_cols].describe() if not numerical_cols.empty else None,
+        'categorical_describe': df[categorical_cols].describe() if not categorical_cols.empty else None,
+        'category_count': df['main_category'].value_counts(),
+        'subcat_count': df['sub_categories'].value_counts().head(20),
+        'image_availability': image_availability,
+        'sample_images': sample_images,
+        'n_valid_images': len(valid_image_df),
+        'valid_image_describe': valid_image_df.describe() if not valid_image_df.empty else None,
+        'scatter': compute_scatter_lod(valid_image_df.assign(main_category=df.loc[valid_image_df.index, 'main_category'])),
+        'invalid_images': df[df['image_pixels'] <= 0][['image', 'main_category', 'image_pixels']]
+    }
+
+
+def _snapshot_path(data_version: str) -> str:
+    return os.path.join(SNAPSHOT_DIR, f"eda_snapshot_{data_version}.pkl")
+
+
+def load_snapshot(data_version: str):
+    """
+    Charger un instantané depuis le disque
+
+    Args:
+        data_version (str): Version des données
+
+    Returns:
+        Dict[str, Any]: Instantané, ou None s'il est absent ou d'un autre format
+    """
+    path = _snapshot_path(data_version)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'rb') as f:
+            snapshot = pickle.load(f)
+        return snapshot if snapshot.get('format') == SNAPSHOT_FORMAT else None
+    except Exception as e:
+        print(f"⚠️ Instantané EDA illisible ({path}): {str(e)}")
+        return None
+
+
+def save_snapshot(data_version: str, snapshot: Dict[str, Any]):
+    """
+    Sauvegarder un instantané sur le disque (écriture atomique)
+
+    Args:
+        data_version (str): Version des données
+        snapshot (Dict[str, Any]): Instantané à sauvegarder
+    """
+    path = _snapshot_path(data_version)
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+@st.cache_data(show_spinner=False)
+def get_eda_snapshot(data_version: str, _load_df) -> Dict[str, Any]:
+    """
+    Obtenir l'instantané EDA d'une version des données
+    Partagé entre les sessions et persisté sur le disque ; le catalogue n'est chargé et traité qu'en cas d'absence
+
+    Args:
+        data_version (str): Version de l'instantané (clé du cache, voir snapshot_version)
+        _load_df (callable): Fonction sans argument qui renvoie le catalogue traité (non hachée par Streamlit)
+
+    Returns:
+        Dict[str, Any]: Agrégats prêts à afficher
+
+    Raises:
+        ValueError: Catalogue vide, illisible ou incomplet (rien n'est mis en cache)
+    """
+    snapshot = load_snapshot(data_version)
+    if snapshot is None:
+        df = _load_df()
+        if df.empty:
+            raise ValueError("catalogue vide ou illisible")
+        missing_columns = [col for col in REQUIRED_COLUMNS if col not in df.columns]
+        if missing_columns:
+            raise ValueError(f"colonnes manquantes dans le catalogue : {missing_columns}")
+        snapshot = compute_eda_snapshot(df)
+        try:
+            save_snapshot(data_version, snapshot)
+        except OSError as e:
+            print(f"⚠️ Impossible de sauvegarder l'instantané EDA: {str(e)}")
+    return snapshot
@@ -0,0 +1,250 @@
+"""
+Rendu mis en cache du nuage de mots de la page d'analyse exploratoire
+Les images PNG sont produites une seule fois par version des mots-clés et mode d'affichage,
+dans un thread de travail, sans utiliser l'état global de pyplot
+"""
+
+import io
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future
+from itertools import product
+from typing import Dict, Tuple
+
+import streamlit as st
+
+# Configuration
+WORDCLOUD_CACHE_DIR = os.path.join('cache', 'wordcloud')
+
+# (palette, contraste élevé, texte agrandi)
+WordCloudKey = Tuple[str, bool, bool]
+
+
+def wordcloud_key(accessibility: Dict[str, bool]) -> WordCloudKey:
+    """
+    Mode d'affichage du nuage de mots à partir des options d'accessibilité
+
+    Args:
+        accessibility (Dict[str, bool]): Options d'accessibilité
+
+    Returns:
+        WordCloudKey: (palette, contraste élevé, texte agrandi)
+    """
+    high_contrast = bool(accessibility.get('high_contrast', False))
+    # Choisir la palette en fonction du mode d'accessibilité
+    if accessibility.get('color_blind', False):
+        colormap = 'viridis'
+    elif high_contrast:
+        colormap = 'hot'
+    else:
+        colormap = 'plasma'
+    return colormap, high_contrast, bool(accessibility.get('large_text', False))
+
+
+def render_wordcloud_png(frequencies: Dict[str, int], key: WordCloudKey) -> bytes:
+    """
+    Générer le nuage de mots au format PNG
+
+    Args:
+        frequencies (Dict[str, int]): Fréquence de chaque mot-clé
+        key (WordCloudKey): Mode d'affichage
+
+    Returns:
+        bytes: Image PNG
+    """
+    # Imports lourds limités au rendu (jamais exécutés quand l'image est en cache)
+    from wordcloud import WordCloud
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    colormap, high_contrast, large_text = key
+    wordcloud = WordCloud(
+        width=800,
+        height=400,
+        background_color='black' if high_contrast else 'white',
+        colormap=colormap,
+        contour_color='white' if high_contrast else 'black',
+        contour_width=1
+    ).generate_from_frequencies(frequencies)
+
+    # Figure indépendante de pyplot : aucun état global partagé entre les sessions
+    fig = Figure(figsize=(10, 5))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot(111)
+    ax.imshow(wordcloud, interpolation='bilinear')
+    ax.axis('off')
+    ax.set_title("Nuage de Mots des Mots-Clés les Plus Fréquents",
+                 fontsize=16 if not large_text else 20,
+                 pad=20,
+                 color='white' if high_contrast else 'black')
+
+    # Appliquer le fond sombre en mode contraste élevé
+    if high_contrast:
+        ax.set_facecolor('black')
+        fig.set_facecolor('black')
+
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', facecolor=fig.get_facecolor())
+    return buffer.getvalue()
+
+
+class WordCloudRenderer:
+    """
+    Cache des images du nuage de mots (mémoire + disque) avec rendu dans un thread de travail
+    Les demandes simultanées d'une même image partagent un seul rendu ; l'image demandée par la page a son propre
+    thread et n'attend jamais derrière le préchauffage des autres modes d'affichage
+    """
+
+    def __init__(self, max_entries: int = 32, cache_dir: str = WORDCLOUD_CACHE_DIR):
+        """
+        Initialise le moteur de rendu
+
+        Args:
+            max_entries (int): Nombre maximal d'images gardées en mémoire
+            cache_dir (str): Dossier de persistance des images (None pour désactiver)
+        """
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self._images: 'OrderedDict[Tuple, bytes]' = OrderedDict()
+        self._pending: Dict[Tuple, Future] = {}
+        # Rendus en attente issus du préchauffage (annulables tant qu'ils n'ont pas commencé)
+        self._background = set()
+        self._prewarmed = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="wordcloud")
+        self._prewarm_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="wordcloud-prewarm")
+
+    def _disk_path(self, cache_key: Tuple) -> str:
+        name = hashlib.sha1(repr(cache_key).encode('utf-8')).hexdigest()[:20]
+        return os.path.join(self.cache_dir, f"wordcloud_{name}.png")
+
+    def _store(self, cache_key: Tuple, png: bytes):
+        with self._lock:
+            self._images[cache_key] = png
+            self._images.move_to_end(cache_key)
+            while len(self._images) > self.max_entries:
+                self._images.popitem(last=False)
+            self._pending.pop(cache_key, None)
+            self._background.discard(cache_key)
+
+    def _render(self, cache_key: Tuple, frequencies: Dict[str, int], key: WordCloudKey) -> bytes:
+        png = render_wordcloud_png(frequencies, key)
+        if self.cache_dir:
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                path = self._disk_path(cache_key)
+                with open(f"{path}.tmp", 'wb') as f:
+                    f.write(png)
+                os.replace(f"{path}.tmp", path)
+            except OSError as e:
+                print(f"⚠️ Impossible de sauvegarder le nuage de mots: {str(e)}")
+        self._store(cache_key, png)
+        return png
+
+    def memory_bytes(self) -> int:
+        """Taille des images gardées en mémoire en octets"""
+        with self._lock:
+            return sum(len(png) for png in self._images.values())
+
+    def clear(self):
+        """Oublier les images en mémoire (elles restent relisibles depuis le disque)"""
+        with self._lock:
+            self._images.clear()
+
+    def submit(self, data_version: str, frequencies: Dict[str, int], key: WordCloudKey,
+               background: bool = False) -> Future:
+        """
+        Demander une image (immédiate si elle est en cache, sinon rendue dans un thread de travail)
+
+        Args:
+            data_version (str): Version des mots-clés
+            frequencies (Dict[str, int]): Fréquence de chaque mot-clé
+            key (WordCloudKey): Mode d'affichage
+            background (bool): Rendu de préchauffage (file séparée, cédé à une demande de la page)
+
+        Returns:
+            Future: Résultat contenant l'image PNG
+        """
+        cache_key = (data_version,) + tuple(key)
+        with self._lock:
+            png = self._images.get(cache_key)
+            if png is not None:
+                self._images.move_to_end(cache_key)
+            pending = self._pending.get(cache_key)
+        if png is not None:
+            future = Future()
+            future.set_result(png)
+            return future
+        if pending is not None and (background or cache_key not in self._background):
+            return pending
+
+        # Image persistée lors d'une exécution précédente
+        if self.cache_dir and os.path.exists(self._disk_path(cache_key)):
+            try:
+                with open(self._disk_path(cache_key), 'rb') as f:
+                    png = f.read()
+                self._store(cache_key, png)
+                future = Future()
+                future.set_result(png)
+                return future
+            except OSError:
+                pass
+
+        with self._lock:
+            pending = self._pending.get(cache_key)
+            # Demande de la page pour une image encore en file de préchauffage : reprise dans le thread prioritaire
+            promote = pending is not None and not background and cache_key in self._background and pending.cancel()
+            if pending is None or promote:
+                executor = self._prewarm_executor if background else self._executor
+                pending = executor.submit(self._render, cache_key, dict(frequencies), key)
+                self._pending[cache_key] = pending
+                if background:
+                    self._background.add(cache_key)
+                else:
+                    self._background.discard(cache_key)
+        return pending
+
+    def get_png(self, data_version: str, frequencies: Dict[str, int], key: WordCloudKey, timeout: float = 60) -> bytes:
+        """
+        Obtenir l'image PNG du nuage de mots
+
+        Args:
+            data_version (str): Version des mots-clés
+            frequencies (Dict[str, int]): Fréquence de chaque mot-clé
+            key (WordCloudKey): Mode d'affichage
+            timeout (float): Attente maximale du rendu en secondes
+
+        Returns:
+            bytes: Image PNG
+        """
+        return self.submit(data_version, frequencies, key).result(timeout=timeout)
+
+    def prewarm(self, data_version: str, frequencies: Dict[str, int]):
+        """
+        Mettre en file de préchauffage le rendu de tous les modes d'affichage (palette x contraste x texte agrandi)
+        Une seule fois par version : les reruns suivants ne refont ni la file ni les vérifications du cache
+
+        Args:
+            data_version (str): Version des mots-clés
+            frequencies (Dict[str, int]): Fréquence de chaque mot-clé
+        """
+        with self._lock:
+            if data_version in self._prewarmed:
+                return
+            self._prewarmed.add(data_version)
+        for color_blind, high_contrast, large_text in product((False, True), repeat=3):
+            key = wordcloud_key({'color_blind': color_blind, 'high_contrast': high_contrast, 'large_text': large_text})
+            self.submit(data_version, frequencies, key, background=True)
+
+
+@st.cache_resource
+def get_wordcloud_renderer() -> WordCloudRenderer:
+    """
+    Obtenir le moteur de rendu du nuage de mots partagé entre les sessions
+
+    Returns:
+        WordCloudRenderer: Moteur de rendu
+    """
+    return WordCloudRenderer()
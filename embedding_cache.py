@@ -0,0 +1,139 @@
+"""
+Caches LRU d'embeddings indexés par empreinte de contenu
+Les vecteurs sont stockés en float16 et le cache est borné en octets
+"""
+
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+from lazy_imports import lazy_import
+
+# NumPy importé à la première écriture (import du module sans coût pour le moteur local)
+np = lazy_import('numpy')
+
+# Tailles maximales par défaut (un embedding CLIP ViT-B/32 en float16 occupe 1 Ko)
+IMAGE_CACHE_MAX_BYTES = int(os.getenv('IMAGE_EMBEDDING_CACHE_MB', '32')) * 1024 * 1024
+TEXT_CACHE_MAX_BYTES = int(os.getenv('TEXT_EMBEDDING_CACHE_MB', '8')) * 1024 * 1024
+
+
+def image_content_key(image) -> str:
+    """
+    Empreinte du contenu d'une image prétraitée (pixels, taille et mode)
+
+    Args:
+        image (Image.Image): Image prétraitée
+
+    Returns:
+        str: Clé de cache
+    """
+    digest = hashlib.sha1()
+    digest.update(f"{image.mode}:{image.size}".encode('utf-8'))
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+def text_content_key(text: str) -> str:
+    """
+    Empreinte d'un texte prétraité
+
+    Args:
+        text (str): Texte de mots-clés
+
+    Returns:
+        str: Clé de cache
+    """
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Cache LRU thread-safe de vecteurs float16, borné par le nombre total d'octets
+    """
+
+    def __init__(self, max_bytes: int, name: str = 'embeddings'):
+        """
+        Args:
+            max_bytes (int): Taille maximale du cache en octets
+            name (str): Nom affiché dans les statistiques
+        """
+        self.max_bytes = max_bytes
+        self.name = name
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional['np.ndarray']:
+        """
+        Lire un embedding (et le marquer comme récemment utilisé)
+
+        Args:
+            key (str): Empreinte du contenu
+
+        Returns:
+            np.ndarray: Vecteur float16, ou None s'il est absent
+        """
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def put(self, key: str, vector: 'np.ndarray'):
+        """
+        Stocker un embedding en float16 en évinçant les plus anciens au-delà de max_bytes
+
+        Args:
+            key (str): Empreinte du contenu
+            vector (np.ndarray): Vecteur à stocker
+        """
+        vector = np.ascontiguousarray(vector, dtype=np.float16)
+        if vector.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.current_bytes -= previous.nbytes
+            self._entries[key] = vector
+            self.current_bytes += vector.nbytes
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= evicted.nbytes
+                self.evictions += 1
+
+    def clear(self):
+        """Vider le cache"""
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Statistiques d'utilisation du cache
+
+        Returns:
+            Dict[str, Any]: Entrées, octets, succès, échecs et évictions
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'name': self.name,
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions
+            }
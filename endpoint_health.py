@@ -0,0 +1,183 @@
+"""
+Sonde de santé de l'endpoint Azure ML en arrière-plan
+Vérifie /health à intervalle adaptatif et garde une fenêtre glissante de disponibilité et de latence,
+pour répondre instantanément sur l'état de l'endpoint et éviter d'attendre un endpoint hors service
+"""
+
+import os
+import time
+import threading
+from collections import deque
+from statistics import median
+from typing import Dict, Any, Optional
+
+from lazy_imports import lazy_import
+from client_metrics import get_client_metrics
+
+requests = lazy_import('requests')
+
+# Activation de la sonde dans le client partagé de l'application (HEALTH_PROBE=0 pour la désactiver)
+PROBE_ENABLED = os.getenv('HEALTH_PROBE', '1').lower() in ('1', 'true', 'yes')
+
+# Intervalles (s) : sonde rapide après un changement d'état, espacée progressivement tant que l'état est stable
+MIN_INTERVAL_S = float(os.getenv('HEALTH_PROBE_MIN_INTERVAL_S', '2'))
+MAX_INTERVAL_S = float(os.getenv('HEALTH_PROBE_MAX_INTERVAL_S', '60'))
+PROBE_TIMEOUT_S = float(os.getenv('HEALTH_PROBE_TIMEOUT_S', '5'))
+
+# Fenêtre glissante des dernières sondes, et échecs consécutifs au-delà desquels l'endpoint est considéré hors service
+WINDOW_SIZE = int(os.getenv('HEALTH_WINDOW_SIZE', '20'))
+DOWN_AFTER_FAILURES = int(os.getenv('HEALTH_DOWN_AFTER_FAILURES', '2'))
+
+# Endpoint dégradé : disponibilité de la fenêtre inférieure au seuil ou latence médiane au-delà
+DEGRADED_AVAILABILITY = 0.8
+DEGRADED_LATENCY_MS = float(os.getenv('HEALTH_DEGRADED_LATENCY_MS', '2000'))
+
+
+def health_url(endpoint_url: str) -> str:
+    """URL de santé correspondant à l'URL de scoring"""
+    return endpoint_url.replace('/score', '/health')
+
+
+class EndpointHealthProber:
+    """
+    Thread de sonde de /health partagé par toutes les sessions (un par client mis en cache)
+    """
+
+    def __init__(self, endpoint_url: str, min_interval_s: float = MIN_INTERVAL_S,
+                 max_interval_s: float = MAX_INTERVAL_S, timeout_s: float = PROBE_TIMEOUT_S, session=None):
+        """
+        Args:
+            endpoint_url (str): URL de scoring de l'endpoint
+            min_interval_s (float): Intervalle après un changement d'état ou un échec
+            max_interval_s (float): Intervalle maximal quand l'état est stable
+            timeout_s (float): Délai maximal d'une sonde
+            session (requests.Session): Session du client (les sondes gardent ses connexions ouvertes)
+        """
+        self.url = health_url(endpoint_url)
+        self.min_interval_s = min_interval_s
+        self.max_interval_s = max_interval_s
+        self.timeout_s = timeout_s
+        self.interval_s = min_interval_s
+        self._window = deque(maxlen=WINDOW_SIZE)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._session = session
+        self.state = 'unknown'
+        self.consecutive_failures = 0
+        self.last_checked: Optional[float] = None
+        self.last_status_code: Optional[int] = None
+        self.last_error: Optional[str] = None
+        self.next_probe_at: Optional[float] = None
+
+    def start(self) -> 'EndpointHealthProber':
+        """Démarrer la sonde (première vérification immédiate)"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='endpoint-health', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.probe()
+            self.next_probe_at = time.time() + self.interval_s
+            self._wake.wait(self.interval_s)
+            self._wake.clear()
+
+    def probe(self) -> bool:
+        """
+        Vérifier /health une fois et mettre à jour l'état
+
+        Returns:
+            bool: True si l'endpoint a répondu 200
+        """
+        if self._session is None:
+            self._session = requests.Session()
+        start = time.perf_counter()
+        status_code, error = None, None
+        try:
+            response = self._session.get(self.url, timeout=self.timeout_s)
+            status_code = response.status_code
+            ok = status_code == 200
+        except Exception as e:
+            ok, error = False, str(e)
+        elapsed = time.perf_counter() - start
+        metrics = get_client_metrics()
+        metrics.observe('health_probe', elapsed)
+        metrics.increment('health_probes', ok=ok)
+        self._record(ok, elapsed * 1000, status_code, error)
+        return ok
+
+    def _record(self, ok: bool, latency_ms: float, status_code: Optional[int], error: Optional[str]):
+        with self._lock:
+            previous = self.state
+            self._window.append((time.time(), ok, latency_ms))
+            self.last_checked = time.time()
+            self.last_status_code = status_code
+            self.last_error = error
+            self.consecutive_failures = 0 if ok else self.consecutive_failures + 1
+            self.state = self._compute_state()
+            if self.state != previous or not ok:
+                # Changement d'état ou échec : revérifier vite (en reculant si l'endpoint reste hors service)
+                if self.state == 'down' and previous == 'down':
+                    self.interval_s = min(self.interval_s * 2, self.max_interval_s / 2)
+                else:
+                    self.interval_s = self.min_interval_s
+            else:
+                # État stable : espacer progressivement les sondes
+                self.interval_s = min(self.interval_s * 2, self.max_interval_s)
+        if self.state != previous:
+            print(f"🩺 Endpoint {self.url}: {previous} → {self.state}")
+
+    def _compute_state(self) -> str:
+        if self.consecutive_failures >= DOWN_AFTER_FAILURES:
+            return 'down'
+        availability, latency_p50 = self._availability(), self._latency_p50()
+        if availability < DEGRADED_AVAILABILITY or (latency_p50 or 0) > DEGRADED_LATENCY_MS:
+            return 'degraded'
+        return 'healthy'
+
+    def _availability(self) -> float:
+        return sum(ok for _, ok, _ in self._window) / len(self._window) if self._window else 0.0
+
+    def _latency_p50(self) -> Optional[float]:
+        latencies = [latency for _, ok, latency in self._window if ok]
+        return median(latencies) if latencies else None
+
+    def report_failure(self):
+        """Signaler l'échec d'un appel réel à /score : la sonde revérifie immédiatement"""
+        if self._thread is not None:
+            self._wake.set()
+
+    def is_down(self) -> bool:
+        """L'endpoint est-il connu comme hors service (les prédictions passent directement au repli)"""
+        return self.state == 'down'
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        État courant de la sonde, sans appel réseau
+
+        Returns:
+            Dict[str, Any]: État, disponibilité et latences de la fenêtre, dernière vérification et prochaine sonde
+        """
+        with self._lock:
+            latencies = sorted(latency for _, ok, latency in self._window if ok)
+            return {
+                'state': self.state,
+                'url': self.url,
+                'availability': self._availability(),
+                'probes': len(self._window),
+                'latency_ms_p50': median(latencies) if latencies else None,
+                'latency_ms_p95': latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))] if latencies else None,
+                'consecutive_failures': self.consecutive_failures,
+                'last_checked': self.last_checked,
+                'last_status_code': self.last_status_code,
+                'last_error': self.last_error,
+                'interval_s': self.interval_s,
+                'next_probe_in_s': max(0.0, self.next_probe_at - time.time()) if self.next_probe_at else None
+            }
@@ -0,0 +1,362 @@
+"""
+Moteur de fréquences de mots-clés du catalogue
+Comptage incrémental basé sur l'extraction de mots-clés identique au notebook
+"""
+
+import os
+import json
+import gzip
+import hashlib
+import threading
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Tuple
+
+import pandas as pd
+import streamlit as st
+
+from eda_snapshot import CATALOG_PATH, catalog_file_version
+
+# Configuration
+KEYWORD_FREQ_PATH = 'keyword_frequencies.csv'
+KEYWORD_COUNTS_PATH = os.path.join('cache', 'keyword_counts.json.gz')
+
+# En dessous de ce nombre de produits, le coût de démarrage des processus dépasse le gain
+PARALLEL_MIN_PRODUCTS = 200
+CHUNK_SIZE = 64
+
+def _field(value) -> str:
+    """Convertir une valeur du CSV en chaîne (NaN -> chaîne vide)"""
+    return str(value) if pd.notna(value) else ''
+
+
+def product_fields(row) -> Tuple[str, str, str, str]:
+    """
+    Extraire les champs texte d'un produit dans l'ordre attendu par le prétraitement
+
+    Args:
+        row: Ligne du DataFrame (schéma de produits_original.csv)
+
+    Returns:
+        Tuple[str, str, str, str]: (marque, nom, description, spécifications)
+    """
+    return (
+        _field(row.get('brand')),
+        _field(row.get('product_name')),
+        _field(row.get('description')),
+        _field(row.get('product_specifications'))
+    )
+
+
+def product_fingerprint(fields: Tuple[str, str, str, str]) -> str:
+    """Empreinte du contenu texte d'un produit (détecte les produits modifiés)"""
+    return hashlib.sha1('\x1f'.join(fields).encode('utf-8')).hexdigest()[:16]
+
+
+def extract_product_keywords(fields: Tuple[str, str, str, str]) -> List[str]:
+    """
+    Extraire les mots-clés d'un produit comme dans le notebook (colonne 'keywords')
+
+    Args:
+        fields (Tuple[str, str, str, str]): (marque, nom, description, spécifications)
+
+    Returns:
+        List[str]: Mots-clés du produit
+    """
+    from azure_client import AzureMLClient
+
+    # Fonctions de prétraitement du notebook appelées sans créer de client
+    keywords = AzureMLClient._keywords_like_notebook(*fields)
+    if not keywords or keywords == 'no_keywords_found':
+        return []
+    return keywords.split(', ')
+
+
+def _extract_chunk(chunk: List[Tuple[str, Tuple[str, str, str, str]]]) -> List[Tuple[str, List[str]]]:
+    """Extraire les mots-clés d'un lot de produits (exécuté dans un processus de travail)"""
+    return [(uid, extract_product_keywords(fields)) for uid, fields in chunk]
+
+
+def _extract_all(items: List[Tuple[str, Tuple[str, str, str, str]]], max_workers=None) -> List[Tuple[str, List[str]]]:
+    """
+    Extraire les mots-clés d'une liste de produits, en parallèle si le volume le justifie
+
+    Args:
+        items (List): Paires (uniq_id, champs texte)
+        max_workers (int): Nombre de processus (None = nombre de CPU, 1 = séquentiel)
+
+    Returns:
+        List[Tuple[str, List[str]]]: Paires (uniq_id, mots-clés)
+    """
+    if len(items) < PARALLEL_MIN_PRODUCTS or max_workers == 1:
+        return _extract_chunk(items)
+
+    chunks = [items[i:i + CHUNK_SIZE] for i in range(0, len(items), CHUNK_SIZE)]
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = []
+            for chunk_result in executor.map(_extract_chunk, chunks):
+                results.extend(chunk_result)
+            return results
+    except Exception as e:
+        # Environnement sans multiprocessing (ex. certains hébergements) : repli séquentiel
+        print(f"⚠️ Extraction parallèle impossible, repli séquentiel: {str(e)}")
+        return _extract_chunk(items)
+
+
+class KeywordFrequencyEngine:
+    """
+    Fréquences des mots-clés du catalogue avec mise à jour incrémentale
+    Chaque produit conserve ses mots-clés, ce qui permet d'ajouter ou retirer
+    des produits sans recompter tout le catalogue
+    """
+
+    def __init__(self):
+        """Initialise un moteur vide"""
+        self._lock = threading.RLock()
+        self._vocabulary: List[str] = []
+        self._word_index: Dict[str, int] = {}
+        self._counts: Counter = Counter()
+        # uniq_id -> (empreinte du texte, indices des mots-clés dans le vocabulaire)
+        self._products: Dict[str, Tuple[str, List[int]]] = {}
+        self._version = None
+        # Version du catalogue lors de la dernière synchronisation
+        self.synced_catalog_version = None
+
+    def __len__(self) -> int:
+        return len(self._products)
+
+    @property
+    def data_version(self) -> str:
+        """Version des données comptées (change dès qu'un produit est ajouté, modifié ou retiré)"""
+        with self._lock:
+            if self._version is None:
+                digest = hashlib.sha1()
+                for uid in sorted(self._products):
+                    digest.update(f"{uid}:{self._products[uid][0]};".encode('utf-8'))
+                self._version = digest.hexdigest()[:16]
+            return self._version
+
+    def _word_id(self, word: str) -> int:
+        """Indice d'un mot dans le vocabulaire (ajouté si absent)"""
+        idx = self._word_index.get(word)
+        if idx is None:
+            idx = len(self._vocabulary)
+            self._vocabulary.append(word)
+            self._word_index[word] = idx
+        return idx
+
+    def _add(self, uid: str, fingerprint: str, keywords: List[str]):
+        ids = [self._word_id(word) for word in keywords]
+        self._products[uid] = (fingerprint, ids)
+        self._counts.update(ids)
+
+    def _remove(self, uid: str):
+        _, ids = self._products.pop(uid)
+        self._counts.subtract(ids)
+
+    def add_products(self, df: pd.DataFrame, max_workers=None) -> int:
+        """
+        Ajouter ou mettre à jour des produits (seuls les produits nouveaux ou modifiés sont traités)
+
+        Args:
+            df (pd.DataFrame): Produits au format de produits_original.csv
+            max_workers (int): Nombre de processus pour l'extraction
+
+        Returns:
+            int: Nombre de produits (re)comptés
+        """
+        pending = {}
+        with self._lock:
+            for row in df.to_dict('records'):
+                uid = _field(row.get('uniq_id'))
+                if not uid:
+                    continue
+                fields = product_fields(row)
+                fingerprint = product_fingerprint(fields)
+                known = self._products.get(uid)
+                if known is None or known[0] != fingerprint:
+                    pending[uid] = (fingerprint, fields)
+
+        if not pending:
+            return 0
+
+        extracted = _extract_all([(uid, fields) for uid, (_, fields) in pending.items()], max_workers=max_workers)
+
+        with self._lock:
+            for uid, keywords in extracted:
+                if uid in self._products:
+                    self._remove(uid)
+                self._add(uid, pending[uid][0], keywords)
+            self._version = None
+        return len(extracted)
+
+    def remove_products(self, uniq_ids: Iterable[str]) -> int:
+        """
+        Retirer des produits du comptage
+
+        Args:
+            uniq_ids (Iterable[str]): Identifiants des produits à retirer
+
+        Returns:
+            int: Nombre de produits retirés
+        """
+        removed = 0
+        with self._lock:
+            for uid in uniq_ids:
+                if uid in self._products:
+                    self._remove(uid)
+                    removed += 1
+            if removed:
+                self._version = None
+        return removed
+
+    def sync(self, df: pd.DataFrame, max_workers=None) -> Dict[str, int]:
+        """
+        Aligner le comptage sur le catalogue courant (ajouts, modifications et suppressions)
+
+        Args:
+            df (pd.DataFrame): Catalogue complet
+            max_workers (int): Nombre de processus pour l'extraction
+
+        Returns:
+            Dict[str, int]: Nombre de produits retirés et (re)comptés
+        """
+        live_ids = set(df['uniq_id'].dropna().astype(str)) if 'uniq_id' in df.columns else set()
+        with self._lock:
+            stale = [uid for uid in self._products if uid not in live_ids]
+        removed = self.remove_products(stale)
+        updated = self.add_products(df, max_workers=max_workers)
+        return {'removed': removed, 'updated': updated}
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """
+        Fréquences au format de keyword_frequencies.csv
+
+        Returns:
+            pd.DataFrame: Colonnes 'Mot Clé' et 'Fréquence', triées par fréquence décroissante
+        """
+        with self._lock:
+            rows = [(self._vocabulary[idx], count) for idx, count in self._counts.items() if count > 0]
+        rows.sort(key=lambda item: (-item[1], item[0]))
+        return pd.DataFrame(rows, columns=['Mot Clé', 'Fréquence'])
+
+    def export_csv(self, path: str = KEYWORD_FREQ_PATH):
+        """Écrire les fréquences au format de keyword_frequencies.csv"""
+        self.to_dataframe().to_csv(path, index=False, encoding='utf-8')
+
+    def save(self, path: str = KEYWORD_COUNTS_PATH):
+        """
+        Sauvegarder l'état sous forme compacte (vocabulaire + indices par produit, JSON gzip)
+
+        Args:
+            path (str): Chemin du fichier de sauvegarde
+        """
+        with self._lock:
+            # Compacter le vocabulaire : seuls les mots encore utilisés sont conservés
+            used = sorted({idx for _, ids in self._products.values() for idx in ids})
+            remap = {old: new for new, old in enumerate(used)}
+            state = {
+                'format': 1,
+                'catalog_version': self.synced_catalog_version,
+                'vocabulary': [self._vocabulary[idx] for idx in used],
+                'products': {uid: [fp, [remap[idx] for idx in ids]] for uid, (fp, ids) in self._products.items()}
+            }
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str = KEYWORD_COUNTS_PATH) -> 'KeywordFrequencyEngine':
+        """
+        Charger un état sauvegardé (moteur vide si le fichier est absent ou illisible)
+
+        Args:
+            path (str): Chemin du fichier de sauvegarde
+
+        Returns:
+            KeywordFrequencyEngine: Moteur restauré
+        """
+        engine = cls()
+        if not os.path.exists(path):
+            return engine
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                state = json.load(f)
+            engine._vocabulary = list(state['vocabulary'])
+            engine._word_index = {word: idx for idx, word in enumerate(engine._vocabulary)}
+            for uid, (fingerprint, ids) in state['products'].items():
+                engine._products[uid] = (fingerprint, ids)
+                engine._counts.update(ids)
+            engine.synced_catalog_version = state.get('catalog_version')
+        except Exception as e:
+            print(f"⚠️ État des mots-clés illisible, recomptage complet: {str(e)}")
+            engine = cls()
+        return engine
+
+
+@st.cache_resource
+def get_keyword_engine() -> KeywordFrequencyEngine:
+    """
+    Obtenir le moteur de fréquences partagé entre les sessions
+
+    Returns:
+        KeywordFrequencyEngine: Moteur restauré depuis le disque
+    """
+    return KeywordFrequencyEngine.load()
+
+
+def get_live_keyword_frequencies(load_df, catalog_version: str = None) -> pd.DataFrame:
+    """
+    Fréquences des mots-clés alignées sur le catalogue courant
+    Extraction séquentielle dans le processus : pas de processus de travail lancés depuis le serveur Streamlit
+    (multi-thread, fork risqué) ; le recomptage parallèle reste réservé à la ligne de commande
+
+    Args:
+        load_df (callable): Fonction sans argument qui renvoie le catalogue courant
+        catalog_version (str): Version du catalogue ; si elle n'a pas changé depuis la dernière synchronisation
+            (y compris celle de l'état sauvegardé), le catalogue n'est pas chargé
+
+    Returns:
+        pd.DataFrame: Colonnes 'Mot Clé' et 'Fréquence'
+    """
+    engine = get_keyword_engine()
+    if catalog_version is None or engine.synced_catalog_version != catalog_version:
+        changes = engine.sync(load_df(), max_workers=1)
+        engine.synced_catalog_version = catalog_version
+        if changes['removed'] or changes['updated'] or catalog_version is not None:
+            try:
+                engine.save()
+            except OSError as e:
+                print(f"⚠️ Impossible de sauvegarder les fréquences de mots-clés: {str(e)}")
+    return engine.to_dataframe()
+
+
+def main():
+    """Régénérer keyword_frequencies.csv depuis le catalogue"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Régénérer les fréquences de mots-clés du catalogue")
+    parser.add_argument('--csv', default=CATALOG_PATH, help="Catalogue des produits")
+    parser.add_argument('--output', default=KEYWORD_FREQ_PATH, help="Fichier CSV de sortie")
+    parser.add_argument('--state', default=KEYWORD_COUNTS_PATH, help="État incrémental (JSON gzip)")
+    parser.add_argument('--workers', type=int, default=None, help="Nombre de processus")
+    parser.add_argument('--full', action='store_true', help="Ignorer l'état existant et tout recompter")
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.csv)
+    engine = KeywordFrequencyEngine() if args.full else KeywordFrequencyEngine.load(args.state)
+    changes = engine.sync(df, max_workers=args.workers)
+    if args.csv == CATALOG_PATH:
+        # État directement réutilisable par la page EDA (même version du catalogue)
+        engine.synced_catalog_version = catalog_file_version()
+    engine.save(args.state)
+    engine.export_csv(args.output)
+    print(f"✅ {len(engine)} produits comptés ({changes['updated']} recomptés, {changes['removed']} retirés)")
+    print(f"✅ Fréquences des mots-clés sauvegardées dans {args.output}")
+
+
+if __name__ == "__main__":
+    main()
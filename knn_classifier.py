@@ -0,0 +1,435 @@
+"""
+Classification par vote pondéré des k plus proches voisins du catalogue
+Niveau de repli rapide : embeddings précalculés et confiance calibrée hors ligne (validation leave-one-out)
+"""
+
+import os
+import json
+import time
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+from catalog_embeddings import (EMBEDDING_STORE_DIR, CatalogEmbeddingStore, combine_embeddings, get_catalog_store,
+                                similarity_matrix)
+
+# Configuration
+KNN_K = int(os.getenv('KNN_K', '15'))
+KNN_SOURCE = 'local_knn_vote'
+CALIBRATION_FILE = 'knn_calibration.json'
+BENCHMARK_PATH = os.path.join('cache', 'knn_benchmark.json')
+
+# Requêtes traitées à la fois par la calibration leave-one-out (jamais de matrice n x n complète)
+QUERY_BLOCK_ROWS = 1024
+
+# Grilles de calibration : température des poids exp(similarité / T) et lissage additif des votes
+TEMPERATURE_GRID = np.geomspace(0.005, 1.0, 30)
+SMOOTHING_GRID = (0.0, 0.01, 0.05, 0.1, 0.25, 0.5)
+
+
+def expected_calibration_error(confidences: np.ndarray, correct: np.ndarray, n_bins: int = 10) -> float:
+    """
+    Écart moyen entre confiance et exactitude, pondéré par la taille des intervalles de confiance
+
+    Args:
+        confidences (np.ndarray): Confiance de chaque prédiction
+        correct (np.ndarray): Prédiction correcte (booléens)
+        n_bins (int): Nombre d'intervalles
+
+    Returns:
+        float: ECE
+    """
+    bins = np.minimum((confidences * n_bins).astype(int), n_bins - 1)
+    ece = 0.0
+    for b in range(n_bins):
+        mask = bins == b
+        if mask.any():
+            ece += mask.mean() * abs(confidences[mask].mean() - correct[mask].mean())
+    return float(ece)
+
+
+class KnnVoteClassifier:
+    """
+    Vote des k voisins les plus similaires, pondéré par exp(similarité / T), avec lissage additif
+    Toutes les opérations sont vectorisées sur un lot de requêtes
+    """
+
+    def __init__(self, store: CatalogEmbeddingStore, k: int = KNN_K, temperature: float = 0.05,
+                 smoothing: float = 0.05):
+        """
+        Args:
+            store (CatalogEmbeddingStore): Magasin d'embeddings étiquetés
+            k (int): Nombre de voisins
+            temperature (float): Température des poids de vote
+            smoothing (float): Lissage additif des votes (confiance jamais exactement 1)
+        """
+        self.store = store
+        self.k = min(k, len(store))
+        self.temperature = temperature
+        self.smoothing = smoothing
+        self.labels = sorted(set(store.categories))
+        label_index = {label: i for i, label in enumerate(self.labels)}
+        self.label_ids = np.array([label_index[c] for c in store.categories])
+        # Matrice du magasin telle quelle (float16 en mémoire partagée, convertie par blocs dans le produit matriciel)
+        self.vectors = store.product_embeddings
+        self.calibration = None
+
+    def _neighbours(self, queries: np.ndarray):
+        similarities = similarity_matrix(queries, self.vectors)
+        top = np.argpartition(-similarities, self.k - 1, axis=1)[:, :self.k]
+        return top, np.take_along_axis(similarities, top, axis=1)
+
+    def _leave_one_out_neighbours(self):
+        """Voisins de chaque produit du catalogue hors lui-même, par blocs de QUERY_BLOCK_ROWS requêtes"""
+        tops, top_similarities = [], []
+        for start in range(0, len(self.vectors), QUERY_BLOCK_ROWS):
+            queries = np.asarray(self.vectors[start:start + QUERY_BLOCK_ROWS], dtype=np.float32)
+            similarities = similarity_matrix(queries, self.vectors)
+            rows = np.arange(len(queries))
+            similarities[rows, start + rows] = -np.inf
+            top = np.argpartition(-similarities, self.k - 1, axis=1)[:, :self.k]
+            tops.append(top)
+            top_similarities.append(np.take_along_axis(similarities, top, axis=1))
+        return np.vstack(tops), np.vstack(top_similarities)
+
+    def _vote(self, top: np.ndarray, top_similarities: np.ndarray, temperature: float, smoothing: float) -> np.ndarray:
+        # Poids stabilisés (soustraction du maximum par requête avant l'exponentielle)
+        logits = top_similarities / temperature
+        weights = np.exp(logits - logits.max(axis=1, keepdims=True))
+        votes = np.zeros((len(top), len(self.labels)))
+        np.add.at(votes, (np.arange(len(top))[:, None], self.label_ids[top]), weights)
+        votes = votes / votes.sum(axis=1, keepdims=True)
+        return (votes + smoothing) / (1 + smoothing * len(self.labels))
+
+    def predict_proba(self, queries: np.ndarray) -> np.ndarray:
+        """
+        Probabilités par catégorie d'un lot d'embeddings produit
+
+        Args:
+            queries (np.ndarray): Embeddings produit normalisés (m x D)
+
+        Returns:
+            np.ndarray: Probabilités (m x catégories), dans l'ordre de self.labels
+        """
+        top, top_similarities = self._neighbours(queries)
+        return self._vote(top, top_similarities, self.temperature, self.smoothing)
+
+    def calibrate(self) -> Dict[str, Any]:
+        """
+        Choisir température et lissage minimisant la log-vraisemblance négative en leave-one-out
+
+        Returns:
+            Dict[str, Any]: Paramètres retenus, exactitude, NLL et ECE
+        """
+        top, top_similarities = self._leave_one_out_neighbours()
+        rows = np.arange(len(self.vectors))
+        best = None
+        for temperature in TEMPERATURE_GRID:
+            for smoothing in SMOOTHING_GRID:
+                probabilities = self._vote(top, top_similarities, temperature, smoothing)
+                nll = -np.mean(np.log(np.maximum(probabilities[rows, self.label_ids], 1e-12)))
+                if best is None or nll < best[0]:
+                    best = (nll, float(temperature), float(smoothing), probabilities)
+
+        nll, self.temperature, self.smoothing, probabilities = best
+        predictions = probabilities.argmax(axis=1)
+        correct = predictions == self.label_ids
+        self.calibration = {
+            'k': self.k,
+            'temperature': self.temperature,
+            'smoothing': self.smoothing,
+            'model': self.store.model,
+            'loo_accuracy': float(correct.mean()),
+            'loo_nll': float(nll),
+            'loo_ece': expected_calibration_error(probabilities.max(axis=1), correct)
+        }
+        return self.calibration
+
+    def save_calibration(self):
+        """Sauvegarder la calibration à côté du magasin d'embeddings"""
+        path = os.path.join(self.store.store_dir, CALIBRATION_FILE)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.calibration, f, indent=2)
+
+    def load_calibration(self) -> bool:
+        """
+        Charger la calibration du magasin (si elle correspond au même modèle et au même k)
+
+        Returns:
+            bool: True si la calibration a été chargée
+        """
+        path = os.path.join(self.store.store_dir, CALIBRATION_FILE)
+        if not os.path.exists(path):
+            return False
+        with open(path, 'r', encoding='utf-8') as f:
+            calibration = json.load(f)
+        if calibration.get('model') != self.store.model or calibration.get('k') != self.k:
+            return False
+        self.temperature = calibration['temperature']
+        self.smoothing = calibration['smoothing']
+        self.calibration = calibration
+        return True
+
+    def predict_batch(self, queries: np.ndarray) -> List[Dict[str, Any]]:
+        """
+        Prédictions au format de AzureMLClient.predict_category pour un lot d'embeddings
+
+        Args:
+            queries (np.ndarray): Embeddings produit normalisés (m x D)
+
+        Returns:
+            List[Dict[str, Any]]: Résultats des prédictions
+        """
+        results = []
+        for row in self.predict_proba(queries):
+            best = int(row.argmax())
+            results.append({
+                'success': True,
+                'predicted_category': self.labels[best],
+                'confidence': float(row[best]),
+                'source': KNN_SOURCE,
+                'message': f'Vote des {self.k} produits du catalogue les plus proches',
+                'category_scores': {label: float(p) for label, p in zip(self.labels, row)}
+            })
+        return results
+
+
+def get_knn_classifier(store_dir: str = EMBEDDING_STORE_DIR) -> Optional[KnnVoteClassifier]:
+    """
+    Obtenir le classifieur kNN du magasin courant, avec la calibration écrite à la construction du magasin
+    Jamais de calibration ici (chemin des requêtes) : sans calibration, température et lissage par défaut
+
+    Args:
+        store_dir (str): Dossier du magasin d'embeddings
+
+    Returns:
+        KnnVoteClassifier: Classifieur, ou None si le magasin n'existe pas
+    """
+    store = get_catalog_store(store_dir)
+    if store is None:
+        return None
+    # Un classifieur par instance du magasin (recréé si le magasin est reconstruit)
+    classifier = getattr(store, '_knn_classifier', None)
+    if classifier is None:
+        classifier = KnnVoteClassifier(store)
+        try:
+            calibrated = classifier.load_calibration()
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️ Calibration kNN illisible: {str(e)}")
+            calibrated = False
+        if not calibrated:
+            print(f"⚠️ Pas de calibration kNN pour ce magasin: T={classifier.temperature}, "
+                  f"lissage={classifier.smoothing} par défaut (python knn_classifier.py pour calibrer)")
+        store._knn_classifier = classifier
+    return classifier
+
+
+def calibrate_store(store: CatalogEmbeddingStore, k: int = KNN_K) -> KnnVoteClassifier:
+    """
+    Calibrer le vote kNN d'un magasin et écrire la calibration à côté de ses embeddings (hors ligne)
+
+    Args:
+        store (CatalogEmbeddingStore): Magasin d'embeddings étiquetés
+        k (int): Nombre de voisins
+
+    Returns:
+        KnnVoteClassifier: Classifieur calibré
+    """
+    classifier = KnnVoteClassifier(store, k=k)
+    calibration = classifier.calibrate()
+    classifier.save_calibration()
+    print(f"🎯 Calibration kNN: T={calibration['temperature']:.3f}, lissage={calibration['smoothing']}, "
+          f"ECE={calibration['loo_ece']:.3f}")
+    return classifier
+
+
+def predict_knn(engine, image, brand: str, product_name: str, description: str,
+                specifications: str, store_dir: str = EMBEDDING_STORE_DIR) -> Optional[Dict[str, Any]]:
+    """
+    Prédiction kNN d'un produit saisi (embeddings calculés par le moteur local)
+
+    Args:
+        engine: Moteur local (LocalClipEngine)
+        image (Image.Image): Image du produit
+        brand (str): Marque du produit
+        product_name (str): Nom du produit
+        description (str): Description du produit
+        specifications (str): Spécifications du produit
+        store_dir (str): Dossier du magasin d'embeddings
+
+    Returns:
+        Dict[str, Any]: Résultat de la prédiction, ou None si le niveau kNN est indisponible
+    """
+    from catalog_embeddings import model_fingerprint
+
+    classifier = get_knn_classifier(store_dir)
+    if classifier is None or not engine.is_available() or classifier.store.model != model_fingerprint(engine):
+        return None
+    start = time.perf_counter()
+    processed_image, keywords = engine.preprocess(image, brand, product_name, description, specifications)
+    query = combine_embeddings(engine.embed_images([processed_image]).numpy(), engine.embed_texts([keywords]).numpy())
+    result = classifier.predict_batch(query)[0]
+    result['inference_time_ms'] = (time.perf_counter() - start) * 1000
+    return result
+
+
+def _benchmark_knn(engine, df, n_samples: int, store_dir: str) -> Dict[str, float]:
+    """
+    Latence de bout en bout du niveau kNN, mesurée comme les autres niveaux : predict_knn sur des produits réels
+    (prétraitement, encodage CLIP de l'image et du texte, puis vote), un appel par produit distinct
+    """
+    from PIL import Image
+
+    sample = df.sample(n=min(n_samples, len(df)), random_state=42)
+    latencies = []
+    for _, row in sample.iterrows():
+        with Image.open(row['image_path']) as image:
+            image = image.copy()
+        start = time.perf_counter()
+        result = predict_knn(engine, image, str(row['brand']), str(row['product_name']),
+                             str(row['description']), str(row['product_specifications']), store_dir)
+        if result is None:
+            raise RuntimeError("niveau kNN indisponible (magasin construit avec un autre modèle ?)")
+        latencies.append((time.perf_counter() - start) * 1000)
+    return {
+        'latency_ms_p50': float(np.percentile(latencies, 50)),
+        'latency_ms_p95': float(np.percentile(latencies, 95))
+    }
+
+
+def _benchmark_keywords(df) -> Dict[str, Any]:
+    """Exactitude et latence de l'analyse des mots-clés sur le catalogue"""
+    from azure_client import AzureMLClient
+    from quantization_report import macro_f1
+
+    client = AzureMLClient(show_warning=False)
+    predictions, latencies = [], []
+    for _, row in df.iterrows():
+        start = time.perf_counter()
+        result = client._predict_local_keywords(
+            str(row['brand']), str(row['product_name']), str(row['description']), str(row['product_specifications'])
+        )
+        latencies.append((time.perf_counter() - start) * 1000)
+        predictions.append(result.get('predicted_category', 'Unknown'))
+    y_true = df['main_category'].tolist()
+    return {
+        'accuracy': float(np.mean(np.asarray(predictions) == np.asarray(y_true))),
+        'macro_f1': macro_f1(y_true, predictions),
+        'latency_ms_p50': float(np.percentile(latencies, 50)),
+        'latency_ms_p95': float(np.percentile(latencies, 95))
+    }
+
+
+def _benchmark_remote(df, n_samples: int) -> Dict[str, Any]:
+    """
+    Exactitude et latence de l'endpoint Azure ML sur un échantillon du catalogue
+    Appel brut à /score, sans les replis du client : une réponse non 200, une exception ou une source autre que
+    le modèle fine-tuné compte comme une erreur et n'entre ni dans l'exactitude ni dans les latences
+    """
+    from PIL import Image
+    from azure_client import AzureMLClient
+    from quantization_report import macro_f1
+
+    client = AzureMLClient(show_warning=False)
+    sample = df.sample(n=min(n_samples, len(df)), random_state=42)
+    y_true, predictions, latencies, errors = [], [], [], 0
+    for _, row in sample.iterrows():
+        with Image.open(row['image_path']) as image:
+            image = image.copy()
+        start = time.perf_counter()
+        try:
+            response = client._post_score(
+                image, str(row['brand']), str(row['product_name']),
+                str(row['description']), str(row['product_specifications'])
+            )
+            result = client._decode_score_response(response) if response.status_code == 200 else {}
+        except Exception as e:
+            print(f"⚠️ Appel à l'endpoint en échec: {str(e)}")
+            result = {}
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if result.get('source') != 'azure_ml_pytorch_real':
+            errors += 1
+            continue
+        latencies.append(elapsed_ms)
+        predictions.append(result.get('predicted_category', 'Unknown'))
+        y_true.append(row['main_category'])
+    return {
+        'n_samples': len(sample),
+        'errors': errors,
+        'accuracy': float(np.mean(np.asarray(predictions) == np.asarray(y_true))) if predictions else None,
+        'macro_f1': macro_f1(y_true, predictions) if predictions else None,
+        'latency_ms_p50': float(np.percentile(latencies, 50)) if latencies else None,
+        'latency_ms_p95': float(np.percentile(latencies, 95)) if latencies else None
+    }
+
+
+def main():
+    """Calibrer le classifieur kNN et le comparer aux autres niveaux de prédiction"""
+    import argparse
+    from catalog_embeddings import load_labeled_catalog
+    from local_clip_engine import LocalClipEngine, LOCAL_MODEL_PATH
+    from quantization_report import macro_f1
+
+    parser = argparse.ArgumentParser(description="Calibration et benchmark du classifieur kNN")
+    parser.add_argument('--store', default=EMBEDDING_STORE_DIR, help="Dossier du magasin d'embeddings")
+    parser.add_argument('--model', default=None, help="State_dict fine-tuné du magasin (par défaut LOCAL_CLIP_MODEL_PATH)")
+    parser.add_argument('--k', type=int, default=KNN_K, help="Nombre de voisins")
+    parser.add_argument('--samples', type=int, default=200, help="Produits pour la latence de bout en bout du kNN")
+    parser.add_argument('--remote', type=int, default=0, help="Produits envoyés à l'endpoint Azure ML (0 = aucun)")
+    parser.add_argument('--output', default=BENCHMARK_PATH, help="Fichier JSON du benchmark")
+    args = parser.parse_args()
+
+    store = CatalogEmbeddingStore.load(args.store)
+    if store is None:
+        print(f"❌ Magasin d'embeddings introuvable: {args.store} (python catalog_embeddings.py)")
+        return False
+
+    classifier = calibrate_store(store, k=args.k)
+    calibration = classifier.calibration
+
+    # Vote leave-one-out vectorisé sur tout le catalogue (exactitude, et latence du vote seul par produit)
+    start = time.perf_counter()
+    top, top_similarities = classifier._leave_one_out_neighbours()
+    probabilities = classifier._vote(top, top_similarities, classifier.temperature, classifier.smoothing)
+    batch_ms = (time.perf_counter() - start) * 1000
+    predictions = [classifier.labels[i] for i in probabilities.argmax(axis=1)]
+
+    df = load_labeled_catalog()
+    df = df[df['uniq_id'].isin(store.row_of)].fillna('')
+
+    # Latence de bout en bout (encodage CLIP compris), comparable à celle des mots-clés et de l'endpoint
+    engine = LocalClipEngine(model_path=args.model or LOCAL_MODEL_PATH)
+    if not engine.is_available():
+        print(f"❌ Modèle local indisponible: {args.model or LOCAL_MODEL_PATH}")
+        return False
+    report = {
+        'n_products': len(store),
+        'knn': {
+            **calibration,
+            'accuracy': calibration['loo_accuracy'],
+            'macro_f1': macro_f1(store.categories, predictions),
+            **_benchmark_knn(engine, df, args.samples, args.store),
+            'vote_ms_per_product': batch_ms / len(store)
+        }
+    }
+    report['keywords'] = _benchmark_keywords(df)
+    if args.remote:
+        report['remote'] = _benchmark_remote(df, args.remote)
+
+    print("=" * 60)
+    for tier, stats in report.items():
+        if isinstance(stats, dict) and stats.get('errors'):
+            print(f"{tier:10} ❌ {stats['errors']}/{stats['n_samples']} appels en échec (exclus des mesures)")
+        if isinstance(stats, dict) and stats['accuracy'] is not None:
+            print(f"{tier:10} exactitude {stats['accuracy']:.3f} | macro-F1 {stats['macro_f1']:.3f} | p50 {stats['latency_ms_p50']:.2f} ms")
+
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"💾 Benchmark sauvegardé: {args.output}")
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    exit(0 if success else 1)
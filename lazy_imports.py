@@ -0,0 +1,73 @@
+"""
+Imports différés des modules lourds
+Un module n'est réellement importé qu'au premier accès à l'un de ses attributs
+"""
+
+import sys
+import importlib
+import importlib.util
+import threading
+import types
+
+
+class LazyModule(types.ModuleType):
+    """
+    Module mandataire : l'import réel a lieu au premier accès à un attribut
+    Après chargement, les attributs du module sont recopiés pour un accès direct
+    """
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__['_lazy_lock'] = threading.Lock()
+        self.__dict__['_lazy_loaded'] = False
+
+    def _load(self):
+        with self.__dict__['_lazy_lock']:
+            if not self.__dict__['_lazy_loaded']:
+                module = importlib.import_module(self.__name__)
+                self.__dict__.update(module.__dict__)
+                self.__dict__['_lazy_loaded'] = True
+
+    def __getattr__(self, attr: str):
+        # Appelé uniquement pour les attributs absents, donc seulement avant le chargement
+        self._load()
+        try:
+            return self.__dict__[attr]
+        except KeyError:
+            raise AttributeError(f"module '{self.__name__}' has no attribute '{attr}'") from None
+
+    def __dir__(self):
+        self._load()
+        return list(self.__dict__)
+
+
+def lazy_import(name: str) -> types.ModuleType:
+    """
+    Obtenir un module dont l'import est différé jusqu'à sa première utilisation
+
+    Args:
+        name (str): Nom complet du module (ex. 'PIL.Image')
+
+    Returns:
+        types.ModuleType: Module déjà importé, ou mandataire qui l'importera à la demande
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    return LazyModule(name)
+
+
+def is_available(name: str) -> bool:
+    """
+    Vérifier qu'un module optionnel est installé sans l'importer
+
+    Args:
+        name (str): Nom du module
+
+    Returns:
+        bool: True si le module peut être importé
+    """
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
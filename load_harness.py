@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+Banc de charge de bout en bout du client AzureMLClient
+Serveur /score local de substitution (latence injectée), balayage des niveaux de concurrence,
+débit, latences p50/p95/p99 et temps CPU par étape (prétraitement, sérialisation, réseau, décodage)
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import hashlib
+import threading
+import subprocess
+from typing import Dict, Any, List
+
+import numpy as np
+
+REPORT_PATH = os.path.join('cache', 'load_report.json')
+STAGES = ('preprocessing', 'serialization', 'network', 'parsing')
+CATEGORIES = [
+    'Baby Care', 'Beauty and Personal Care', 'Computers', 'Home Decor & Festive Needs',
+    'Home Furnishing', 'Kitchen & Dining', 'Watches'
+]
+
+
+def serve(port: int, latency_ms: float, jitter_ms: float):
+    """
+    Serveur /score de substitution (réponse au format du modèle réel après une latence injectée)
+    Accepte les corps gzip (annoncé par Accept-Encoding) et répond au format compact si le client le demande
+
+    Args:
+        port (int): Port d'écoute (0 = port libre, annoncé sur la sortie standard)
+        latency_ms (float): Latence moyenne injectée
+        jitter_ms (float): Écart-type de la latence injectée
+    """
+    import gzip
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from payload_codec import COMPACT_CONTENT_TYPE, encode_compact_results
+
+    class ScoreHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def _reply(self, status: int, payload: Dict[str, Any]):
+            content_type = 'application/json'
+            if status == 200 and COMPACT_CONTENT_TYPE in self.headers.get('Accept', '') and 'predicted_category' in payload:
+                content_type = COMPACT_CONTENT_TYPE
+                body = encode_compact_results([payload], CATEGORIES, payload['source'])
+            else:
+                body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Accept-Encoding', 'gzip')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            self._reply(200 if self.path.endswith('/health') else 404, {'status': 'healthy'})
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            try:
+                if self.headers.get('Content-Encoding') == 'gzip':
+                    body = gzip.decompress(body)
+                data = json.loads(body)
+            except ValueError:
+                self._reply(400, {'error': 'JSON invalide'})
+                return
+            time.sleep(max(0.0, random.gauss(latency_ms, jitter_ms)) / 1000)
+            digest = hashlib.md5(data.get('product_name', '').encode('utf-8')).digest()
+            self._reply(200, {
+                'predicted_category': CATEGORIES[digest[0] % len(CATEGORIES)],
+                'confidence': 0.9,
+                'source': 'azure_ml_pytorch_real',
+                'message': 'Réponse du serveur de substitution'
+            })
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), ScoreHandler)
+    server.daemon_threads = True
+    print(f"READY {server.server_address[1]}", flush=True)
+    server.serve_forever()
+
+
+def start_stub_server(latency_ms: float, jitter_ms: float):
+    """
+    Lancer le serveur de substitution dans un processus séparé (son CPU n'est pas compté)
+
+    Args:
+        latency_ms (float): Latence moyenne injectée
+        jitter_ms (float): Écart-type de la latence injectée
+
+    Returns:
+        tuple: (processus, URL de /score)
+    """
+    process = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), '--serve', '--latency-ms', str(latency_ms),
+         '--jitter-ms', str(jitter_ms)],
+        stdout=subprocess.PIPE, text=True
+    )
+    line = process.stdout.readline().split()
+    if len(line) != 2 or line[0] != 'READY':
+        process.kill()
+        raise RuntimeError("le serveur de substitution n'a pas démarré")
+    return process, f"http://127.0.0.1:{line[1]}/score"
+
+
+class StageRecorder:
+    """
+    Temps mur et CPU (du thread appelant) accumulés par étape pour la requête en cours
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def reset(self):
+        self._local.stages = {stage: [0.0, 0.0] for stage in STAGES}
+
+    def snapshot(self) -> Dict[str, List[float]]:
+        return {stage: list(values) for stage, values in self._local.stages.items()}
+
+    def wrap(self, function, stage: str):
+        """Envelopper une fonction pour imputer sa durée à une étape"""
+        def timed(*args, **kwargs):
+            wall, cpu = time.perf_counter(), time.thread_time()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                totals = self._local.stages[stage]
+                totals[0] += time.perf_counter() - wall
+                totals[1] += time.thread_time() - cpu
+        return timed
+
+    def instrument(self, client):
+        """Instrumenter les étapes de l'appel /score d'un client (méthodes de l'instance uniquement)"""
+        client._preprocess_image_like_notebook = self.wrap(client._preprocess_image_like_notebook, 'preprocessing')
+        client._encode_score_payload = self.wrap(client._encode_score_payload, 'serialization')
+        client._send_score = self.wrap(client._send_score, 'network')
+        client._decode_score_response = self.wrap(client._decode_score_response, 'parsing')
+
+
+def load_requests(csv_path: str, n: int) -> List[tuple]:
+    """
+    Produits réels (image décodée et champs texte) rejoués par le banc
+
+    Args:
+        csv_path (str): CSV des produits
+        n (int): Nombre de produits distincts
+
+    Returns:
+        List[tuple]: (image, marque, nom, description, spécifications)
+    """
+    from PIL import Image
+    from catalog_embeddings import load_labeled_catalog
+
+    products = []
+    for _, row in load_labeled_catalog(csv_path, n).iterrows():
+        with Image.open(row['image_path']) as image:
+            products.append((
+                image.convert('RGB'), str(row.get('brand', '') or ''), str(row['product_name']),
+                str(row.get('description', '') or ''), str(row.get('product_specifications', '') or '')
+            ))
+    return products
+
+
+def run_level(client, recorder: StageRecorder, products: List[tuple], concurrency: int,
+              n_requests: int) -> Dict[str, Any]:
+    """
+    Charge en boucle fermée : `concurrency` threads enchaînent les prédictions jusqu'à n_requests
+
+    Args:
+        client (AzureMLClient): Client instrumenté
+        recorder (StageRecorder): Enregistreur des étapes
+        products (List[tuple]): Produits rejoués
+        concurrency (int): Nombre de requêtes simultanées
+        n_requests (int): Nombre total de requêtes du palier
+
+    Returns:
+        Dict[str, Any]: Débit, latences, erreurs, replis et répartition par étape (ms par requête)
+    """
+    counter = iter(range(n_requests))
+    lock = threading.Lock()
+    latencies, errors, fallbacks, sources = [], 0, 0, {}
+    stage_totals = {stage: [0.0, 0.0] for stage in STAGES}
+    request_cpu = 0.0
+
+    def worker():
+        nonlocal errors, fallbacks, request_cpu
+        while True:
+            with lock:
+                index = next(counter, None)
+            if index is None:
+                return
+            recorder.reset()
+            wall, cpu = time.perf_counter(), time.thread_time()
+            try:
+                result = client.predict_category(*products[index % len(products)])
+            except Exception as e:
+                result = {'success': False, 'source': type(e).__name__}
+            elapsed, cpu_used = time.perf_counter() - wall, time.thread_time() - cpu
+            stages = recorder.snapshot()
+            with lock:
+                latencies.append(elapsed * 1000)
+                request_cpu += cpu_used
+                errors += not result.get('success')
+                # Réponse de repli (kNN, mots-clés) : le modèle complet n'a pas répondu
+                fallbacks += bool(result.get('success') and result.get('fallback_reason'))
+                sources[result.get('source')] = sources.get(result.get('source'), 0) + 1
+                for stage, (stage_wall, stage_cpu) in stages.items():
+                    stage_totals[stage][0] += stage_wall
+                    stage_totals[stage][1] += stage_cpu
+
+    process_cpu = time.process_time()
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    process_cpu = time.process_time() - process_cpu
+
+    done = len(latencies)
+    stage_cpu_ms = {stage: cpu * 1000 / done for stage, (_, cpu) in stage_totals.items()}
+    return {
+        'concurrency': concurrency,
+        'requests': done,
+        'errors': errors,
+        'fallbacks': fallbacks,
+        'sources': sources,
+        'throughput_per_s': done / elapsed if elapsed > 0 else 0.0,
+        'latency_ms_p50': float(np.percentile(latencies, 50)),
+        'latency_ms_p95': float(np.percentile(latencies, 95)),
+        'latency_ms_p99': float(np.percentile(latencies, 99)),
+        'stage_wall_ms': {stage: wall * 1000 / done for stage, (wall, _) in stage_totals.items()},
+        'stage_cpu_ms': stage_cpu_ms,
+        # CPU du thread de requête hors étapes instrumentées (routage, repli, dictionnaires de résultat)
+        'other_cpu_ms': request_cpu * 1000 / done - sum(stage_cpu_ms.values()),
+        'process_cpu_ms_per_request': process_cpu * 1000 / done
+    }
+
+
+def print_level(level: Dict[str, Any]):
+    """Afficher un palier du balayage"""
+    cpu = level['stage_cpu_ms']
+    print(f"⚡ x{level['concurrency']:<3} {level['throughput_per_s']:7.1f} req/s | "
+          f"p50 {level['latency_ms_p50']:6.1f} p95 {level['latency_ms_p95']:6.1f} "
+          f"p99 {level['latency_ms_p99']:6.1f} ms | CPU/req: "
+          f"prétraitement {cpu['preprocessing']:.2f}, sérialisation {cpu['serialization']:.2f}, "
+          f"réseau {cpu['network']:.2f}, décodage {cpu['parsing']:.2f}, autre {level['other_cpu_ms']:.2f} ms"
+          f"{' | ❌ ' + str(level['errors']) + ' erreurs' if level['errors'] else ''}"
+          f"{' | ⚠️ ' + str(level['fallbacks']) + ' replis' if level['fallbacks'] else ''}")
+
+
+def _commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True).stdout.strip() or 'unknown'
+    except Exception:
+        return 'unknown'
+
+
+def main():
+    """Balayer les niveaux de concurrence et écrire le rapport JSON"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Banc de charge du client AzureMLClient")
+    parser.add_argument('--concurrency', default='1,2,4,8,16', help="Niveaux de concurrence balayés")
+    parser.add_argument('--requests', type=int, default=200, help="Requêtes par palier")
+    parser.add_argument('--latency-ms', type=float, default=50.0, help="Latence injectée du serveur")
+    parser.add_argument('--jitter-ms', type=float, default=10.0, help="Écart-type de la latence injectée")
+    parser.add_argument('--products', type=int, default=50, help="Produits réels distincts rejoués")
+    parser.add_argument('--csv', default='produits_original.csv', help="CSV des produits")
+    parser.add_argument('--endpoint', default=None, help="Endpoint /score existant (sinon serveur local)")
+    parser.add_argument('--backend', choices=['azure', 'local'], default='azure',
+                        help="local : modèle CLIP local et ordonnanceur de micro-lots (pas d'appel /score)")
+    parser.add_argument('--output', default=REPORT_PATH, help="Fichier JSON du rapport")
+    parser.add_argument('--trace-log', default='', help="Journal JSONL des traces de prédiction ('' = désactivé)")
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.port, args.latency_ms, args.jitter_ms)
+        return True
+
+    from trace_logging import configure_trace_log
+    from azure_client import AzureMLClient
+
+    # Traces de prédiction désactivées par défaut ou écrites dans --trace-log, jamais mêlées à la progression affichée
+    configure_trace_log(args.trace_log)
+
+    process = None
+    endpoint = args.endpoint
+    if endpoint is None and args.backend == 'azure':
+        process, endpoint = start_stub_server(args.latency_ms, args.jitter_ms)
+    try:
+        client = AzureMLClient(show_warning=False)
+        client.backend = args.backend
+        client.endpoint_url = endpoint or client.endpoint_url
+        recorder = StageRecorder()
+        recorder.instrument(client)
+        products = load_requests(args.csv, args.products)
+
+        print(f"🚀 Banc de charge: backend {args.backend}, {endpoint or 'modèle local'}, "
+              f"latence injectée {args.latency_ms:.0f}±{args.jitter_ms:.0f} ms, {args.requests} requêtes par palier")
+        print("=" * 60)
+        run_level(client, recorder, products, 1, min(10, args.requests))  # Chauffe (imports, connexions)
+        levels = []
+        for concurrency in [int(c) for c in args.concurrency.split(',') if c.strip()]:
+            level = run_level(client, recorder, products, concurrency, args.requests)
+            print_level(level)
+            levels.append(level)
+    finally:
+        if process is not None:
+            process.kill()
+
+    report = {
+        'commit': _commit(),
+        'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'backend': args.backend,
+        'endpoint': 'stub' if process is not None else endpoint,
+        'injected_latency_ms': args.latency_ms if process is not None else None,
+        'injected_jitter_ms': args.jitter_ms if process is not None else None,
+        'requests_per_level': args.requests,
+        'levels': levels
+    }
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print("=" * 60)
+    best = max(levels, key=lambda level: level['throughput_per_s'])
+    print(f"🏁 Meilleur débit: {best['throughput_per_s']:.1f} req/s à x{best['concurrency']}")
+    print(f"💾 Rapport sauvegardé: {args.output}")
+    return all(level['errors'] == 0 and level['fallbacks'] == 0 for level in levels)
+
+
+if __name__ == "__main__":
+    success = main()
+    exit(0 if success else 1)
@@ -0,0 +1,436 @@
+"""
+Moteur d'inférence local (CPU) du modèle CLIP fine-tuné
+Même prétraitement que le notebook et même contrat que AzureMLClient.predict_category
+"""
+
+from __future__ import annotations
+
+import os
+import time
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+
+from lazy_imports import lazy_import, is_available
+from embedding_cache import (
+    EmbeddingCache, IMAGE_CACHE_MAX_BYTES, TEXT_CACHE_MAX_BYTES, image_content_key, text_content_key
+)
+
+# Modules lourds importés au premier chargement du modèle
+torch = lazy_import('torch')
+np = lazy_import('numpy')
+transformers = lazy_import('transformers')
+Image = lazy_import('PIL.Image')
+st = lazy_import('streamlit')
+
+# Configuration (identique à l'entraînement dans le notebook)
+MODEL_NAME = 'openai/clip-vit-base-patch32'
+LOCAL_MODEL_PATH = os.getenv('LOCAL_CLIP_MODEL_PATH', 'new_clip_product_classifier.pth')
+MAX_LENGTH = 77
+LOCAL_SOURCE = 'local_clip_pytorch'
+
+# Mode CPU : 'fp32' ou 'int8' (quantification dynamique des couches linéaires)
+LOCAL_QUANTIZATION = os.getenv('LOCAL_CLIP_QUANTIZATION', 'fp32').lower()
+# Threads intra-op / inter-op de PyTorch (0 = valeur par défaut de PyTorch)
+LOCAL_NUM_THREADS = int(os.getenv('LOCAL_CLIP_THREADS', '0'))
+LOCAL_INTEROP_THREADS = int(os.getenv('LOCAL_CLIP_INTEROP_THREADS', '0'))
+
+# Ordre des classes de l'entraînement : pd.factorize(df['main_category']) sur produits_original.csv
+# Surchargeable via LOCAL_CLIP_LABELS (liste séparée par des virgules) si le modèle a été réentraîné
+CATEGORY_LABELS = [
+    'Home Furnishing',
+    'Baby Care',
+    'Watches',
+    'Home Decor & Festive Needs',
+    'Kitchen & Dining',
+    'Beauty and Personal Care',
+    'Computers'
+]
+
+
+def category_labels() -> List[str]:
+    """
+    Obtenir les libellés des classes dans l'ordre des sorties du modèle
+
+    Returns:
+        List[str]: Libellés des catégories
+    """
+    labels = os.getenv('LOCAL_CLIP_LABELS')
+    if labels:
+        return [label.strip() for label in labels.split(',') if label.strip()]
+    return list(CATEGORY_LABELS)
+
+
+def build_clip_classifier(config, num_labels: int):
+    """
+    Construire l'architecture CLIPForClassification du notebook
+    Les poids de base ne sont pas téléchargés : ils sont tous fournis par le state_dict fine-tuné
+
+    Args:
+        config: Configuration CLIP (transformers.CLIPConfig)
+        num_labels (int): Nombre de catégories
+
+    Returns:
+        torch.nn.Module: Modèle CLIP + tête de classification
+    """
+    class CLIPForClassification(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.clip = transformers.CLIPModel(config)
+            self.classifier = torch.nn.Linear(config.projection_dim * 2, num_labels)
+
+        # Mêmes calculs que CLIPModel.forward (outputs.image_embeds / outputs.text_embeds),
+        # appelés tour par tour pour pouvoir encoder images et textes séparément
+        def embed_images(self, pixel_values):
+            pooled = self.clip.vision_model(pixel_values=pixel_values).pooler_output
+            features = self.clip.visual_projection(pooled)
+            return features / features.norm(p=2, dim=-1, keepdim=True)
+
+        def embed_texts(self, input_ids, attention_mask):
+            pooled = self.clip.text_model(input_ids=input_ids, attention_mask=attention_mask).pooler_output
+            features = self.clip.text_projection(pooled)
+            return features / features.norm(p=2, dim=-1, keepdim=True)
+
+        def score(self, image_embeds, text_embeds):
+            return self.classifier(torch.cat((image_embeds, text_embeds), dim=-1))
+
+        def forward(self, pixel_values, input_ids, attention_mask):
+            return self.score(self.embed_images(pixel_values), self.embed_texts(input_ids, attention_mask))
+
+    return CLIPForClassification()
+
+
+def configure_torch_threads(num_threads: int = LOCAL_NUM_THREADS, interop_threads: int = LOCAL_INTEROP_THREADS):
+    """
+    Configurer le parallélisme CPU de PyTorch
+
+    Args:
+        num_threads (int): Threads intra-op (0 = inchangé)
+        interop_threads (int): Threads inter-op (0 = inchangé)
+    """
+    if num_threads > 0:
+        torch.set_num_threads(num_threads)
+    if interop_threads > 0:
+        try:
+            torch.set_num_interop_threads(interop_threads)
+        except RuntimeError:
+            # Fixable une seule fois, avant tout travail parallèle
+            print("⚠️ Threads inter-op déjà initialisés, configuration ignorée")
+
+
+def quantize_int8(model):
+    """
+    Quantification dynamique int8 des couches linéaires (poids int8, activations quantifiées à la volée)
+
+    Args:
+        model (torch.nn.Module): Modèle fp32 en mode évaluation
+
+    Returns:
+        torch.nn.Module: Modèle quantifié
+    """
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def remap_state_dict(state_dict: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Adapter les clés d'un state_dict du notebook à l'architecture locale
+    Même logique que load_finetuned_clip_model : les poids CLIP sans préfixe reçoivent 'clip.'
+
+    Args:
+        state_dict (Dict[str, Any]): Poids sauvegardés (.pth)
+
+    Returns:
+        Dict[str, Any]: Poids avec les clés 'clip.*' et 'classifier.*'
+    """
+    # Un CLIPForClassification complet contient aussi les poids (inutilisés) du CLIPModel parent :
+    # on ne garde alors que ceux du sous-module 'clip'
+    has_clip_prefix = any(key.startswith('clip.') for key in state_dict)
+    remapped = {}
+    for key, value in state_dict.items():
+        if key.startswith('module.'):
+            key = key[len('module.'):]
+        if key.startswith('classifier.') or key.startswith('clip.'):
+            remapped[key] = value
+        elif not has_clip_prefix:
+            remapped['clip.' + key] = value
+    return remapped
+
+
+class LocalClipEngine:
+    """
+    Inférence CPU du modèle CLIPForClassification fine-tuné, sans appel réseau
+    Le modèle est chargé une seule fois, au premier appel
+    """
+
+    def __init__(self, model_path: str = LOCAL_MODEL_PATH, labels: Optional[List[str]] = None, preprocessor=None,
+                 quantization: str = LOCAL_QUANTIZATION):
+        """
+        Initialise le moteur (le modèle n'est chargé qu'à la première prédiction)
+
+        Args:
+            model_path (str): Chemin du state_dict fine-tuné (.pth)
+            labels (List[str]): Libellés des classes dans l'ordre des sorties du modèle
+            preprocessor: Client fournissant le prétraitement du notebook (AzureMLClient)
+            quantization (str): 'fp32' ou 'int8'
+        """
+        if quantization not in ('fp32', 'int8'):
+            raise ValueError(f"Mode de quantification inconnu: {quantization}")
+        self.model_path = model_path
+        self.quantization = quantization
+        self.labels = labels or category_labels()
+        self._preprocessor = preprocessor
+        self._lock = threading.Lock()
+        self.model = None
+        self.tokenizer = None
+        self.image_processor = None
+        self.load_time_s = None
+        # Caches indépendants : modifier seulement le texte ne réencode pas l'image (et inversement)
+        self.image_cache = EmbeddingCache(IMAGE_CACHE_MAX_BYTES, name='image')
+        self.text_cache = EmbeddingCache(TEXT_CACHE_MAX_BYTES, name='text')
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.model is not None
+
+    def is_available(self) -> bool:
+        """
+        Vérifier que le moteur peut fonctionner (dépendances installées et poids présents)
+
+        Returns:
+            bool: True si le modèle peut être chargé
+        """
+        return (is_available('torch') and is_available('transformers')
+                and os.path.exists(self.model_path))
+
+    def load(self):
+        """Charger le tokenizer, le processeur d'images et le modèle fine-tuné sur CPU"""
+        with self._lock:
+            if self.model is not None:
+                return
+            if not os.path.exists(self.model_path):
+                raise FileNotFoundError(f"Poids du modèle introuvables: {self.model_path}")
+
+            start = time.perf_counter()
+            configure_torch_threads()
+            config = transformers.CLIPConfig.from_pretrained(MODEL_NAME)
+            model = build_clip_classifier(config, num_labels=len(self.labels))
+
+            state_dict = torch.load(self.model_path, map_location='cpu')
+            missing, unexpected = model.load_state_dict(remap_state_dict(state_dict), strict=False)
+            if any(key.startswith('classifier.') for key in missing):
+                raise ValueError("Tête de classification absente du state_dict")
+            # Buffers recalculés à la construction (ex. position_ids) : sans incidence
+            missing = [key for key in missing if not key.endswith('position_ids')]
+            if missing:
+                print(f"⚠️ {len(missing)} poids absents du state_dict (initialisation par défaut)")
+            if unexpected:
+                print(f"⚠️ {len(unexpected)} poids ignorés dans le state_dict")
+
+            model.eval()
+            if self.quantization == 'int8':
+                model = quantize_int8(model)
+            self.tokenizer = transformers.CLIPTokenizer.from_pretrained(MODEL_NAME)
+            self.image_processor = transformers.CLIPImageProcessor.from_pretrained(MODEL_NAME)
+            self.model = model
+            self.load_time_s = time.perf_counter() - start
+            print(f"✅ Modèle CLIP local chargé en {self.load_time_s:.1f}s ({len(self.labels)} catégories, {self.quantization})")
+
+    def _get_preprocessor(self):
+        if self._preprocessor is None:
+            from azure_client import AzureMLClient
+            self._preprocessor = AzureMLClient(show_warning=False)
+        return self._preprocessor
+
+    def preprocess(self, image: Image.Image, brand: str, product_name: str,
+                   description: str, specifications: str) -> Tuple[Image.Image, str]:
+        """
+        Prétraitement identique au notebook (image 128 px max, texte réduit aux mots-clés)
+
+        Args:
+            image (Image.Image): Image du produit
+            brand (str): Marque du produit
+            product_name (str): Nom du produit
+            description (str): Description du produit
+            specifications (str): Spécifications du produit
+
+        Returns:
+            Tuple[Image.Image, str]: Image prétraitée et texte de mots-clés
+        """
+        preprocessor = self._get_preprocessor()
+        processed_image = preprocessor._preprocess_image_like_notebook(image)
+        keywords = preprocessor._preprocess_text_like_notebook(brand, product_name, description, specifications)
+        return processed_image, keywords
+
+    def _cached_embeddings(self, cache: EmbeddingCache, keys: List[str], encode) -> 'torch.Tensor':
+        """
+        Embeddings d'un lot : lus dans le cache, seuls les contenus absents sont encodés
+
+        Args:
+            cache (EmbeddingCache): Cache de la modalité
+            keys (List[str]): Empreintes des contenus du lot
+            encode: Fonction encodant les positions données (-> tenseur lot x D)
+
+        Returns:
+            torch.Tensor: Embeddings float32 (lot x D), issus des vecteurs float16 du cache
+        """
+        vectors = [cache.get(key) for key in keys]
+        # Une seule passe par contenu distinct manquant
+        missing = {}
+        for i, (key, vector) in enumerate(zip(keys, vectors)):
+            if vector is None:
+                missing.setdefault(key, i)
+        if missing:
+            encoded = encode(list(missing.values())).numpy().astype(np.float16)
+            computed = dict(zip(missing, encoded))
+            for key, vector in computed.items():
+                cache.put(key, vector)
+            vectors = [computed[key] if vector is None else vector for key, vector in zip(keys, vectors)]
+        return torch.from_numpy(np.stack(vectors).astype(np.float32))
+
+    def embed_images(self, images: List[Image.Image]) -> 'torch.Tensor':
+        """
+        Embeddings normalisés d'images prétraitées (tour image uniquement pour les absentes du cache)
+
+        Args:
+            images (List[Image.Image]): Images prétraitées
+
+        Returns:
+            torch.Tensor: Embeddings (lot x D)
+        """
+        self.load()
+
+        def encode(positions):
+            pixel_values = self.image_processor(images=[images[i] for i in positions], return_tensors='pt').pixel_values
+            with torch.inference_mode():
+                return self.model.embed_images(pixel_values)
+
+        return self._cached_embeddings(self.image_cache, [image_content_key(image) for image in images], encode)
+
+    def embed_texts(self, texts: List[str]) -> 'torch.Tensor':
+        """
+        Embeddings normalisés de textes de mots-clés (tour texte uniquement pour les absents du cache)
+
+        Args:
+            texts (List[str]): Textes de mots-clés
+
+        Returns:
+            torch.Tensor: Embeddings (lot x D)
+        """
+        self.load()
+
+        def encode(positions):
+            text_inputs = self.tokenizer(
+                [texts[i] for i in positions],
+                return_tensors='pt',
+                padding='max_length',
+                truncation=True,
+                max_length=MAX_LENGTH
+            )
+            with torch.inference_mode():
+                return self.model.embed_texts(text_inputs['input_ids'], text_inputs['attention_mask'])
+
+        return self._cached_embeddings(self.text_cache, [text_content_key(text) for text in texts], encode)
+
+    def predict_logits(self, images: List[Image.Image], texts: List[str]):
+        """
+        Probabilités d'un lot déjà prétraité
+        Les embeddings en cache sont réutilisés : seule la tête linéaire est recalculée
+
+        Args:
+            images (List[Image.Image]): Images prétraitées
+            texts (List[str]): Textes de mots-clés
+
+        Returns:
+            torch.Tensor: Probabilités (lot x catégories)
+        """
+        image_embeds = self.embed_images(images)
+        text_embeds = self.embed_texts(texts)
+        with torch.inference_mode():
+            logits = self.model.score(image_embeds, text_embeds)
+        return torch.softmax(logits, dim=-1)
+
+    def cache_stats(self) -> List[Dict[str, Any]]:
+        """
+        Statistiques des caches d'embeddings
+
+        Returns:
+            List[Dict[str, Any]]: Statistiques du cache image puis du cache texte
+        """
+        return [self.image_cache.stats(), self.text_cache.stats()]
+
+    def format_result(self, probabilities, keywords: str, elapsed_ms: float) -> Dict[str, Any]:
+        """
+        Mettre les probabilités d'un produit au format de AzureMLClient.predict_category
+
+        Args:
+            probabilities: Probabilités d'un produit (tenseur 1D)
+            keywords (str): Texte de mots-clés utilisé
+            elapsed_ms (float): Durée d'inférence en millisecondes
+
+        Returns:
+            Dict[str, Any]: Résultat de la prédiction
+        """
+        scores = {label: float(p) for label, p in zip(self.labels, probabilities.tolist())}
+        predicted_category = max(scores, key=scores.get)
+        return {
+            'success': True,
+            'predicted_category': predicted_category,
+            'confidence': scores[predicted_category],
+            'source': LOCAL_SOURCE,
+            'message': 'Prédiction réalisée localement avec le modèle PyTorch CLIP fine-tuné',
+            'keywords_found': keywords.split(', ') if keywords != 'no_keywords_found' else [],
+            'category_scores': scores,
+            'inference_time_ms': elapsed_ms
+        }
+
+    def predict_category(self, image: Image.Image, brand: str, product_name: str,
+                         description: str, specifications: str) -> Dict[str, Any]:
+        """
+        Prédiction de catégorie de produit avec le modèle local
+
+        Args:
+            image (Image.Image): Image du produit
+            brand (str): Marque du produit
+            product_name (str): Nom du produit
+            description (str): Description du produit
+            specifications (str): Spécifications du produit
+
+        Returns:
+            Dict[str, Any]: Résultat de la prédiction avec catégorie et confiance
+        """
+        try:
+            start = time.perf_counter()
+            processed_image, keywords = self.preprocess(image, brand, product_name, description, specifications)
+            probabilities = self.predict_logits([processed_image], [keywords])[0]
+            return self.format_result(probabilities, keywords, (time.perf_counter() - start) * 1000)
+        except Exception as e:
+            return {
+                'success': False,
+                'error': f'Erreur lors de la prédiction locale CLIP: {str(e)}',
+                'source': 'local_clip_exception'
+            }
+
+
+def _create_local_clip_engine(model_path: str = LOCAL_MODEL_PATH, quantization: str = LOCAL_QUANTIZATION):
+    """Créer le moteur local (mis en cache par get_local_clip_engine)"""
+    return LocalClipEngine(model_path=model_path, quantization=quantization)
+
+
+# Fabrique mise en cache, créée au premier appel pour ne pas importer Streamlit à l'import du module
+_cached_engine_factory = None
+
+
+def get_local_clip_engine(model_path: str = LOCAL_MODEL_PATH, quantization: str = LOCAL_QUANTIZATION) -> LocalClipEngine:
+    """
+    Obtenir le moteur local partagé entre les sessions (via st.cache_resource)
+
+    Args:
+        model_path (str): Chemin du state_dict fine-tuné (.pth)
+        quantization (str): 'fp32' ou 'int8'
+
+    Returns:
+        LocalClipEngine: Moteur d'inférence local
+    """
+    global _cached_engine_factory
+    if _cached_engine_factory is None:
+        _cached_engine_factory = st.cache_resource(_create_local_clip_engine)
+    return _cached_engine_factory(model_path=model_path, quantization=quantization)
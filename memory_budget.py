@@ -0,0 +1,505 @@
+"""
+Empreinte mémoire des sessions Streamlit et du processus
+Taille attribuable au catalogue, aux images, aux figures et aux caches partagés (memory_usage(deep=True),
+tracemalloc en option), budgets par session et par processus appliqués par partage du catalogue et éviction des caches
+"""
+
+import os
+import sys
+import time
+import threading
+from collections import deque
+from typing import Dict, Any, List, Optional
+
+# Budgets (Mo) : mémoire propre à une session, et total attribuable (caches partagés + sessions)
+SESSION_BUDGET_MB = float(os.getenv('SESSION_MEMORY_BUDGET_MB', '150'))
+PROCESS_BUDGET_MB = float(os.getenv('PROCESS_MEMORY_BUDGET_MB', '512'))
+
+# Catalogue partagé entre les sessions (un seul DataFrame en lecture seule au lieu d'une copie par session)
+SHARE_CATALOG = os.getenv('SHARE_CATALOG', '1').lower() in ('1', 'true', 'yes')
+CATALOG_KEY = 'df'
+
+# Suivi des allocations Python par fichier source (surcoût de 5 à 30 %, désactivé par défaut)
+TRACEMALLOC_ENABLED = os.getenv('MEMORY_TRACEMALLOC', '0').lower() in ('1', 'true', 'yes')
+TRACEMALLOC_FRAMES = int(os.getenv('MEMORY_TRACEMALLOC_FRAMES', '1'))
+
+# Intervalle minimal entre deux mesures d'une même session, et oubli des sessions inactives
+CHECK_INTERVAL_S = float(os.getenv('MEMORY_CHECK_INTERVAL_S', '10'))
+SESSION_TTL_S = 1800
+
+MB = 1024 * 1024
+
+# Attribution des allocations tracemalloc (fichier source de la ligne allouante)
+TRACEMALLOC_CATEGORIES = (
+    ('catalog', ('pandas', 'numpy', 'pyarrow')),
+    ('images', ('PIL', 'base64')),
+    ('figures', ('plotly', 'matplotlib', 'wordcloud', 'eda_figures', 'eda_wordcloud')),
+    ('caches', ('embedding_cache', 'catalog_embeddings', 'keyword_engine', 'eda_snapshot', 'streamlit/runtime/caching')),
+)
+
+
+def object_bytes(obj, _depth: int = 0) -> int:
+    """
+    Taille approximative d'un objet et de ce qu'il référence
+
+    Args:
+        obj: Objet mesuré (DataFrame, image PIL, fichier téléversé, figure, conteneur...)
+
+    Returns:
+        int: Taille en octets
+    """
+    pd = sys.modules.get('pandas')
+    if pd is not None and isinstance(obj, (pd.DataFrame, pd.Series)):
+        usage = obj.memory_usage(deep=True)
+        return int(usage.sum() if hasattr(usage, 'sum') else usage)
+    if hasattr(obj, 'nbytes') and isinstance(getattr(obj, 'nbytes'), int):
+        return obj.nbytes
+    if hasattr(obj, 'getbands') and hasattr(obj, 'size'):
+        width, height = obj.size
+        return width * height * len(obj.getbands())
+    if hasattr(obj, 'getbuffer'):
+        return obj.getbuffer().nbytes
+    if hasattr(obj, 'to_plotly_json'):
+        return len(obj.to_json())
+    size = sys.getsizeof(obj)
+    if _depth < 3:
+        if isinstance(obj, dict):
+            size += sum(object_bytes(k, _depth + 1) + object_bytes(v, _depth + 1) for k, v in obj.items())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            size += sum(object_bytes(item, _depth + 1) for item in obj)
+    return size
+
+
+def object_category(obj) -> str:
+    """Catégorie d'un objet de session : catalog, images, figures ou other"""
+    pd = sys.modules.get('pandas')
+    if pd is not None and isinstance(obj, (pd.DataFrame, pd.Series)):
+        return 'catalog'
+    if (hasattr(obj, 'getbands') and hasattr(obj, 'size')) or hasattr(obj, 'getbuffer'):
+        return 'images'
+    if hasattr(obj, 'to_plotly_json') or type(obj).__name__ == 'Figure':
+        return 'figures'
+    return 'other'
+
+
+def process_rss_bytes() -> int:
+    """Mémoire résidente du processus (0 si indisponible)"""
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+        # Pic de mémoire résidente (Ko sous Linux, octets sous macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+    except Exception:
+        return 0
+
+
+# Catalogue partagé
+_cached_catalog_factory = None
+_catalog_loader = None
+_shared_catalog_ref = None
+
+
+def _load_shared_catalog(_loader):
+    df = _loader()
+    print(f"📚 Catalogue partagé entre les sessions: {len(df)} produits, {object_bytes(df) / MB:.1f} Mo")
+    return df
+
+
+def _get_shared_catalog(loader):
+    global _cached_catalog_factory, _shared_catalog_ref
+    import weakref
+    import streamlit as st
+
+    if _cached_catalog_factory is None:
+        _cached_catalog_factory = st.cache_resource(show_spinner=False)(_load_shared_catalog)
+    df = _cached_catalog_factory(loader)
+    if df.empty:
+        # Chargement en échec : ne pas garder un catalogue vide pour toutes les sessions
+        _cached_catalog_factory.clear()
+        return df
+    _shared_catalog_ref = weakref.ref(df)
+    return df
+
+
+def shared_catalog():
+    """Catalogue partagé s'il a été chargé (None sinon)"""
+    return _shared_catalog_ref() if _shared_catalog_ref is not None else None
+
+
+def load_catalog(loader):
+    """
+    Catalogue d'une session : le DataFrame partagé (SHARE_CATALOG=1) ou une copie propre à la session
+
+    Le DataFrame partagé est en lecture seule : toutes les sessions tiennent le même objet, les pages en dérivent
+    des filtres ou des copies (df[masque], df.copy()) et ne le modifient jamais en place (affectation de colonne,
+    inplace=True, .loc/.at). Le chargeur n'a pas besoin de st.cache_data, qui en garderait une seconde copie
+
+    Args:
+        loader (callable): Fonction sans argument qui charge et traite le catalogue
+
+    Returns:
+        pd.DataFrame: Catalogue
+    """
+    global _catalog_loader
+    _catalog_loader = loader
+    if SHARE_CATALOG:
+        return _get_shared_catalog(loader)
+    return loader()
+
+
+# Caches partagés du processus (seulement ceux déjà créés : la mesure ne charge jamais un module ou un modèle)
+
+def _figure_factory():
+    module = sys.modules.get('eda_figures')
+    return module.get_figure_factory() if module is not None else None
+
+
+def _wordcloud_renderer():
+    module = sys.modules.get('eda_wordcloud')
+    return module.get_wordcloud_renderer() if module is not None else None
+
+
+def _embedding_caches() -> list:
+    module = sys.modules.get('local_clip_engine')
+    if module is None or module._cached_engine_factory is None:
+        return []
+    engine = module.get_local_clip_engine()
+    return [engine.image_cache, engine.text_cache]
+
+
+def shared_cache_usage() -> List[Dict[str, Any]]:
+    """
+    Taille des structures partagées entre les sessions
+
+    Returns:
+        List[Dict[str, Any]]: Nom, catégorie et octets de chaque cache (catalogue partagé compris)
+    """
+    usage = []
+    catalog = shared_catalog()
+    if catalog is not None:
+        usage.append({'name': 'catalogue partagé', 'category': 'catalog', 'bytes': object_bytes(catalog)})
+    try:
+        factory = _figure_factory()
+        if factory is not None:
+            usage.append({'name': 'figures EDA', 'category': 'figures', 'bytes': factory.memory_bytes()})
+        renderer = _wordcloud_renderer()
+        if renderer is not None:
+            usage.append({'name': 'nuages de mots', 'category': 'figures', 'bytes': renderer.memory_bytes()})
+        for cache in _embedding_caches():
+            usage.append({'name': f"embeddings {cache.name}", 'category': 'caches', 'bytes': cache.current_bytes})
+    except Exception as e:
+        print(f"⚠️ Mesure des caches partagés impossible: {str(e)}")
+    return usage
+
+
+def evict_caches(needed_bytes: float = float('inf')) -> List[str]:
+    """
+    Vider les caches partagés, du moins coûteux au plus coûteux à reconstruire, jusqu'à libérer needed_bytes
+
+    Les figures et nuages de mots sont reconstruits depuis les agrégats (ou relus depuis le disque),
+    les embeddings recalculés à la demande
+
+    Args:
+        needed_bytes (float): Octets à libérer (par défaut tout vider)
+
+    Returns:
+        List[str]: Caches vidés
+    """
+    steps = [
+        ('figures EDA', _figure_factory),
+        ('nuages de mots', _wordcloud_renderer),
+    ]
+    evicted, freed = [], 0
+    for name, getter in steps:
+        if freed >= needed_bytes:
+            break
+        target = getter()
+        if target is not None and target.memory_bytes():
+            freed += target.memory_bytes()
+            target.clear()
+            evicted.append(name)
+    for cache in _embedding_caches():
+        if freed >= needed_bytes:
+            break
+        if cache.current_bytes:
+            freed += cache.current_bytes
+            cache.clear()
+            evicted.append(f"embeddings {cache.name}")
+    if evicted:
+        print(f"🧹 Caches vidés ({', '.join(evicted)}): {freed / MB:.1f} Mo libérés")
+    return evicted
+
+
+def _session_id() -> str:
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx()
+        return ctx.session_id if ctx is not None else 'hors-session'
+    except Exception:
+        return 'hors-session'
+
+
+class MemoryTracker:
+    """
+    Empreinte des sessions (relevée à chaque rerun, au plus une fois par intervalle) et application des budgets
+    Partagé par toutes les sessions du processus
+    """
+
+    def __init__(self, session_budget_mb: float = SESSION_BUDGET_MB, process_budget_mb: float = PROCESS_BUDGET_MB):
+        """
+        Args:
+            session_budget_mb (float): Mémoire propre maximale d'une session (0 = pas de budget)
+            process_budget_mb (float): Total attribuable maximal du processus (0 = pas de budget)
+        """
+        self.session_budget = session_budget_mb * MB
+        self.process_budget = process_budget_mb * MB
+        self._sessions: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self.events = deque(maxlen=50)
+
+    def _record_event(self, action: str, detail: str):
+        with self._lock:
+            self.events.appendleft({'time': time.strftime('%H:%M:%S'), 'action': action, 'detail': detail})
+
+    def measure_session(self, session_state) -> Dict[str, Any]:
+        """
+        Mémoire propre d'une session par catégorie (le catalogue partagé n'est pas compté)
+
+        Args:
+            session_state: st.session_state (ou tout mapping)
+
+        Returns:
+            Dict[str, Any]: Octets par catégorie, total, objets les plus lourds, catalogue partagé ou non
+        """
+        catalog = shared_catalog()
+        by_category = {'catalog': 0, 'images': 0, 'figures': 0, 'other': 0}
+        items = []
+        for key in list(session_state.keys()):
+            try:
+                value = session_state[key]
+            except KeyError:
+                continue
+            if catalog is not None and value is catalog:
+                continue
+            size = object_bytes(value)
+            by_category[object_category(value)] += size
+            items.append((str(key), size))
+        items.sort(key=lambda item: item[1], reverse=True)
+        return {
+            'by_category': by_category,
+            'total': sum(by_category.values()),
+            'largest': items[:5],
+            'shared_catalog': catalog is not None and session_state.get(CATALOG_KEY) is catalog
+        }
+
+    def track(self, session_state, session_id: Optional[str] = None, force: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Relever l'empreinte d'une session et appliquer les budgets
+
+        Args:
+            session_state: st.session_state de la session courante
+            session_id (str): Identifiant de la session (par défaut celui du contexte Streamlit)
+            force (bool): Ignorer l'intervalle minimal entre deux mesures
+
+        Returns:
+            Dict[str, Any]: Empreinte relevée, ou None si la mesure précédente est trop récente
+        """
+        session_id = session_id or _session_id()
+        now = time.time()
+        with self._lock:
+            previous = self._sessions.get(session_id)
+            if not force and previous is not None and now - previous['updated'] < CHECK_INTERVAL_S:
+                return None
+
+        usage = self.measure_session(session_state)
+        if self.session_budget and usage['total'] > self.session_budget:
+            usage = self._enforce_session_budget(session_state, session_id, usage)
+        usage['updated'] = now
+        with self._lock:
+            self._sessions[session_id] = usage
+            for sid in [sid for sid, u in self._sessions.items() if now - u['updated'] > SESSION_TTL_S]:
+                del self._sessions[sid]
+
+        if self.process_budget:
+            attributed = self.attributed_bytes()
+            if attributed > self.process_budget:
+                evicted = evict_caches(attributed - self.process_budget)
+                if evicted:
+                    self._record_event(
+                        'éviction', f"{attributed / MB:.0f} Mo > {self.process_budget / MB:.0f} Mo: {', '.join(evicted)}"
+                    )
+        return usage
+
+    def _enforce_session_budget(self, session_state, session_id: str, usage: Dict[str, Any]) -> Dict[str, Any]:
+        # Remplacer la copie privée du catalogue par le DataFrame partagé
+        private = session_state.get(CATALOG_KEY)
+        pd = sys.modules.get('pandas')
+        if (_catalog_loader is not None and pd is not None and isinstance(private, pd.DataFrame)
+                and private is not shared_catalog()):
+            shared = _get_shared_catalog(_catalog_loader)
+            if not shared.empty and shared.shape == private.shape:
+                session_state[CATALOG_KEY] = shared
+                usage = self.measure_session(session_state)
+                self._record_event('partage', f"session {session_id[:8]}: catalogue privé remplacé par le partagé")
+                print(f"📚 Session {session_id[:8]}: catalogue privé remplacé par le catalogue partagé")
+        if usage['total'] > self.session_budget:
+            self._record_event(
+                'dépassement', f"session {session_id[:8]}: {usage['total'] / MB:.0f} Mo "
+                               f"> {self.session_budget / MB:.0f} Mo ({usage['largest'][0][0]})"
+            )
+            print(f"⚠️ Session {session_id[:8]} au-delà de son budget mémoire: {usage['total'] / MB:.0f} Mo")
+        return usage
+
+    def sessions(self) -> Dict[str, Dict[str, Any]]:
+        """Dernière empreinte relevée de chaque session active"""
+        with self._lock:
+            return dict(self._sessions)
+
+    def attributed_bytes(self) -> int:
+        """Total attribuable : caches partagés (catalogue compris) et mémoire propre des sessions"""
+        shared = sum(cache['bytes'] for cache in shared_cache_usage())
+        return shared + sum(usage['total'] for usage in self.sessions().values())
+
+    def report(self) -> Dict[str, Any]:
+        """
+        Rapport mémoire du processus pour l'affichage
+
+        Returns:
+            Dict[str, Any]: RSS, total attribuable par catégorie, budgets, sessions, caches et événements
+        """
+        caches = shared_cache_usage()
+        sessions = self.sessions()
+        by_category = {'catalog': 0, 'images': 0, 'figures': 0, 'caches': 0, 'other': 0}
+        for cache in caches:
+            by_category[cache['category']] += cache['bytes']
+        for usage in sessions.values():
+            for category, size in usage['by_category'].items():
+                by_category[category] += size
+        with self._lock:
+            events = list(self.events)
+        return {
+            'rss_bytes': process_rss_bytes(),
+            'attributed_bytes': sum(by_category.values()),
+            'by_category': by_category,
+            'session_budget_bytes': self.session_budget,
+            'process_budget_bytes': self.process_budget,
+            'shared_catalog': SHARE_CATALOG,
+            'sessions': sessions,
+            'caches': caches,
+            'events': events,
+            'tracemalloc': tracemalloc_breakdown() if TRACEMALLOC_ENABLED else None
+        }
+
+
+_tracemalloc_started = False
+
+
+def start_tracemalloc():
+    """Démarrer tracemalloc une seule fois par processus (si MEMORY_TRACEMALLOC=1)"""
+    global _tracemalloc_started
+    if TRACEMALLOC_ENABLED and not _tracemalloc_started:
+        import tracemalloc
+
+        _tracemalloc_started = True
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            print(f"🔬 tracemalloc démarré ({TRACEMALLOC_FRAMES} cadre(s) par allocation)")
+
+
+_previous_snapshot = None
+
+
+def tracemalloc_breakdown(top_n: int = 10) -> Optional[Dict[str, Any]]:
+    """
+    Allocations Python vivantes regroupées par catégorie et par fichier source (instantané tracemalloc)
+
+    Seules les allocations faites par l'allocateur Python sont vues (pas celles de PyTorch)
+
+    Args:
+        top_n (int): Nombre de fichiers listés
+
+    Returns:
+        Dict[str, Any]: Mémoire tracée, pic, octets par catégorie, fichiers les plus lourds
+        et croissance depuis l'instantané précédent (None si tracemalloc est arrêté)
+    """
+    global _previous_snapshot
+    import tracemalloc
+
+    if not tracemalloc.is_tracing():
+        return None
+    current, peak = tracemalloc.get_traced_memory()
+    snapshot = tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    ))
+    stats = snapshot.statistics('filename')
+    by_category = {category: 0 for category, _ in TRACEMALLOC_CATEGORIES}
+    by_category['other'] = 0
+    for stat in stats:
+        filename = stat.traceback[0].filename.replace('\\', '/')
+        category = next(
+            (name for name, patterns in TRACEMALLOC_CATEGORIES if any(p in filename for p in patterns)), 'other'
+        )
+        by_category[category] += stat.size
+    growth = []
+    if _previous_snapshot is not None:
+        growth = [
+            {'file': _short_path(stat.traceback[0].filename), 'size_diff': stat.size_diff}
+            for stat in snapshot.compare_to(_previous_snapshot, 'filename')[:top_n] if stat.size_diff > 0
+        ]
+    _previous_snapshot = snapshot
+    return {
+        'traced_bytes': current,
+        'peak_bytes': peak,
+        'by_category': by_category,
+        'top_files': [{'file': _short_path(stat.traceback[0].filename), 'bytes': stat.size} for stat in stats[:top_n]],
+        'growth': growth
+    }
+
+
+def _short_path(path: str) -> str:
+    parts = path.replace('\\', '/').split('/')
+    if 'site-packages' in parts:
+        return '/'.join(parts[parts.index('site-packages') + 1:])
+    return '/'.join(parts[-2:])
+
+
+_tracker = MemoryTracker()
+
+
+def get_memory_tracker() -> MemoryTracker:
+    """
+    Obtenir le suivi mémoire du processus (partagé par toutes les sessions)
+
+    Returns:
+        MemoryTracker: Suivi partagé
+    """
+    return _tracker
+
+
+def track_session_memory(force: bool = False) -> Optional[Dict[str, Any]]:
+    """
+    Relever l'empreinte de la session courante et appliquer les budgets (à appeler depuis les pages)
+
+    Args:
+        force (bool): Ignorer l'intervalle minimal entre deux mesures
+
+    Returns:
+        Dict[str, Any]: Empreinte relevée, ou None si elle l'a été récemment
+    """
+    import streamlit as st
+
+    start_tracemalloc()
+    try:
+        return _tracker.track(st.session_state, force=force)
+    except Exception as e:
+        print(f"⚠️ Suivi mémoire de la session impossible: {str(e)}")
+        return None
@@ -14,6 +14,15 @@ import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from accessibility import init_accessibility_state, render_accessibility_sidebar, apply_accessibility_styles
 from azure_client import get_azure_client
+from catalog_embeddings import SIMILAR_LOAD_MODEL, find_similar_products
+from rerun_profiler import profile_page
+from memory_budget import track_session_memory
+
+# Profilage optionnel du rerun (PROFILE_RERUNS=1 ou ?profile=1)
+profile_page(__file__)
+
+# Empreinte mémoire de la session et budgets
+track_session_memory()
 
 # Initialiser l'état d'accessibilité
 init_accessibility_state()
@@ -30,6 +39,10 @@ st.title("🔮 Prédiction de Catégorie")
 # Initialiser le client Azure ML
 azure_client = get_azure_client(show_warning=False)
 
+# Préchauffage du client en cours (connexions à l'endpoint ou chargement du modèle local)
+if not azure_client.is_ready():
+    st.caption("⏳ Préchauffage du client en cours : la première prédiction peut être plus lente")
+
 # Afficher les options d'accessibilité dans la sidebar
 render_accessibility_sidebar()
 
@@ -225,8 +238,27 @@ if st.button("🔮 Prédire la catégorie", type="primary"):
                     "Confiance",
                     f"{confidence:.2%}"
                 )
+            
+            # Produits similaires du catalogue (embeddings précalculés, modèle local déjà chargé ou backend local)
+            similar_products = find_similar_products(
+                image, brand, product_name, description, specifications,
+                load_model=azure_client.backend == 'local' or SIMILAR_LOAD_MODEL
+            )
+            if similar_products:
+                st.subheader("🔎 Produits similaires du catalogue")
+                similar_cols = st.columns(len(similar_products))
+                for col, similar in zip(similar_cols, similar_products):
+                    with col:
+                        similar_image_path = f"Images/{similar['image']}"
+                        if os.path.exists(similar_image_path):
+                            st.image(similar_image_path, width=150)
+                        st.caption(f"**{similar['main_category']}**")
+                        st.caption(f"{similar['product_name'][:60]}")
+                        st.caption(f"Similarité : {similar['similarity']:.2f}")
         else:
             st.error(f"❌ Erreur lors de la prédiction: {result.get('error', 'Erreur inconnue')}")
+            if result.get('request_id'):
+                st.caption(f"🔖 Identifiant de requête (à communiquer pour le diagnostic) : `{result['request_id']}`")
             
             # Messages d'aide spécifiques selon le type d'erreur
             error_msg = result.get('error', '').lower()
@@ -12,6 +12,14 @@ from azure_client import get_azure_client
 
 # Importer le module d'accessibilité
 from accessibility import init_accessibility_state, render_accessibility_sidebar, apply_accessibility_styles
+from rerun_profiler import profile_page
+from memory_budget import track_session_memory
+
+# Profilage optionnel du rerun (PROFILE_RERUNS=1 ou ?profile=1)
+profile_page(__file__)
+
+# Empreinte mémoire de la session et budgets
+track_session_memory()
 
 # Initialiser l'état d'accessibilité
 init_accessibility_state()
@@ -72,6 +80,13 @@ try:
         st.write(f"**Config Source:** {azure_client.config_source}")
         st.write(f"**Endpoint URL:** {azure_client.endpoint_url}")
         st.write(f"**Is PyTorch:** {azure_client.is_pytorch}")
+        st.write(f"**Backend d'inférence:** {azure_client.backend}")
+        if azure_client.warmup is not None:
+            warmup = azure_client.warmup.status()
+            warmup_icons = {'pending': '⚪', 'running': '⏳', 'ready': '✅', 'failed': '⚠️'}
+            st.write(f"**Préchauffage:** {warmup_icons[warmup['state']]} {warmup['state']} ({warmup['elapsed_s']:.1f} s)")
+            for step in warmup['steps']:
+                st.caption(f"{'✅' if step['ok'] else '❌'} {step['step']}: {step['ms']:.0f} ms ({step['detail']})")
     
     with col2:
         # Test de connectivité
@@ -85,10 +100,217 @@ try:
                     st.success("✅ Service Azure ML accessible")
                 else:
                     st.warning("⚠️ Service non accessible")
+        
+        # État de la sonde de santé en arrière-plan (sans appel réseau)
+        if azure_client.health is not None:
+            health = azure_client.health.snapshot()
+            state_icons = {'healthy': '🟢', 'degraded': '🟠', 'down': '🔴', 'unknown': '⚪'}
+            st.write(f"**Sonde /health:** {state_icons[health['state']]} {health['state']}")
+            st.caption(
+                f"Disponibilité {health['availability']:.0%} sur {health['probes']} sondes, "
+                f"latence p50 {health['latency_ms_p50'] or 0:.0f} ms / p95 {health['latency_ms_p95'] or 0:.0f} ms, "
+                f"prochaine sonde dans {health['next_probe_in_s'] or 0:.0f} s (intervalle {health['interval_s']:.0f} s)"
+            )
+    
+    # Ordonnanceur de micro-lots du modèle local
+    if azure_client.backend == 'local':
+        from batch_scheduler import get_batch_scheduler
+        
+        st.subheader("📦 Micro-lots de l'inférence locale")
+        metrics = get_batch_scheduler().metrics()
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("File d'attente", metrics['queue_depth'])
+        col2.metric("Lots traités", metrics['batches'])
+        col3.metric("Taille moyenne", f"{metrics['mean_batch_size']:.1f} / {metrics['max_batch_size']}")
+        col4.metric("Attente p95", f"{metrics['wait_ms_p95']:.1f} ms")
+        if metrics['batch_size_histogram']:
+            st.bar_chart({str(size): count for size, count in metrics['batch_size_histogram'].items()})
+        
+        # Caches d'embeddings (image et texte)
+        for stats in get_batch_scheduler().engine.cache_stats():
+            st.write(
+                f"**Cache {stats['name']}:** {stats['entries']} embeddings, "
+                f"{stats['bytes'] / 1024:.0f} / {stats['max_bytes'] / 1024:.0f} Ko, "
+                f"taux de succès {stats['hit_rate']:.0%}"
+            )
+    
+    # Cascade de prédiction (niveaux locaux avant le modèle complet)
+    if azure_client.cascade.enabled:
+        st.subheader("🪜 Cascade de prédiction")
+        metrics = azure_client.cascade.metrics()
+        st.write(f"**Niveaux:** {' → '.join(metrics['tiers_order'] + ['full_model'])}")
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Requêtes", metrics['requests'])
+        col2.metric("Taux d'escalade", f"{metrics['escalation_rate']:.0%}")
+        col3.metric("Échantillon fantôme", f"{metrics['shadow_rate']:.0%}")
+        st.dataframe([
+            {
+                'Niveau': tier,
+                'Réponses': stats['answered'],
+                'Part': f"{stats['share']:.0%}",
+                'Latence p50 (ms)': round(stats['latency_ms_p50'], 1),
+                'Latence p95 (ms)': round(stats['latency_ms_p95'], 1),
+                'Accord fantôme': '-' if stats['shadow_agreement'] is None
+                else f"{stats['shadow_agreement']:.0%} ({stats['shadow_compared']})"
+            }
+            for tier, stats in metrics['tiers'].items()
+        ], hide_index=True)
     
 except Exception as e:
     st.error(f"❌ Erreur lors de l'initialisation du client: {str(e)}")
 
+# Section : mesures par étape des prédictions (histogrammes et compteurs du processus)
+st.header("⏱️ Latence par étape des prédictions")
+
+
+def render_client_metrics():
+    """Panneau des mesures du client (rafraîchi automatiquement si st.fragment est disponible)"""
+    from client_metrics import get_client_metrics, embedding_cache_stats
+    
+    metrics = get_client_metrics()
+    stages = metrics.stage_summary()
+    if not stages:
+        st.info("ℹ️ Aucune prédiction mesurée depuis le démarrage du serveur")
+        return
+    
+    st.dataframe([
+        {
+            'Étape': stage['stage'],
+            'Appels': stage['count'],
+            'Moyenne (ms)': round(stage['mean_ms'], 1),
+            'p50 (ms)': round(stage['p50_ms'], 1),
+            'p95 (ms)': round(stage['p95_ms'], 1),
+            'p99 (ms)': round(stage['p99_ms'], 1)
+        }
+        for stage in stages
+    ], hide_index=True)
+    st.bar_chart({stage['stage']: stage['mean_ms'] for stage in stages if stage['stage'] != 'total'})
+    
+    counters = metrics.counters()
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Prédictions", int(sum(counters.get('predictions', {}).values())))
+    col2.metric("Erreurs", int(sum(counters.get('errors', {}).values())))
+    cache_stats = embedding_cache_stats()
+    lookups = sum(stats['hits'] + stats['misses'] for stats in cache_stats)
+    col3.metric("Succès des caches", f"{sum(stats['hits'] for stats in cache_stats) / lookups:.0%}" if lookups else "-")
+    if counters.get('request_bytes'):
+        saved = counters.get('bytes_saved', {})
+        sent = sum(counters['request_bytes'].values())
+        st.caption(
+            f"📦 Octets envoyés {sent / 1024:.0f} Ko, reçus {sum(counters.get('response_bytes', {}).values()) / 1024:.0f} Ko ; "
+            f"économisés par la compression : requêtes {saved.get((('direction', 'request'),), 0) / 1024:.0f} Ko, "
+            f"réponses {saved.get((('direction', 'response'),), 0) / 1024:.0f} Ko"
+        )
+    for name, series in counters.items():
+        if name == 'errors':
+            for labels, value in series.items():
+                st.write(f"❌ {', '.join(f'{key}={label}' for key, label in labels)}: {int(value)}")
+    
+    with st.expander("📄 Export Prometheus"):
+        export = metrics.render_prometheus()
+        st.code(export, language='text')
+        st.download_button("💾 Télécharger", export, file_name='clip_client_metrics.prom', mime='text/plain')
+
+
+if hasattr(st, 'fragment'):
+    st.fragment(run_every=5)(render_client_metrics)()
+else:
+    render_client_metrics()
+
+# Section : empreinte mémoire (sessions, catalogue, images, figures et caches partagés)
+st.header("🧠 Mémoire des sessions et des caches")
+
+from memory_budget import MB, evict_caches, get_memory_tracker
+
+memory_tracker = get_memory_tracker()
+report = memory_tracker.report()
+col1, col2, col3, col4 = st.columns(4)
+col1.metric("Mémoire résidente", f"{report['rss_bytes'] / MB:.0f} Mo")
+col2.metric(
+    "Attribuable", f"{report['attributed_bytes'] / MB:.1f} Mo",
+    help=f"Budget du processus: {report['process_budget_bytes'] / MB:.0f} Mo" if report['process_budget_bytes'] else None
+)
+col3.metric("Sessions suivies", len(report['sessions']))
+col4.metric("Catalogue", "partagé" if report['shared_catalog'] else "par session")
+
+category_labels = {'catalog': 'Catalogue', 'images': 'Images', 'figures': 'Figures', 'caches': 'Caches', 'other': 'Autres'}
+st.bar_chart({category_labels[category]: size / MB for category, size in report['by_category'].items()})
+
+if report['sessions']:
+    st.dataframe([
+        {
+            'Session': session_id[:8],
+            'Catalogue partagé': '✅' if usage['shared_catalog'] else '-',
+            **{f"{category_labels[category]} (Mo)": round(size / MB, 2) for category, size in usage['by_category'].items()},
+            'Total (Mo)': round(usage['total'] / MB, 2),
+            'Objet le plus lourd': usage['largest'][0][0] if usage['largest'] else '-'
+        }
+        for session_id, usage in report['sessions'].items()
+    ], hide_index=True)
+    if report['session_budget_bytes']:
+        st.caption(f"Budget par session: {report['session_budget_bytes'] / MB:.0f} Mo (mémoire propre, hors catalogue partagé)")
+
+if report['caches']:
+    st.dataframe([
+        {'Cache partagé': cache['name'], 'Taille (Mo)': round(cache['bytes'] / MB, 2)}
+        for cache in report['caches']
+    ], hide_index=True)
+if st.button("🧹 Vider les caches partagés"):
+    evicted = evict_caches()
+    st.success(f"✅ Caches vidés: {', '.join(evicted)}" if evicted else "ℹ️ Aucun cache à vider")
+
+for event in report['events'][:10]:
+    st.write(f"**{event['time']}** {event['action']}: {event['detail']}")
+
+traced = report['tracemalloc']
+if traced is None:
+    st.caption("ℹ️ Détail des allocations Python : lancez l'application avec `MEMORY_TRACEMALLOC=1`")
+else:
+    with st.expander(f"🔬 Allocations Python (tracemalloc): {traced['traced_bytes'] / MB:.1f} Mo, pic {traced['peak_bytes'] / MB:.1f} Mo"):
+        st.dataframe([
+            {'Catégorie': category, 'Taille (Mo)': round(size / MB, 2)}
+            for category, size in traced['by_category'].items()
+        ], hide_index=True)
+        st.dataframe([
+            {'Fichier': entry['file'], 'Taille (Mo)': round(entry['bytes'] / MB, 2)}
+            for entry in traced['top_files']
+        ], hide_index=True)
+        if traced['growth']:
+            st.write("**Croissance depuis le relevé précédent**")
+            st.dataframe([
+                {'Fichier': entry['file'], 'Croissance (Ko)': round(entry['size_diff'] / 1024, 1)}
+                for entry in traced['growth']
+            ], hide_index=True)
+
+# Profils des reruns (échantillonnage des piles, activé par PROFILE_RERUNS=1 ou ?profile=1)
+with st.expander("🔥 Profils des reruns et des prédictions"):
+    from rerun_profiler import PROFILE_DIR, list_profiles, load_collapsed, hot_functions
+    
+    profiles = list_profiles()
+    if not profiles:
+        st.info(
+            "ℹ️ Aucun profil enregistré. Ajoutez `?profile=1` à l'URL d'une page "
+            "ou lancez l'application avec `PROFILE_RERUNS=1`."
+        )
+    else:
+        selected = st.selectbox("Profil", profiles)
+        top_n = st.slider("Nombre de fonctions", 5, 50, 15)
+        stacks = load_collapsed(os.path.join(PROFILE_DIR, f"{selected}.collapsed"))
+        st.caption(f"{sum(stacks.values())} échantillons, {len(stacks)} piles distinctes")
+        st.dataframe([
+            {
+                'Fonction': hot['function'],
+                'Propre': f"{hot['self']:.1%}",
+                'Inclusif': f"{hot['inclusive']:.1%}"
+            }
+            for hot in hot_functions(stacks, top_n)
+        ], hide_index=True)
+        with open(os.path.join(PROFILE_DIR, f"{selected}.speedscope.json"), 'rb') as f:
+            st.download_button(
+                "💾 Télécharger (speedscope.app)", f.read(), file_name=f"{selected}.speedscope.json",
+                mime='application/json'
+            )
+
 # Section 3: Configuration pour Streamlit Cloud
 st.header("☁️ Configuration pour Streamlit Cloud")
 
@@ -0,0 +1,211 @@
+"""
+Négociation de l'encodage des échanges avec l'endpoint /score
+Accept-Encoding selon les décompresseurs installés, compression gzip des gros corps de requête
+quand le serveur l'accepte, et format binaire compact des résultats d'un appel /score (un produit)
+"""
+
+import os
+import gzip
+import json
+import struct
+import threading
+from typing import Dict, Any, List, Optional
+
+from lazy_imports import is_available
+
+# Compression des corps de requête : 'auto' (seulement si le serveur annonce gzip dans l'en-tête Accept-Encoding
+# de ses réponses, RFC 7694), 'gzip' (toujours, retour au corps brut si le serveur répond 415) ou 'off'
+REQUEST_COMPRESSION = os.getenv('REQUEST_COMPRESSION', 'auto').lower()
+COMPRESSION_MIN_BYTES = int(os.getenv('REQUEST_COMPRESSION_MIN_BYTES', '1024'))
+GZIP_LEVEL = 6
+
+# Résultats au format binaire compact (demandé via Accept, le serveur reste libre de répondre en JSON)
+COMPACT_RESULTS = os.getenv('COMPACT_RESULTS', '0').lower() in ('1', 'true', 'yes')
+
+COMPACT_CONTENT_TYPE = 'application/vnd.clip-results'
+MSGPACK_CONTENT_TYPE = 'application/msgpack'
+
+# En-tête du format compact : signature, drapeaux, nombre de catégories
+_MAGIC = b'CLR1'
+_FLAG_SCORES = 1
+
+
+def accept_encoding() -> str:
+    """
+    Codages de réponse acceptés (zstd et br seulement si urllib3 peut les décompresser)
+
+    Returns:
+        str: Valeur de l'en-tête Accept-Encoding
+    """
+    encodings = []
+    if is_available('zstandard'):
+        encodings.append('zstd')
+    if is_available('brotli') or is_available('brotlicffi'):
+        encodings.append('br')
+    return ', '.join(encodings + ['gzip', 'deflate'])
+
+
+def accept_results() -> str:
+    """Valeur de l'en-tête Accept (format compact préféré si COMPACT_RESULTS=1, JSON toujours accepté)"""
+    if not COMPACT_RESULTS:
+        return 'application/json'
+    types = [COMPACT_CONTENT_TYPE]
+    if is_available('msgpack'):
+        types.append(f'{MSGPACK_CONTENT_TYPE};q=0.95')
+    return ', '.join(types + ['application/json;q=0.9'])
+
+
+def encode_compact_results(results: List[Dict[str, Any]], categories: List[str], source: str = '') -> bytes:
+    """
+    Encoder des résultats de prédiction au format binaire compact (disposition fixe, petit-boutiste)
+
+    Disposition : b'CLR1', drapeaux (u8), nombre de catégories (u16) puis chaque nom (u8 longueur + UTF-8),
+    source (u16 longueur + UTF-8), nombre de produits (u32), puis par produit l'indice de la catégorie prédite (u16),
+    la confiance (f32) et, si le drapeau des scores est levé, un score f32 par catégorie
+
+    Args:
+        results (List[Dict[str, Any]]): Résultats (predicted_category, confidence, category_scores optionnel)
+        categories (List[str]): Catégories dans l'ordre des indices
+        source (str): Source commune des résultats
+
+    Returns:
+        bytes: Résultats encodés
+    """
+    index = {name: i for i, name in enumerate(categories)}
+    with_scores = bool(results) and all(result.get('category_scores') for result in results)
+    parts = [_MAGIC, struct.pack('<BH', _FLAG_SCORES if with_scores else 0, len(categories))]
+    for name in categories:
+        encoded = name.encode('utf-8')
+        parts.append(struct.pack('<B', len(encoded)) + encoded)
+    encoded_source = source.encode('utf-8')
+    parts.append(struct.pack('<H', len(encoded_source)) + encoded_source)
+    parts.append(struct.pack('<I', len(results)))
+    for result in results:
+        parts.append(struct.pack('<Hf', index[result['predicted_category']], result.get('confidence', 0.0)))
+        if with_scores:
+            scores = result['category_scores']
+            parts.append(struct.pack(f'<{len(categories)}f', *(scores.get(name, 0.0) for name in categories)))
+    return b''.join(parts)
+
+
+def decode_compact_results(data: bytes) -> Dict[str, Any]:
+    """
+    Décoder le format binaire compact
+
+    Args:
+        data (bytes): Corps de la réponse
+
+    Returns:
+        Dict[str, Any]: {'source': ..., 'results': [{'predicted_category', 'confidence', 'category_scores'?}, ...]}
+    """
+    if data[:4] != _MAGIC:
+        raise ValueError("Format compact inconnu (signature absente)")
+    flags, n_categories = struct.unpack_from('<BH', data, 4)
+    offset = 7
+    categories = []
+    for _ in range(n_categories):
+        length = data[offset]
+        categories.append(data[offset + 1:offset + 1 + length].decode('utf-8'))
+        offset += 1 + length
+    (source_length,) = struct.unpack_from('<H', data, offset)
+    source = data[offset + 2:offset + 2 + source_length].decode('utf-8')
+    offset += 2 + source_length
+    (n_results,) = struct.unpack_from('<I', data, offset)
+    offset += 4
+
+    with_scores = bool(flags & _FLAG_SCORES)
+    item = struct.Struct(f"<Hf{n_categories if with_scores else 0}f")
+    results = []
+    for values in item.iter_unpack(data[offset:offset + item.size * n_results]):
+        result = {'predicted_category': categories[values[0]], 'confidence': values[1]}
+        if with_scores:
+            result['category_scores'] = dict(zip(categories, values[2:]))
+        results.append(result)
+    return {'source': source, 'results': results}
+
+
+class PayloadNegotiator:
+    """
+    État de la négociation avec un endpoint (partagé par les threads d'un client)
+    """
+
+    def __init__(self, mode: str = REQUEST_COMPRESSION, min_bytes: int = COMPRESSION_MIN_BYTES):
+        """
+        Args:
+            mode (str): 'auto', 'gzip' ou 'off'
+            min_bytes (int): Taille minimale d'un corps compressé
+        """
+        self.mode = mode
+        self.min_bytes = min_bytes
+        # None : inconnu ; True/False : le serveur accepte (ou refuse) les corps gzip
+        self.server_accepts_gzip: Optional[bool] = None
+        self._lock = threading.Lock()
+
+    def should_compress(self, size: int) -> bool:
+        """Compresser un corps de cette taille ?"""
+        if self.mode == 'off' or size < self.min_bytes or self.server_accepts_gzip is False:
+            return False
+        return self.mode == 'gzip' or self.server_accepts_gzip is True
+
+    def compress(self, body: bytes) -> bytes:
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+    def headers(self, compressed: bool) -> Dict[str, str]:
+        """En-têtes de négociation d'une requête /score"""
+        headers = {
+            'Content-Type': 'application/json',
+            'Accept': accept_results(),
+            'Accept-Encoding': accept_encoding()
+        }
+        if compressed:
+            headers['Content-Encoding'] = 'gzip'
+        return headers
+
+    def observe_response(self, response, compressed: bool):
+        """
+        Apprendre des réponses : Accept-Encoding annoncé par le serveur, ou refus d'un corps compressé (415)
+
+        Args:
+            response (requests.Response): Réponse reçue
+            compressed (bool): Le corps envoyé était compressé
+        """
+        with self._lock:
+            if compressed and response.status_code == 415:
+                self.server_accepts_gzip = False
+                print("ℹ️ L'endpoint refuse les requêtes compressées : envoi sans compression")
+                return
+            advertised = response.headers.get('Accept-Encoding')
+            if advertised is not None and self.server_accepts_gzip is None:
+                self.server_accepts_gzip = 'gzip' in advertised.lower()
+
+    def decode(self, response) -> Dict[str, Any]:
+        """
+        Décoder une réponse /score selon son Content-Type (la décompression est faite par urllib3)
+
+        Args:
+            response (requests.Response): Réponse de l'endpoint
+
+        Returns:
+            Dict[str, Any]: Résultat du produit (même forme que la réponse JSON historique)
+        """
+        content_type = response.headers.get('Content-Type', 'application/json').split(';')[0].strip().lower()
+        if content_type == COMPACT_CONTENT_TYPE:
+            payload = decode_compact_results(response.content)
+        elif content_type == MSGPACK_CONTENT_TYPE:
+            import msgpack
+            payload = msgpack.unpackb(response.content, raw=False)
+        else:
+            return json.loads(response.content)
+        # /score classe un seul produit par requête : toute autre réponse est invalide
+        results = payload.get('results') or []
+        if len(results) != 1:
+            raise ValueError(f"Réponse compacte de {len(results)} résultats pour une requête d'un produit")
+        return {**results[0], 'source': payload.get('source')}
+
+
+def wire_bytes(response) -> int:
+    """Octets de corps reçus sur le réseau (avant décompression), à défaut la taille décodée"""
+    try:
+        return int(response.raw.tell()) or len(response.content)
+    except Exception:
+        return len(response.content)
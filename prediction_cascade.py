@@ -0,0 +1,265 @@
+"""
+Cascade de classifieurs : niveaux locaux peu coûteux d'abord, modèle CLIP complet seulement en cas de doute
+Suivi du taux d'escalade, de la latence par niveau et de l'accord avec le modèle distant (échantillon fantôme)
+"""
+
+import os
+import random
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
+
+from trace_logging import trace_prediction
+
+# Niveaux disponibles avant le modèle complet, dans l'ordre conseillé (du moins cher au plus cher)
+AVAILABLE_TIERS = ('keywords', 'prototypes', 'knn')
+FULL_MODEL_TIER = 'full_model'
+
+# Seuils par défaut (confiance minimale, écart top-2 minimal) pour répondre sans escalader
+DEFAULT_THRESHOLDS = {
+    'keywords': (0.6, 0.2),
+    'prototypes': (0.0, 0.05),
+    'knn': (0.8, 0.0)
+}
+
+# Part des réponses locales vérifiées en arrière-plan auprès du modèle distant
+SHADOW_RATE = float(os.getenv('CASCADE_SHADOW_RATE', '0.05'))
+SHADOW_MAX_PENDING = 8
+
+# Fenêtre glissante des latences conservées par niveau
+LATENCY_WINDOW = 1000
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value not in (None, '') else default
+
+
+def load_cascade_config() -> Dict[str, Any]:
+    """
+    Lire la configuration de la cascade depuis l'environnement
+    PREDICTION_CASCADE liste les niveaux (ex. 'keywords,prototypes,knn') ;
+    CASCADE_<NIVEAU>_MIN_CONFIDENCE et CASCADE_<NIVEAU>_MIN_MARGIN ajustent les seuils
+
+    Returns:
+        Dict[str, Any]: Niveaux retenus et seuils (confiance, écart) de chacun
+    """
+    from category_prototypes import PROTOTYPE_MARGIN
+
+    tiers = [t.strip().lower() for t in os.getenv('PREDICTION_CASCADE', '').split(',') if t.strip()]
+    unknown = [t for t in tiers if t not in AVAILABLE_TIERS]
+    if unknown:
+        print(f"⚠️ Niveaux de cascade inconnus ignorés: {', '.join(unknown)}")
+    tiers = [t for t in tiers if t in AVAILABLE_TIERS]
+
+    thresholds = dict(DEFAULT_THRESHOLDS)
+    # Compatibilité : PROTOTYPE_PREFILTER_MARGIN seul active le pré-filtre par prototypes
+    if PROTOTYPE_MARGIN > 0:
+        thresholds['prototypes'] = (0.0, PROTOTYPE_MARGIN)
+        if not tiers:
+            tiers = ['prototypes']
+
+    for tier in AVAILABLE_TIERS:
+        confidence, margin = thresholds[tier]
+        thresholds[tier] = (
+            _env_float(f'CASCADE_{tier.upper()}_MIN_CONFIDENCE', confidence),
+            _env_float(f'CASCADE_{tier.upper()}_MIN_MARGIN', margin)
+        )
+    return {'tiers': tiers, 'thresholds': thresholds}
+
+
+def top2_margin(result: Dict[str, Any]) -> float:
+    """
+    Écart entre les deux meilleurs scores d'une prédiction
+
+    Args:
+        result (Dict[str, Any]): Résultat au format predict_category
+
+    Returns:
+        float: Écart top-2 ('margin' s'il est fourni, sinon calculé sur category_scores)
+    """
+    if 'margin' in result:
+        return result['margin']
+    scores = sorted(result.get('category_scores', {}).values(), reverse=True)
+    if len(scores) < 2:
+        return scores[0] if scores else 0.0
+    return scores[0] - scores[1]
+
+
+class PredictionCascade:
+    """
+    Essaie chaque niveau local dans l'ordre ; le premier suffisamment sûr répond,
+    sinon la requête est transmise au modèle complet (endpoint /score ou modèle local)
+    """
+
+    def __init__(self, tiers: List[str], thresholds: Dict[str, tuple], shadow_rate: float = SHADOW_RATE):
+        """
+        Args:
+            tiers (List[str]): Niveaux essayés avant le modèle complet
+            thresholds (Dict[str, tuple]): (confiance minimale, écart top-2 minimal) par niveau
+            shadow_rate (float): Part des réponses locales comparées au modèle distant
+        """
+        self.tiers = tiers
+        self.thresholds = thresholds
+        self.shadow_rate = shadow_rate
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._answered = Counter()
+        self._latencies = {tier: deque(maxlen=LATENCY_WINDOW) for tier in (*tiers, FULL_MODEL_TIER)}
+        self._shadow_compared = Counter()
+        self._shadow_agreed = Counter()
+        self._shadow_pending = 0
+        self._shadow_executor = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.tiers)
+
+    def _run_tier(self, client, tier: str, image, brand, product_name, description, specifications):
+        if tier == 'keywords':
+            return client._predict_local_keywords(brand, product_name, description, specifications)
+        if tier == 'prototypes':
+            return client._predict_prototypes(image, brand, product_name, description, specifications)
+        if tier == 'knn':
+            return client._predict_knn(image, brand, product_name, description, specifications)
+        raise ValueError(f"Niveau de cascade inconnu: {tier}")
+
+    def _accepts(self, tier: str, result: Optional[Dict[str, Any]]) -> bool:
+        if not result or not result.get('success'):
+            return False
+        min_confidence, min_margin = self.thresholds[tier]
+        return result.get('confidence', 0.0) >= min_confidence and top2_margin(result) >= min_margin
+
+    def _record(self, tier: str, elapsed_ms: float, answered: bool):
+        with self._lock:
+            self._latencies[tier].append(elapsed_ms)
+            if answered:
+                self._answered[tier] += 1
+
+    def predict(self, client, image, brand: str, product_name: str, description: str,
+                specifications: str) -> Dict[str, Any]:
+        """
+        Prédiction en cascade (même contrat que AzureMLClient.predict_category)
+
+        Args:
+            client (AzureMLClient): Client fournissant chaque niveau et le modèle complet
+            image (Image.Image): Image du produit
+            brand (str): Marque du produit
+            product_name (str): Nom du produit
+            description (str): Description du produit
+            specifications (str): Spécifications du produit
+
+        Returns:
+            Dict[str, Any]: Résultat du premier niveau suffisamment sûr, complété de cascade_tier et cascade_path
+        """
+        with self._lock:
+            self._requests += 1
+        path = []
+        for tier in self.tiers:
+            path.append(tier)
+            start = time.perf_counter()
+            try:
+                result = self._run_tier(client, tier, image, brand, product_name, description, specifications)
+            except Exception as e:
+                print(f"⚠️ Erreur du niveau {tier}: {str(e)}")
+                result = None
+            accepted = self._accepts(tier, result)
+            self._record(tier, (time.perf_counter() - start) * 1000, accepted)
+            if accepted:
+                result['cascade_tier'] = tier
+                result['cascade_path'] = path
+                self._maybe_shadow(client, tier, result['predicted_category'],
+                                   image, brand, product_name, description, specifications)
+                return result
+
+        path.append(FULL_MODEL_TIER)
+        start = time.perf_counter()
+        result = client._predict_full_model(image, brand, product_name, description, specifications)
+        self._record(FULL_MODEL_TIER, (time.perf_counter() - start) * 1000, True)
+        result['cascade_tier'] = FULL_MODEL_TIER
+        result['cascade_path'] = path
+        return result
+
+    def _maybe_shadow(self, client, tier: str, category: str, image, *fields):
+        """Comparer en arrière-plan une réponse locale à celle du modèle distant (échantillonnage)"""
+        if self.shadow_rate <= 0 or random.random() >= self.shadow_rate:
+            return
+        # Backend local : aucune requête réseau, l'image ne quitte pas la machine
+        if client.backend != 'azure':
+            return
+        # Inutile d'interroger un endpoint connu comme hors service
+        if client.endpoint_known_down():
+            return
+        with self._lock:
+            if self._shadow_pending >= SHADOW_MAX_PENDING:
+                return
+            self._shadow_pending += 1
+            if self._shadow_executor is None:
+                self._shadow_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='cascade-shadow')
+        self._shadow_executor.submit(self._shadow, client, tier, category, image.copy(), *fields)
+
+    def _shadow(self, client, tier: str, category: str, image, *fields):
+        try:
+            # Trace propre (identifiant envoyé à l'endpoint) : durées et compteurs hors des métriques des vraies prédictions
+            with trace_prediction(sample_rate=0, shadow=True):
+                response = client._post_score(image, *fields)
+                if response.status_code != 200:
+                    return
+                remote = client._decode_score_response(response)
+            # Seules les réponses du modèle fine-tuné réel servent de référence
+            if remote.get('source') != 'azure_ml_pytorch_real':
+                return
+            with self._lock:
+                self._shadow_compared[tier] += 1
+                self._shadow_agreed[tier] += remote.get('predicted_category') == category
+        except Exception as e:
+            print(f"⚠️ Comparaison fantôme impossible: {str(e)}")
+        finally:
+            with self._lock:
+                self._shadow_pending -= 1
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Statistiques de la cascade
+
+        Returns:
+            Dict[str, Any]: Taux d'escalade, puis réponses, latences et accord fantôme par niveau
+        """
+        def percentile(values, q):
+            return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+        with self._lock:
+            requests_count = self._requests
+            tiers = {}
+            for tier, latencies in self._latencies.items():
+                values = sorted(latencies)
+                compared = self._shadow_compared.get(tier, 0)
+                tiers[tier] = {
+                    'answered': self._answered.get(tier, 0),
+                    'share': self._answered.get(tier, 0) / requests_count if requests_count else 0.0,
+                    'latency_ms_p50': percentile(values, 0.50),
+                    'latency_ms_p95': percentile(values, 0.95),
+                    'shadow_compared': compared,
+                    'shadow_agreement': self._shadow_agreed.get(tier, 0) / compared if compared else None
+                }
+        return {
+            'tiers_order': list(self.tiers),
+            'thresholds': dict(self.thresholds),
+            'requests': requests_count,
+            'escalation_rate': tiers[FULL_MODEL_TIER]['answered'] / requests_count if requests_count else 0.0,
+            'shadow_rate': self.shadow_rate,
+            'tiers': tiers
+        }
+
+
+def create_cascade() -> PredictionCascade:
+    """
+    Créer la cascade configurée par l'environnement
+
+    Returns:
+        PredictionCascade: Cascade (désactivée si aucun niveau n'est configuré)
+    """
+    config = load_cascade_config()
+    return PredictionCascade(config['tiers'], config['thresholds'])
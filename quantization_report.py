@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Rapport de parité fp32 / int8 du modèle CLIP local
+Macro-F1 sur le catalogue étiqueté, latence et mémoire résidente de chaque mode
+"""
+
+import os
+import sys
+import json
+import time
+import subprocess
+from typing import Dict, Any, List
+
+import numpy as np
+
+from catalog_embeddings import load_labeled_catalog
+from memory_budget import process_rss_bytes
+
+REPORT_PATH = os.path.join('cache', 'quantization_report.json')
+
+
+def macro_f1(y_true: List[str], y_pred: List[str]) -> float:
+    """
+    F1 macro (moyenne non pondérée des F1 par classe présente dans les étiquettes)
+
+    Args:
+        y_true (List[str]): Catégories réelles
+        y_pred (List[str]): Catégories prédites
+
+    Returns:
+        float: Macro-F1
+    """
+    y_true = np.asarray(y_true)
+    y_pred = np.asarray(y_pred)
+    scores = []
+    for label in np.unique(y_true):
+        tp = np.sum((y_pred == label) & (y_true == label))
+        fp = np.sum((y_pred == label) & (y_true != label))
+        fn = np.sum((y_pred != label) & (y_true == label))
+        scores.append(2 * tp / (2 * tp + fp + fn) if tp else 0.0)
+    return float(np.mean(scores)) if scores else 0.0
+
+
+def _current_rss_mb() -> float:
+    """Mémoire résidente actuelle (VmRSS), comparable d'un mode à l'autre une fois le modèle chargé"""
+    return process_rss_bytes() / (1024 * 1024) or float('nan')
+
+
+def _peak_rss_mb() -> float:
+    try:
+        import resource
+        # ru_maxrss est exprimé en Ko sous Linux, en octets sous macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    except ImportError:
+        return float('nan')
+
+
+def run_mode(quantization: str, model_path: str, csv_path: str, limit: int, batch_size: int,
+             latency_samples: int) -> Dict[str, Any]:
+    """
+    Évaluer un mode dans le processus courant
+
+    Args:
+        quantization (str): 'fp32' ou 'int8'
+        model_path (str): Chemin du state_dict fine-tuné (.pth)
+        csv_path (str): Chemin du CSV des produits
+        limit (int): Nombre maximal de produits (0 = tous)
+        batch_size (int): Taille des lots de l'évaluation
+        latency_samples (int): Nombre de prédictions unitaires chronométrées
+
+    Returns:
+        Dict[str, Any]: Prédictions, latences, débit et mémoire
+    """
+    from PIL import Image
+    from local_clip_engine import LocalClipEngine
+
+    df = load_labeled_catalog(csv_path, limit)
+    engine = LocalClipEngine(model_path=model_path, quantization=quantization)
+    engine.load()
+    rss_loaded = _current_rss_mb()
+
+    # Prétraitement identique au notebook, hors chronométrage du modèle
+    images, texts = [], []
+    for _, row in df.iterrows():
+        with Image.open(row['image_path']) as image:
+            processed_image, keywords = engine.preprocess(
+                image.copy(), str(row.get('brand', '') or ''), str(row['product_name']),
+                str(row.get('description', '') or ''), str(row.get('product_specifications', '') or '')
+            )
+        images.append(processed_image)
+        texts.append(keywords)
+
+    # Latence unitaire (caches vidés : les deux tours sont exécutées à chaque appel)
+    latencies = []
+    for i in range(min(latency_samples, len(images))):
+        engine.image_cache.clear()
+        engine.text_cache.clear()
+        start = time.perf_counter()
+        engine.predict_logits([images[i]], [texts[i]])
+        latencies.append((time.perf_counter() - start) * 1000)
+    engine.image_cache.clear()
+    engine.text_cache.clear()
+
+    # Évaluation complète par lots
+    predictions = []
+    start = time.perf_counter()
+    for i in range(0, len(images), batch_size):
+        probabilities = engine.predict_logits(images[i:i + batch_size], texts[i:i + batch_size])
+        predictions.extend(engine.labels[j] for j in probabilities.argmax(dim=-1).tolist())
+    elapsed = time.perf_counter() - start
+
+    return {
+        'quantization': quantization,
+        'n_products': len(df),
+        'y_true': df['main_category'].tolist(),
+        'y_pred': predictions,
+        'load_time_s': engine.load_time_s,
+        'latency_ms_p50': float(np.percentile(latencies, 50)) if latencies else 0.0,
+        'latency_ms_p95': float(np.percentile(latencies, 95)) if latencies else 0.0,
+        'throughput_per_s': len(images) / elapsed if elapsed > 0 else 0.0,
+        'rss_loaded_mb': rss_loaded,
+        'rss_peak_mb': _peak_rss_mb()
+    }
+
+
+def _run_mode_subprocess(quantization: str, args) -> Dict[str, Any]:
+    """Évaluer un mode dans un processus séparé (mesure de mémoire indépendante)"""
+    command = [
+        sys.executable, os.path.abspath(__file__), '--worker', quantization,
+        '--model', args.model, '--csv', args.csv, '--limit', str(args.limit), '--batch-size', str(args.batch_size),
+        '--latency-samples', str(args.latency_samples)
+    ]
+    env = dict(os.environ)
+    if args.threads:
+        env['LOCAL_CLIP_THREADS'] = str(args.threads)
+    result = subprocess.run(command, capture_output=True, text=True, env=env)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'échec')
+    # Le résultat est la dernière ligne de la sortie standard
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def build_report(fp32: Dict[str, Any], int8: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Comparer les deux modes
+
+    Args:
+        fp32 (Dict[str, Any]): Résultats du mode fp32
+        int8 (Dict[str, Any]): Résultats du mode int8
+
+    Returns:
+        Dict[str, Any]: Rapport de parité
+    """
+    report = {'n_products': fp32['n_products'], 'modes': {}}
+    for result in (fp32, int8):
+        report['modes'][result['quantization']] = {
+            'macro_f1': macro_f1(result['y_true'], result['y_pred']),
+            'accuracy': float(np.mean(np.asarray(result['y_true']) == np.asarray(result['y_pred']))),
+            **{key: result[key] for key in (
+                'load_time_s', 'latency_ms_p50', 'latency_ms_p95', 'throughput_per_s', 'rss_loaded_mb', 'rss_peak_mb'
+            )}
+        }
+    report['macro_f1_delta'] = report['modes']['int8']['macro_f1'] - report['modes']['fp32']['macro_f1']
+    report['prediction_agreement'] = float(np.mean(np.asarray(fp32['y_pred']) == np.asarray(int8['y_pred'])))
+    report['latency_speedup_p50'] = (
+        fp32['latency_ms_p50'] / int8['latency_ms_p50'] if int8['latency_ms_p50'] else 0.0
+    )
+    report['rss_saving_mb'] = fp32['rss_peak_mb'] - int8['rss_peak_mb']
+    return report
+
+
+def print_report(report: Dict[str, Any]):
+    """Afficher le rapport sous forme de tableau"""
+    print(f"📊 Parité fp32 / int8 sur {report['n_products']} produits")
+    print("=" * 60)
+    print(f"{'':24}{'fp32':>16}{'int8':>16}")
+    rows = [
+        ('Macro-F1', 'macro_f1', '{:.4f}'),
+        ('Exactitude', 'accuracy', '{:.4f}'),
+        ('Latence p50 (ms)', 'latency_ms_p50', '{:.1f}'),
+        ('Latence p95 (ms)', 'latency_ms_p95', '{:.1f}'),
+        ('Débit (produits/s)', 'throughput_per_s', '{:.1f}'),
+        ('RSS après chargement', 'rss_loaded_mb', '{:.0f} Mo'),
+        ('RSS maximale', 'rss_peak_mb', '{:.0f} Mo'),
+    ]
+    for title, key, fmt in rows:
+        print(f"{title:24}{fmt.format(report['modes']['fp32'][key]):>16}{fmt.format(report['modes']['int8'][key]):>16}")
+    print("=" * 60)
+    print(f"Δ Macro-F1 (int8 - fp32): {report['macro_f1_delta']:+.4f}")
+    print(f"Prédictions identiques: {report['prediction_agreement']:.1%}")
+    print(f"Accélération p50: x{report['latency_speedup_p50']:.2f}")
+    print(f"Mémoire économisée: {report['rss_saving_mb']:.0f} Mo")
+
+
+def main():
+    """Générer le rapport de parité en ligne de commande"""
+    import argparse
+    from local_clip_engine import LOCAL_MODEL_PATH
+
+    parser = argparse.ArgumentParser(description="Rapport de parité fp32 / int8 du modèle CLIP local")
+    parser.add_argument('--model', default=LOCAL_MODEL_PATH, help="State_dict fine-tuné (.pth)")
+    parser.add_argument('--csv', default='produits_original.csv', help="CSV des produits étiquetés")
+    parser.add_argument('--limit', type=int, default=0, help="Nombre maximal de produits (0 = tous)")
+    parser.add_argument('--batch-size', type=int, default=16, help="Taille des lots de l'évaluation")
+    parser.add_argument('--latency-samples', type=int, default=50, help="Prédictions unitaires chronométrées")
+    parser.add_argument('--threads', type=int, default=0, help="Threads intra-op de PyTorch (0 = défaut)")
+    parser.add_argument('--output', default=REPORT_PATH, help="Fichier JSON du rapport")
+    parser.add_argument('--worker', choices=['fp32', 'int8'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        result = run_mode(args.worker, args.model, args.csv, args.limit, args.batch_size, args.latency_samples)
+        print(json.dumps(result))
+        return True
+
+    try:
+        fp32 = _run_mode_subprocess('fp32', args)
+        int8 = _run_mode_subprocess('int8', args)
+    except Exception as e:
+        print(f"❌ Évaluation impossible: {str(e)}")
+        return False
+
+    report = build_report(fp32, int8)
+    print_report(report)
+
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"💾 Rapport sauvegardé: {args.output}")
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    exit(0 if success else 1)
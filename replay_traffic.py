@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Rejeu hors ligne d'un trafic enregistré par traffic_recorder (TRAFFIC_RECORD_FILE)
+Reproduit la forme du trafic (écarts entre arrivées, dimensions des images, longueur des textes, répétitions)
+contre le serveur /score de substitution, un endpoint donné ou le modèle local, à vitesse x1 ou xN
+"""
+
+import os
+import csv
+import time
+import json
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List
+
+import numpy as np
+
+from load_harness import start_stub_server, _commit
+from traffic_recorder import load_traffic
+
+REPORT_PATH = os.path.join('cache', 'replay_report.json')
+
+
+def load_vocabulary(csv_path: str, max_rows: int = 500) -> List[str]:
+    """
+    Mots des produits du catalogue, pour reconstituer des textes de la longueur enregistrée
+
+    Args:
+        csv_path (str): CSV des produits
+        max_rows (int): Lignes lues
+
+    Returns:
+        List[str]: Vocabulaire (mots distincts, ordre stable)
+    """
+    words = {}
+    try:
+        with open(csv_path, 'r', encoding='utf-8') as f:
+            for i, row in enumerate(csv.DictReader(f)):
+                if i >= max_rows:
+                    break
+                for column in ('product_name', 'description'):
+                    for word in (row.get(column) or '').split():
+                        words.setdefault(word, None)
+    except OSError:
+        pass
+    return list(words) or ['produit', 'catalogue', 'article', 'marque', 'couleur', 'taille']
+
+
+def synthesize_text(length: int, seed: str, vocabulary: List[str]) -> str:
+    """Texte de longueur donnée, identique pour une même empreinte (les répétitions restent des répétitions)"""
+    if not length:
+        return ''
+    rng = random.Random(seed)
+    words, size = [], 0
+    while size < length:
+        word = rng.choice(vocabulary)
+        words.append(word)
+        size += len(word) + 1
+    return ' '.join(words)[:length]
+
+
+def synthesize_image(size: List[int], seed: str):
+    """
+    Image de la taille enregistrée, identique pour une même empreinte
+    Dégradé basse résolution agrandi : se compresse comme une photo, contrairement à un bruit pur
+
+    Args:
+        size (List[int]): [largeur, hauteur]
+        seed (str): Empreinte de l'image d'origine
+
+    Returns:
+        Image.Image: Image RGB
+    """
+    from PIL import Image
+
+    width, height = size or (224, 224)
+    rng = np.random.default_rng(int(seed, 16) if seed else 0)
+    small = Image.fromarray(rng.integers(0, 256, (8, 8, 3), dtype=np.uint8), 'RGB')
+    return small.resize((max(1, width), max(1, height)), Image.BILINEAR)
+
+
+def build_requests(entries: List[Dict[str, Any]], speed: float, max_gap_s: float, csv_path: str) -> List[Dict[str, Any]]:
+    """
+    Planning du rejeu : instant de départ relatif et produit synthétique de chaque requête enregistrée
+
+    Args:
+        entries (List[Dict[str, Any]]): Entrées enregistrées, triées par arrivée
+        speed (float): Facteur d'accélération (2 = deux fois plus vite)
+        max_gap_s (float): Écart maximal conservé entre deux arrivées (pauses de l'enregistrement écourtées)
+        csv_path (str): CSV des produits (vocabulaire)
+
+    Returns:
+        List[Dict[str, Any]]: Requêtes {'at', 'inputs', 'entry'}
+    """
+    vocabulary = load_vocabulary(csv_path)
+    images, texts = {}, {}
+    requests, offset = [], 0.0
+    for i, entry in enumerate(entries):
+        if i:
+            offset += min(max(0.0, entry['t'] - entries[i - 1]['t']), max_gap_s) / speed
+        image_key = (entry.get('ih'), tuple(entry.get('img') or ()))
+        if image_key not in images:
+            images[image_key] = synthesize_image(entry.get('img'), entry.get('ih'))
+        text_key = (entry.get('th'), tuple(entry.get('tl') or ()))
+        if text_key not in texts:
+            lengths = list(entry.get('tl') or [0, 20, 0, 0])
+            texts[text_key] = tuple(synthesize_text(length, f"{entry.get('th')}:{field}", vocabulary)
+                                    for field, length in enumerate(lengths))
+        requests.append({'at': offset, 'inputs': (images[image_key],) + texts[text_key], 'entry': entry})
+    return requests
+
+
+def replay(client, requests: List[Dict[str, Any]], workers: int) -> List[Dict[str, Any]]:
+    """
+    Rejeu en boucle ouverte : chaque requête part à son instant planifié, sans attendre les réponses précédentes
+
+    Args:
+        client (AzureMLClient): Client configuré sur la cible
+        requests (List[Dict[str, Any]]): Planning de build_requests
+        workers (int): Requêtes simultanées au plus (au-delà, le retard au départ est mesuré)
+
+    Returns:
+        List[Dict[str, Any]]: Par requête : retard au départ, latence, succès et payload
+    """
+    outcomes = [None] * len(requests)
+    lock = threading.Lock()
+    start = time.perf_counter()
+
+    def send(i: int):
+        request = requests[i]
+        began = time.perf_counter()
+        result = client.predict_category(*request['inputs'])
+        finished = time.perf_counter()
+        with lock:
+            outcomes[i] = {
+                'lag_ms': (began - start - request['at']) * 1000,
+                'latency_ms': (finished - began) * 1000,
+                'success': bool(result.get('success')),
+                'category': result.get('predicted_category'),
+                'error': result.get('error')
+            }
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for i, request in enumerate(requests):
+            delay = start + request['at'] - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(send, i)
+    outcomes.append({'wall_s': time.perf_counter() - start})
+    return outcomes
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {'p50': None, 'p95': None, 'p99': None}
+    return {name: float(np.percentile(values, q)) for name, q in (('p50', 50), ('p95', 95), ('p99', 99))}
+
+
+def summarize(entries: List[Dict[str, Any]], requests: List[Dict[str, Any]], outcomes: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Comparer le trafic enregistré et le rejeu
+
+    Args:
+        entries (List[Dict[str, Any]]): Entrées enregistrées
+        requests (List[Dict[str, Any]]): Planning du rejeu
+        outcomes (List[Dict[str, Any]]): Résultats de replay (durée totale en dernier)
+
+    Returns:
+        Dict[str, Any]: Latences, débits, retards au départ, erreurs et répétitions
+    """
+    wall_s = outcomes[-1]['wall_s']
+    outcomes = outcomes[:-1]
+    recorded_span_s = (entries[-1]['t'] - entries[0]['t']) if len(entries) > 1 else 0.0
+    return {
+        'requests': len(entries),
+        'distinct_images': len({entry.get('ih') for entry in entries}),
+        'distinct_texts': len({entry.get('th') for entry in entries}),
+        'recorded': {
+            'latency_ms': _percentiles([entry['lat'] for entry in entries if entry.get('lat') is not None]),
+            'http_ms': _percentiles([entry['st']['http'] for entry in entries if 'http' in (entry.get('st') or {})]),
+            'span_s': recorded_span_s,
+            'throughput_per_s': len(entries) / recorded_span_s if recorded_span_s else None,
+            'errors': sum(not entry.get('ok') for entry in entries)
+        },
+        'replayed': {
+            'latency_ms': _percentiles([o['latency_ms'] for o in outcomes]),
+            'schedule_lag_ms': _percentiles([o['lag_ms'] for o in outcomes]),
+            'span_s': requests[-1]['at'] if requests else 0.0,
+            'wall_s': wall_s,
+            'throughput_per_s': len(outcomes) / wall_s if wall_s else None,
+            'errors': sum(not o['success'] for o in outcomes),
+            'first_error': next((o['error'] for o in outcomes if not o['success']), None)
+        }
+    }
+
+
+def _ms(value) -> str:
+    return f"{value:.1f}" if value is not None else "—"
+
+
+def main():
+    """Rejouer un enregistrement et écrire le rapport JSON"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Rejeu hors ligne d'un trafic enregistré")
+    parser.add_argument('recording', help="Fichier écrit par TRAFFIC_RECORD_FILE")
+    parser.add_argument('--speed', type=float, default=1.0, help="Facteur d'accélération (x1 = rythme enregistré)")
+    parser.add_argument('--max-gap-s', type=float, default=5.0, help="Écart maximal conservé entre deux arrivées")
+    parser.add_argument('--limit', type=int, default=None, help="Nombre maximal de requêtes rejouées")
+    parser.add_argument('--workers', type=int, default=32, help="Requêtes simultanées au plus")
+    parser.add_argument('--latency-ms', type=float, default=None,
+                        help="Latence du serveur de substitution (défaut : médiane HTTP enregistrée)")
+    parser.add_argument('--jitter-ms', type=float, default=None, help="Écart-type de la latence injectée")
+    parser.add_argument('--csv', default='produits_original.csv', help="CSV des produits (vocabulaire)")
+    parser.add_argument('--endpoint', default=None, help="Endpoint /score existant (sinon serveur local)")
+    parser.add_argument('--backend', choices=['azure', 'local'], default='azure',
+                        help="local : modèle CLIP local (pas d'appel /score)")
+    parser.add_argument('--output', default=REPORT_PATH, help="Fichier JSON du rapport")
+    parser.add_argument('--trace-log', default='', help="Journal JSONL des traces de prédiction ('' = désactivé)")
+    args = parser.parse_args()
+
+    entries = load_traffic(args.recording)[:args.limit]
+    if not entries:
+        print(f"❌ Aucune requête enregistrée dans {args.recording}")
+        return False
+    requests = build_requests(entries, args.speed, args.max_gap_s, args.csv)
+
+    from trace_logging import configure_trace_log
+    from azure_client import AzureMLClient
+
+    # Traces de prédiction désactivées par défaut ou écrites dans --trace-log, jamais mêlées à la progression affichée
+    configure_trace_log(args.trace_log)
+
+    process = None
+    endpoint = args.endpoint
+    if endpoint is None and args.backend == 'azure':
+        recorded_http = _percentiles([entry['st']['http'] for entry in entries if 'http' in (entry.get('st') or {})])
+        latency_ms = args.latency_ms if args.latency_ms is not None else (recorded_http['p50'] or 50.0)
+        jitter_ms = args.jitter_ms if args.jitter_ms is not None else (
+            max(0.0, (recorded_http['p95'] or latency_ms) - latency_ms) / 1.645)
+        process, endpoint = start_stub_server(latency_ms, jitter_ms)
+        print(f"🧪 Serveur de substitution: {latency_ms:.0f}±{jitter_ms:.0f} ms")
+    try:
+        client = AzureMLClient(show_warning=False)
+        client.backend = args.backend
+        client.endpoint_url = endpoint or client.endpoint_url
+        # Le rejeu ne doit pas s'enregistrer lui-même dans le fichier rejoué
+        client.recorder = None
+
+        print(f"🔁 Rejeu de {len(entries)} requêtes à x{args.speed:g} ({requests[-1]['at']:.1f}s planifiées) "
+              f"vers {endpoint or 'le modèle local'}")
+        print("=" * 60)
+        outcomes = replay(client, requests, args.workers)
+    finally:
+        if process is not None:
+            process.kill()
+
+    summary = summarize(entries, requests, outcomes)
+    recorded, replayed = summary['recorded'], summary['replayed']
+    print(f"📼 Enregistré: p50 {_ms(recorded['latency_ms']['p50'])} ms, p95 {_ms(recorded['latency_ms']['p95'])} ms, "
+          f"{_ms(recorded['throughput_per_s'])} req/s, {recorded['errors']} erreurs")
+    print(f"🔁 Rejoué:     p50 {_ms(replayed['latency_ms']['p50'])} ms, p95 {_ms(replayed['latency_ms']['p95'])} ms, "
+          f"{_ms(replayed['throughput_per_s'])} req/s, {replayed['errors']} erreurs")
+    print(f"⏱️ Retard au départ: p50 {_ms(replayed['schedule_lag_ms']['p50'])} ms, "
+          f"p95 {_ms(replayed['schedule_lag_ms']['p95'])} ms "
+          f"({summary['distinct_images']} images et {summary['distinct_texts']} textes distincts)")
+    if replayed['first_error']:
+        print(f"❌ Première erreur: {replayed['first_error']}")
+
+    report = {
+        'commit': _commit(),
+        'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'recording': args.recording,
+        'backend': args.backend,
+        'endpoint': 'stub' if process is not None else endpoint,
+        'speed': args.speed,
+        'max_gap_s': args.max_gap_s,
+        **summary
+    }
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print("=" * 60)
+    print(f"💾 Rapport sauvegardé: {args.output}")
+    # Les échecs déjà présents dans l'enregistrement ne comptent pas comme une régression
+    return replayed['errors'] <= recorded['errors']
+
+
+if __name__ == "__main__":
+    success = main()
+    exit(0 if success else 1)
@@ -0,0 +1,297 @@
+"""
+Profilage par échantillonnage des reruns Streamlit et des prédictions (optionnel)
+Un thread relève la pile du thread profilé à intervalle fixe ; chaque rerun est sauvegardé
+en piles repliées (flame graph) et au format speedscope
+"""
+
+import os
+import sys
+import time
+import threading
+from collections import Counter
+from functools import wraps
+from typing import Dict, Any, List, Optional
+
+# Activation : PROFILE_RERUNS=1 (toutes les pages et les prédictions) ou ?profile=1 dans l'URL d'une page
+PROFILE_ENABLED = os.getenv('PROFILE_RERUNS', '0').lower() in ('1', 'true', 'yes')
+PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join('cache', 'profiles'))
+INTERVAL_MS = float(os.getenv('PROFILE_INTERVAL_MS', '5'))
+
+# Nombre de profils conservés (les plus anciens sont supprimés)
+PROFILE_KEEP = int(os.getenv('PROFILE_KEEP', '50'))
+
+# Durée maximale d'un profil (sécurité si la fin du rerun n'est pas détectée)
+MAX_DURATION_S = 300
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Profileurs actifs par thread (un seul à la fois par thread)
+_active: Dict[int, 'SamplingProfiler'] = {}
+_active_lock = threading.Lock()
+
+
+def _frame_label(code) -> str:
+    path = code.co_filename
+    if path.startswith(ROOT):
+        path = os.path.relpath(path, ROOT)
+    else:
+        path = '/'.join(path.replace('\\', '/').split('/')[-2:])
+    return f"{code.co_name} ({path}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """
+    Échantillonneur de pile d'un thread (sys._current_frames), sans dépendance externe
+    """
+
+    def __init__(self, name: str, thread_id: Optional[int] = None, interval_ms: float = INTERVAL_MS,
+                 watch_file: Optional[str] = None):
+        """
+        Args:
+            name (str): Nom du profil (page ou méthode)
+            thread_id (int): Thread profilé (par défaut le thread appelant)
+            interval_ms (float): Intervalle d'échantillonnage
+            watch_file (str): Script dont la fin d'exécution arrête et sauvegarde le profil (rerun d'une page)
+        """
+        self.name = name
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval_s = interval_ms / 1000
+        self.watch_file = os.path.realpath(watch_file) if watch_file else None
+        self.stacks: Counter = Counter()
+        self.started_at = time.time()
+        self.duration_s = 0.0
+        self.saved_path: Optional[str] = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._watch_seen = False
+        self._watch_codes = set()
+        self._other_codes = set()
+
+    def _in_watched_script(self, frame) -> bool:
+        while frame is not None:
+            code = frame.f_code
+            if code in self._watch_codes:
+                return True
+            if code.co_name == '<module>' and code not in self._other_codes:
+                if os.path.realpath(code.co_filename) == self.watch_file:
+                    self._watch_codes.add(code)
+                    return True
+                self._other_codes.add(code)
+            frame = frame.f_back
+        return False
+
+    def _sample(self) -> bool:
+        frame = sys._current_frames().get(self.thread_id)
+        if frame is None:
+            return False
+        if self.watch_file:
+            in_script = self._in_watched_script(frame)
+            self._watch_seen = self._watch_seen or in_script
+            if self._watch_seen and not in_script:
+                return False
+        stack = []
+        while frame is not None:
+            stack.append(_frame_label(frame.f_code))
+            frame = frame.f_back
+        self.stacks[tuple(reversed(stack))] += 1
+        return True
+
+    def _run(self):
+        start = time.perf_counter()
+        while not self._stop.wait(self.interval_s):
+            if not self._sample() or time.perf_counter() - start > MAX_DURATION_S:
+                break
+        self.duration_s = time.perf_counter() - start
+        if self.watch_file:
+            # Fin du rerun détectée par l'échantillonneur : il sauvegarde lui-même le profil
+            self._finish()
+
+    def start(self) -> 'SamplingProfiler':
+        self._thread = threading.Thread(target=self._run, name=f'profiler-{self.name}', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> Optional[str]:
+        """
+        Arrêter l'échantillonnage et sauvegarder le profil
+
+        Returns:
+            str: Chemin du profil speedscope, ou None si aucun échantillon
+        """
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        if not self.watch_file:
+            self._finish()
+        return self.saved_path
+
+    def _finish(self):
+        with _active_lock:
+            if _active.get(self.thread_id) is self:
+                del _active[self.thread_id]
+        if self.stacks:
+            try:
+                self.saved_path = self.save(PROFILE_DIR)
+            except Exception as e:
+                print(f"⚠️ Sauvegarde du profil impossible: {str(e)}")
+
+    def collapsed(self) -> str:
+        """Piles repliées (format flamegraph.pl / speedscope : 'a;b;c nombre')"""
+        return "\n".join(f"{';'.join(stack)} {count}" for stack, count in self.stacks.most_common()) + "\n"
+
+    def speedscope(self) -> Dict[str, Any]:
+        """Profil au format speedscope (profil échantillonné, une entrée par pile distincte)"""
+        frames, index = [], {}
+        samples, weights = [], []
+        for stack, count in self.stacks.items():
+            ids = []
+            for label in stack:
+                if label not in index:
+                    index[label] = len(frames)
+                    frames.append({'name': label})
+                ids.append(index[label])
+            samples.append(ids)
+            weights.append(count * self.interval_s * 1000)
+        return {
+            '$schema': 'https://www.speedscope.app/file-format-schema.json',
+            'shared': {'frames': frames},
+            'profiles': [{
+                'type': 'sampled', 'name': self.name, 'unit': 'milliseconds',
+                'startValue': 0, 'endValue': sum(weights), 'samples': samples, 'weights': weights
+            }],
+            'name': self.name,
+            'exporter': 'rerun_profiler'
+        }
+
+    def save(self, directory: str) -> str:
+        """
+        Écrire le profil (.collapsed et .speedscope.json) et purger les plus anciens
+
+        Args:
+            directory (str): Dossier des profils
+
+        Returns:
+            str: Chemin du fichier speedscope
+        """
+        import json
+
+        os.makedirs(directory, exist_ok=True)
+        stamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(self.started_at))
+        base = os.path.join(directory, f"{stamp}-{int(self.started_at * 1000) % 1000:03d}_{self.name}")
+        with open(f"{base}.collapsed", 'w', encoding='utf-8') as f:
+            f.write(self.collapsed())
+        with open(f"{base}.speedscope.json", 'w', encoding='utf-8') as f:
+            json.dump(self.speedscope(), f)
+        _prune(directory, PROFILE_KEEP)
+        return f"{base}.speedscope.json"
+
+
+def _prune(directory: str, keep: int):
+    profiles = sorted(list_profiles(directory), reverse=True)
+    for name in profiles[keep:]:
+        for suffix in ('.collapsed', '.speedscope.json'):
+            try:
+                os.remove(os.path.join(directory, name + suffix))
+            except OSError:
+                pass
+
+
+def list_profiles(directory: str = PROFILE_DIR) -> List[str]:
+    """
+    Profils disponibles, du plus récent au plus ancien
+
+    Returns:
+        List[str]: Noms de base des profils (sans extension)
+    """
+    if not os.path.isdir(directory):
+        return []
+    names = [f[:-len('.collapsed')] for f in os.listdir(directory) if f.endswith('.collapsed')]
+    return sorted(names, reverse=True)
+
+
+def load_collapsed(path: str) -> Counter:
+    """Relire des piles repliées"""
+    stacks = Counter()
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            stack, _, count = line.rstrip('\n').rpartition(' ')
+            if stack:
+                stacks[tuple(stack.split(';'))] += int(count)
+    return stacks
+
+
+def hot_functions(stacks: Counter, top_n: int = 15) -> List[Dict[str, Any]]:
+    """
+    Fonctions les plus coûteuses d'un profil
+
+    Args:
+        stacks (Counter): Piles échantillonnées et leur nombre d'échantillons
+        top_n (int): Nombre de fonctions renvoyées
+
+    Returns:
+        List[Dict[str, Any]]: Fonction, part propre (en tête de pile) et part inclusive des échantillons
+    """
+    total = sum(stacks.values())
+    if not total:
+        return []
+    self_counts, inclusive_counts = Counter(), Counter()
+    for stack, count in stacks.items():
+        self_counts[stack[-1]] += count
+        for label in set(stack):
+            inclusive_counts[label] += count
+    ranked = sorted(inclusive_counts, key=lambda label: (self_counts[label], inclusive_counts[label]), reverse=True)
+    return [
+        {'function': label, 'self': self_counts[label] / total, 'inclusive': inclusive_counts[label] / total}
+        for label in ranked[:top_n]
+    ]
+
+
+def _requested_by_query() -> bool:
+    try:
+        import streamlit as st
+        return str(st.query_params.get('profile', '')).lower() in ('1', 'true', 'yes')
+    except Exception:
+        return False
+
+
+def profile_page(page_file: str):
+    """
+    Profiler le rerun courant d'une page (à appeler en tête du script de la page)
+    Le profil est sauvegardé automatiquement quand le script se termine (y compris st.stop ou exception)
+
+    Args:
+        page_file (str): __file__ de la page
+    """
+    if not (PROFILE_ENABLED or _requested_by_query()):
+        return
+    thread_id = threading.get_ident()
+    with _active_lock:
+        if thread_id in _active:
+            return
+        name = os.path.splitext(os.path.basename(page_file))[0]
+        _active[thread_id] = SamplingProfiler(name, thread_id, watch_file=page_file).start()
+
+
+def profiled(name: str):
+    """
+    Décorateur : profiler chaque appel hors rerun profilé (ex. prédictions lancées par un outil en ligne de commande)
+
+    Args:
+        name (str): Nom des profils produits
+    """
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            thread_id = threading.get_ident()
+            if not PROFILE_ENABLED or thread_id in _active:
+                return function(*args, **kwargs)
+            profiler = SamplingProfiler(name, thread_id)
+            with _active_lock:
+                _active[thread_id] = profiler
+            profiler.start()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                profiler.stop()
+        return wrapper
+    return decorator
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Script pour vérifier les chemins d'erreur de l'ordonnanceur de micro-lots
+Moteur factice : aucune requête ne doit rester en attente et le thread de traitement doit survivre
+"""
+
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from batch_scheduler import MicroBatchScheduler
+
+TIMEOUT_S = 5
+
+
+class FakeEngine:
+    """Moteur minimal : une ligne de probabilités par requête, pannes déclenchées par mot-clé"""
+
+    def __init__(self):
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def preprocess(self, image, brand, product_name, description, specifications):
+        return image, product_name
+
+    def predict_logits(self, images, keywords):
+        with self.lock:
+            self.calls += 1
+        if 'crash-lot' in keywords:
+            raise RuntimeError('passe avant en échec')
+        if 'lot-court' in keywords:
+            return [[1.0]] * (len(keywords) - 1)
+        return [[1.0] for _ in keywords]
+
+    def format_result(self, row, keywords, total_ms):
+        if keywords == 'crash-format':
+            raise ValueError('mise en forme impossible')
+        return {'success': True, 'predicted_category': keywords, 'confidence': row[0], 'source': 'local_clip'}
+
+
+def _submit_batch(scheduler, names):
+    """Soumettre plusieurs requêtes dans le même lot (attente du lot plus longue que la soumission)"""
+    return [scheduler.submit(None, '', name, '', '') for name in names]
+
+
+def test_format_error_only_fails_its_request():
+    """Une erreur de format_result au milieu d'un lot n'atteint que sa requête"""
+    scheduler = MicroBatchScheduler(FakeEngine(), max_batch_size=3, max_wait_ms=200)
+    futures = _submit_batch(scheduler, ['a', 'crash-format', 'c'])
+    results = [future.result(timeout=TIMEOUT_S) for future in futures]
+    assert [result['success'] for result in results] == [True, False, True]
+    assert results[1]['source'] == 'local_clip_exception'
+    assert all(result.get('batch_size') == 3 for result in (results[0], results[2]))
+
+
+def test_worker_survives_batch_errors():
+    """Après un lot en échec, un lot trop court ou une erreur de format, le thread sert encore les requêtes"""
+    scheduler = MicroBatchScheduler(FakeEngine(), max_batch_size=2, max_wait_ms=200)
+    expected = {('crash-lot', 'b'): [False, False], ('lot-court', 'b'): [True, False], ('crash-format', 'b'): [False, True]}
+    for names, successes in expected.items():
+        results = [future.result(timeout=TIMEOUT_S) for future in _submit_batch(scheduler, names)]
+        assert [result['success'] for result in results] == successes
+    worker = scheduler._worker
+    result = scheduler.predict_category(None, '', 'apres', '', '', timeout=TIMEOUT_S)
+    assert result['success'] and result['predicted_category'] == 'apres'
+    assert scheduler._worker is worker and worker.is_alive()
+
+
+def test_failed_batch_resolves_every_request():
+    """Une passe avant en échec résout toutes les requêtes du lot avec une erreur"""
+    scheduler = MicroBatchScheduler(FakeEngine(), max_batch_size=4, max_wait_ms=200)
+    results = [future.result(timeout=TIMEOUT_S) for future in _submit_batch(scheduler, ['crash-lot', 'b', 'c', 'd'])]
+    assert [result['success'] for result in results] == [False] * 4
+    assert all('passe avant en échec' in result['error'] for result in results)
+
+
+def main():
+    """Fonction principale de vérification"""
+    print("🧪 Vérification de l'ordonnanceur de micro-lots")
+    print("=" * 60)
+
+    success = True
+    for test in (test_format_error_only_fails_its_request, test_worker_survives_batch_errors,
+                 test_failed_batch_resolves_every_request):
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except Exception as e:
+            print(f"❌ {test.__name__}: {type(e).__name__} {str(e)}")
+            success = False
+
+    print("\n" + "=" * 60)
+    print("🎉 Ordonnanceur conforme" if success else "❌ Ordonnanceur en échec")
+    return success
+
+
+if __name__ == "__main__":
+    success = main()
+    exit(0 if success else 1)
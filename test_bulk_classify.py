@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Script pour vérifier la reprise de la classification en masse
+Client factice et petit CSV temporaire : les produits en erreur sont réessayés, jamais les produits réussis
+"""
+
+import os
+import sys
+import json
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pandas as pd
+from PIL import Image
+
+from bulk_classify import export_parquet, load_done_ids, load_latest_rows, run_bulk
+
+PRODUCT_IDS = ['p0', 'p1', 'p2', 'p3']
+
+
+class FakeClient:
+    """Client minimal : échoue pour les produits de `down` (panne passagère de l'endpoint)"""
+
+    def __init__(self, down=()):
+        self.down = set(down)
+        self.calls = []
+
+    def predict_category(self, image, brand, product_name, description, specifications):
+        self.calls.append(product_name)
+        if product_name in self.down:
+            return {'success': False, 'error': 'endpoint indisponible', 'source': 'azure_ml_exception'}
+        return {'success': True, 'predicted_category': 'Watches', 'confidence': 0.9, 'source': 'azure_ml_pytorch_real'}
+
+
+def _write_catalog(directory: str) -> str:
+    """CSV au format de produits_original.csv, avec une image par produit"""
+    images_dir = os.path.join(directory, 'Images')
+    os.makedirs(images_dir)
+    for uniq_id in PRODUCT_IDS:
+        Image.new('RGB', (8, 8)).save(os.path.join(images_dir, f"{uniq_id}.jpg"))
+    csv_path = os.path.join(directory, 'produits.csv')
+    pd.DataFrame({
+        'uniq_id': PRODUCT_IDS,
+        'product_name': PRODUCT_IDS,
+        'brand': 'marque',
+        'description': 'description',
+        'product_specifications': '',
+        'image': [f"{uniq_id}.jpg" for uniq_id in PRODUCT_IDS],
+        'product_category_tree': '["Watches >> Wrist Watches"]'
+    }).to_csv(csv_path, index=False)
+    return csv_path
+
+
+def _run(client, directory: str, csv_path: str, resume: bool = True):
+    output_path = os.path.join(directory, 'bulk.jsonl')
+    return run_bulk(client, csv_path, output_path, workers=2, images_dir=os.path.join(directory, 'Images'),
+                    resume=resume), output_path
+
+
+def test_resume_retries_failed_products():
+    """Après une panne, la reprise ne reclasse que les produits en erreur"""
+    with tempfile.TemporaryDirectory() as directory:
+        csv_path = _write_catalog(directory)
+        summary, output_path = _run(FakeClient(down={'p1', 'p3'}), directory, csv_path)
+        assert summary['processed'] == 4 and summary['errors'] == 2
+        assert load_done_ids(output_path) == {'p0', 'p2'}
+
+        client = FakeClient()
+        summary, output_path = _run(client, directory, csv_path)
+        assert sorted(client.calls) == ['p1', 'p3']
+        assert summary['skipped'] == 2 and summary['errors'] == 0
+        assert summary['output_products'] == 4 and summary['output_errors'] == 0
+        assert load_done_ids(output_path) == set(PRODUCT_IDS)
+
+
+def test_latest_attempt_wins():
+    """Le fichier garde toutes les tentatives ; le bilan et l'export ne gardent que la dernière par produit"""
+    with tempfile.TemporaryDirectory() as directory:
+        csv_path = _write_catalog(directory)
+        _run(FakeClient(down={'p1'}), directory, csv_path)
+        _, output_path = _run(FakeClient(), directory, csv_path)
+        with open(output_path, encoding='utf-8') as f:
+            attempts = [json.loads(line)['uniq_id'] for line in f]
+        assert sorted(attempts) == ['p0', 'p1', 'p1', 'p2', 'p3']
+        latest = load_latest_rows(output_path)
+        assert sorted(latest) == PRODUCT_IDS and all(row['success'] for row in latest.values())
+
+        parquet_path = os.path.join(directory, 'bulk.parquet')
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            return
+        assert export_parquet(output_path, parquet_path) == parquet_path
+        exported = pd.read_parquet(parquet_path)
+        assert len(exported) == 4 and exported['uniq_id'].is_unique
+
+
+def test_partial_last_line_is_ignored():
+    """Une dernière ligne tronquée (arrêt brutal) ne compte pas comme classée"""
+    with tempfile.TemporaryDirectory() as directory:
+        output_path = os.path.join(directory, 'bulk.jsonl')
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'uniq_id': 'p0', 'success': True}) + '\n{"uniq_id": "p1", "succ')
+        assert load_done_ids(output_path) == {'p0'}
+
+
+def main():
+    """Fonction principale de vérification"""
+    print("🧪 Vérification de la reprise de bulk_classify")
+    print("=" * 60)
+
+    success = True
+    for test in (test_resume_retries_failed_products, test_latest_attempt_wins, test_partial_last_line_is_ignored):
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except Exception as e:
+            print(f"❌ {test.__name__}: {type(e).__name__} {str(e)}")
+            success = False
+
+    print("\n" + "=" * 60)
+    print("🎉 Reprise conforme" if success else "❌ Reprise en échec")
+    return success
+
+
+if __name__ == "__main__":
+    success = main()
+    exit(0 if success else 1)
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Script pour vérifier le cache LRU d'embeddings
+Borne en octets, ordre d'éviction, stockage float16, clés de contenu et accès concurrents
+"""
+
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+from PIL import Image
+
+from embedding_cache import EmbeddingCache, image_content_key, text_content_key
+
+DIM = 512
+VECTOR_BYTES = DIM * 2
+
+
+def _vector(seed: int) -> np.ndarray:
+    return np.random.default_rng(seed).standard_normal(DIM).astype(np.float32)
+
+
+def test_byte_cap_and_lru_order():
+    """Au-delà de la borne, l'entrée la moins récemment utilisée est évincée (une lecture la rafraîchit)"""
+    cache = EmbeddingCache(max_bytes=3 * VECTOR_BYTES)
+    for key in ('a', 'b', 'c'):
+        cache.put(key, _vector(ord(key)))
+    assert cache.current_bytes == 3 * VECTOR_BYTES
+    assert cache.get('a') is not None
+    cache.put('d', _vector(4))
+    assert cache.get('b') is None
+    assert [key for key in ('a', 'c', 'd') if cache.get(key) is not None] == ['a', 'c', 'd']
+    assert cache.current_bytes <= cache.max_bytes and cache.evictions == 1
+
+
+def test_float16_storage_and_replace():
+    """Les vecteurs sont stockés en float16 ; réécrire une clé ne compte pas ses octets deux fois"""
+    cache = EmbeddingCache(max_bytes=10 * VECTOR_BYTES)
+    original = _vector(1)
+    cache.put('a', original)
+    stored = cache.get('a')
+    assert stored.dtype == np.float16 and np.allclose(stored, original, atol=1e-2)
+    cache.put('a', _vector(2))
+    assert len(cache) == 1 and cache.current_bytes == VECTOR_BYTES
+
+
+def test_oversized_vector_is_not_cached():
+    """Un vecteur plus grand que le cache entier n'évince rien"""
+    cache = EmbeddingCache(max_bytes=2 * VECTOR_BYTES)
+    cache.put('a', _vector(1))
+    cache.put('grand', np.zeros(3 * DIM, dtype=np.float32))
+    assert cache.get('grand') is None and cache.get('a') is not None and cache.evictions == 0
+
+
+def test_stats_and_clear():
+    """Succès, échecs et taux de succès ; clear libère les octets"""
+    cache = EmbeddingCache(max_bytes=4 * VECTOR_BYTES, name='images')
+    cache.put('a', _vector(1))
+    cache.get('a')
+    cache.get('absent')
+    stats = cache.stats()
+    assert (stats['name'], stats['hits'], stats['misses'], stats['hit_rate']) == ('images', 1, 1, 0.5)
+    cache.clear()
+    assert len(cache) == 0 and cache.current_bytes == 0
+
+
+def test_content_keys():
+    """Même contenu, même clé ; un pixel, la taille ou un mot qui change donnent une autre clé"""
+    image = Image.new('RGB', (16, 8), (10, 20, 30))
+    assert image_content_key(image) == image_content_key(image.copy())
+    changed = image.copy()
+    changed.putpixel((0, 0), (11, 20, 30))
+    assert image_content_key(changed) != image_content_key(image)
+    assert image_content_key(Image.new('RGB', (8, 16), (10, 20, 30))) != image_content_key(image)
+    assert text_content_key('montre, acier') == text_content_key('montre, acier')
+    assert text_content_key('montre, acier') != text_content_key('montre, cuir')
+
+
+def test_concurrent_puts_respect_cap():
+    """Écritures concurrentes : la borne et le décompte des octets restent exacts"""
+    cache = EmbeddingCache(max_bytes=50 * VECTOR_BYTES)
+
+    def writer(offset):
+        for i in range(200):
+            cache.put(f"{offset}:{i}", _vector(i))
+            cache.get(f"{offset}:{i // 2}")
+
+    threads = [threading.Thread(target=writer, args=(t,)) for t in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(cache) == 50 and cache.current_bytes == 50 * VECTOR_BYTES
+    assert cache.evictions == 8 * 200 - 50
+
+
+def main():
+    """Fonction principale de vérification"""
+    print("🧪 Vérification du cache d'embeddings")
+    print("=" * 60)
+
+    success = True
+    for test in (test_byte_cap_and_lru_order, test_float16_storage_and_replace, test_oversized_vector_is_not_cached,
+                 test_stats_and_clear, test_content_keys, test_concurrent_puts_respect_cap):
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except Exception as e:
+            print(f"❌ {test.__name__}: {type(e).__name__} {str(e)}")
+            success = False
+
+    print("\n" + "=" * 60)
+    print("🎉 Cache conforme" if success else "❌ Cache en échec")
+    return success
+
+
+if __name__ == "__main__":
+    success = main()
+    exit(0 if success else 1)
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Script pour vérifier la sonde de santé de l'endpoint
+Session HTTP factice : transitions d'état, intervalles adaptatifs et repli immédiat du client sur endpoint hors service
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from endpoint_health import DOWN_AFTER_FAILURES, EndpointHealthProber, health_url
+
+ENDPOINT_URL = 'http://endpoint.test/score'
+TIMEOUT_S = 5
+
+
+class FakeResponse:
+    def __init__(self, status_code: int):
+        self.status_code = status_code
+
+
+class FakeSession:
+    """Session minimale : rejoue une suite de codes de statut (None = erreur de connexion)"""
+
+    def __init__(self, statuses):
+        self.statuses = list(statuses)
+        self.urls = []
+
+    def get(self, url, timeout=None):
+        self.urls.append(url)
+        status = self.statuses.pop(0) if len(self.statuses) > 1 else self.statuses[0]
+        if status is None:
+            raise ConnectionError('connexion refusée')
+        return FakeResponse(status)
+
+
+def _prober(statuses, **kwargs) -> EndpointHealthProber:
+    return EndpointHealthProber(ENDPOINT_URL, min_interval_s=1, max_interval_s=16, session=FakeSession(statuses), **kwargs)
+
+
+def test_state_transitions():
+    """healthy → degraded après un échec isolé → down après les échecs consécutifs → rétabli"""
+    prober = _prober([200, None] + [None] * (DOWN_AFTER_FAILURES - 1) + [200])
+    assert prober.state == 'unknown' and not prober.is_down()
+    assert prober.probe() and prober.state == 'healthy'
+    assert not prober.probe() and prober.state == 'degraded' and not prober.is_down()
+    for _ in range(DOWN_AFTER_FAILURES - 1):
+        prober.probe()
+    assert prober.is_down() and prober.last_error == 'connexion refusée'
+    assert prober.probe() and prober.consecutive_failures == 0 and not prober.is_down()
+    assert prober._session.urls[0] == health_url(ENDPOINT_URL) == 'http://endpoint.test/health'
+
+
+def test_non_200_counts_as_failure():
+    """Un 503 est un échec de sonde (code conservé pour l'affichage)"""
+    prober = _prober([503])
+    for _ in range(DOWN_AFTER_FAILURES):
+        assert not prober.probe()
+    assert prober.is_down() and prober.last_status_code == 503 and prober.last_error is None
+
+
+def test_adaptive_interval():
+    """État stable : intervalle doublé jusqu'au maximum ; panne persistante : recul plafonné à la moitié"""
+    prober = _prober([200])
+    intervals = []
+    for _ in range(6):
+        prober.probe()
+        intervals.append(prober.interval_s)
+    assert intervals == [1, 2, 4, 8, 16, 16]
+
+    prober._session.statuses = [None]
+    intervals = []
+    for _ in range(6):
+        prober.probe()
+        intervals.append(prober.interval_s)
+    assert intervals[:DOWN_AFTER_FAILURES] == [1] * DOWN_AFTER_FAILURES
+    assert intervals[-1] == 8 and intervals == sorted(intervals)
+
+
+def test_snapshot():
+    """Disponibilité et latences de la fenêtre, sans appel réseau"""
+    prober = _prober([200, 200, None, 200])
+    for _ in range(4):
+        prober.probe()
+    calls = len(prober._session.urls)
+    snapshot = prober.snapshot()
+    assert len(prober._session.urls) == calls
+    assert snapshot['probes'] == 4 and snapshot['availability'] == 0.75
+    assert snapshot['state'] == 'degraded' and snapshot['latency_ms_p50'] is not None
+
+
+def test_report_failure_wakes_thread():
+    """Un échec réel de /score déclenche une sonde sans attendre l'intervalle"""
+    prober = EndpointHealthProber(ENDPOINT_URL, min_interval_s=60, max_interval_s=60, session=FakeSession([200])).start()
+    try:
+        deadline = time.time() + TIMEOUT_S
+        while len(prober._session.urls) < 1 and time.time() < deadline:
+            time.sleep(0.01)
+        prober.report_failure()
+        while len(prober._session.urls) < 2 and time.time() < deadline:
+            time.sleep(0.01)
+        assert len(prober._session.urls) == 2
+    finally:
+        prober.stop()
+
+
+def test_client_skips_known_down_endpoint():
+    """Endpoint hors service selon la sonde : le client ne poste pas /score et ne réveille pas la sonde"""
+    from azure_client import AzureMLClient
+
+    client = AzureMLClient(show_warning=False)
+    client.backend = 'azure'
+    client.endpoint_url = ENDPOINT_URL
+    client.health = _prober([None])
+    for _ in range(DOWN_AFTER_FAILURES):
+        client.health.probe()
+    posted, reported = [], []
+
+    def post_score(*args, **kwargs):
+        posted.append(args)
+        raise AssertionError('appel à /score')
+
+    client._post_score = post_score
+    client._predict_knn = lambda *args: None
+    client.health.report_failure = lambda: reported.append(True)
+    result = client._predict_azure(None, 'marque', 'produit', 'description', '')
+    assert not result['success'] and 'sonde de santé' in result['error']
+    assert posted == [] and reported == []
+
+
+def main():
+    """Fonction principale de vérification"""
+    print("🧪 Vérification de la sonde de santé de l'endpoint")
+    print("=" * 60)
+
+    success = True
+    for test in (test_state_transitions, test_non_200_counts_as_failure, test_adaptive_interval, test_snapshot,
+                 test_report_failure_wakes_thread, test_client_skips_known_down_endpoint):
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except Exception as e:
+            print(f"❌ {test.__name__}: {type(e).__name__} {str(e)}")
+            success = False
+
+    print("\n" + "=" * 60)
+    print("🎉 Sonde conforme" if success else "❌ Sonde en échec")
+    return success
+
+
+if __name__ == "__main__":
+    success = main()
+    exit(0 if success else 1)
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Script pour vérifier le coût d'import des modules et des pages de l'application
+Mesure basée sur `python -X importtime` ; échoue si un budget est dépassé
+"""
+
+import os
+import ast
+import sys
+import subprocess
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Socle déjà importé par le serveur Streamlit avant toute page (environ 900 ms à lui seul, très variable)
+FRAMEWORK_IMPORTS = 'import streamlit, pandas'
+
+# Cibles mesurées au-dessus du socle : seul leur propre coût d'import est budgété
+FRAMEWORK_TARGETS = ('pages/', 'keyword_engine.py')
+
+# Budgets d'import en millisecondes (temps cumulé des imports de premier niveau, hors socle pour FRAMEWORK_TARGETS)
+# Calibrés sur les mesures avec une marge d'environ 3x ; multipliables via IMPORT_BUDGET_FACTOR (ex. CI partagée)
+IMPORT_BUDGETS_MS = {
+    'azure_client.py': 50,
+    'local_clip_engine.py': 50,
+    'batch_scheduler.py': 50,
+    'embedding_cache.py': 50,
+    'keyword_engine.py': 50,
+    'pages/1_eda.py': 150,
+    'pages/2_prediction.py': 150,
+    'pages/3_configuration.py': 100,
+}
+
+# Nombre de mesures par cible (on garde la plus rapide pour limiter le bruit)
+RUNS = 3
+
+
+def top_level_imports(path: str) -> str:
+    """
+    Extraire les instructions d'import de premier niveau d'un fichier (y compris dans les try)
+
+    Args:
+        path (str): Chemin du fichier Python
+
+    Returns:
+        str: Code source des seuls imports
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        source = f.read()
+    tree = ast.parse(source)
+
+    statements = []
+    for node in tree.body:
+        nodes = [node]
+        if isinstance(node, ast.Try):
+            nodes = node.body
+        for child in nodes:
+            if isinstance(child, ast.ImportFrom) and child.module == '__future__':
+                continue
+            if isinstance(child, (ast.Import, ast.ImportFrom)):
+                statements.append(ast.get_source_segment(source, child))
+    return "\n".join(statements)
+
+
+def _parse_importtime(stderr: str) -> dict:
+    """Temps cumulé (µs) de chaque import de premier niveau"""
+    timings = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line.split('|', 2)
+        # Les imports imbriqués sont indentés de deux espaces supplémentaires
+        if name.startswith('  ') or not cumulative.strip().isdigit():
+            continue
+        timings[name.strip()] = int(cumulative.strip())
+    return timings
+
+
+def _importtime(code: str) -> dict:
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=ROOT, capture_output=True, text=True, timeout=300
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'échec')
+    return _parse_importtime(result.stderr)
+
+
+def measure_import_ms(target: str) -> float:
+    """
+    Mesurer le coût d'import d'un module ou d'une page (hors démarrage de l'interpréteur)
+
+    Un module est importé tel quel ; une page Streamlit (qui s'exécute à l'import)
+    est mesurée à partir de ses seules instructions d'import. Pour FRAMEWORK_TARGETS, le socle
+    (streamlit, pandas) est importé d'abord dans le même interpréteur et son coût n'est pas compté
+
+    Args:
+        target (str): Fichier relatif à la racine (module ou page Streamlit)
+
+    Returns:
+        float: Temps cumulé des imports en millisecondes (meilleure de RUNS mesures)
+    """
+    code = f"import sys; sys.path.insert(0, {ROOT!r})\n"
+    excluded = set(_importtime('pass'))
+    if target.startswith(FRAMEWORK_TARGETS):
+        code += FRAMEWORK_IMPORTS + "\n"
+        excluded |= set(_importtime(FRAMEWORK_IMPORTS))
+    if target.startswith('pages/'):
+        code += top_level_imports(os.path.join(ROOT, target))
+    else:
+        code += f"import {os.path.splitext(target)[0].replace('/', '.')}"
+    best = None
+    for _ in range(RUNS):
+        timings = _importtime(code)
+        total = sum(us for name, us in timings.items() if name not in excluded)
+        best = total if best is None else min(best, total)
+    return best / 1000
+
+
+def check_import_budgets() -> list:
+    """
+    Comparer le coût d'import de chaque cible à son budget
+
+    Returns:
+        list: Tuples (cible, mesure en ms, budget en ms, OK)
+    """
+    factor = float(os.getenv('IMPORT_BUDGET_FACTOR', '1.0'))
+    results = []
+    for target, budget in IMPORT_BUDGETS_MS.items():
+        budget_ms = budget * factor
+        try:
+            measured = measure_import_ms(target)
+            results.append((target, measured, budget_ms, measured <= budget_ms))
+            status = "✅" if measured <= budget_ms else "❌"
+            print(f"{status} {target}: {measured:.0f} ms (budget {budget_ms:.0f} ms)")
+        except Exception as e:
+            results.append((target, None, budget_ms, False))
+            print(f"❌ {target}: import impossible - {str(e)}")
+    return results
+
+
+def test_import_budgets():
+    """Point d'entrée pytest : aucun budget ne doit être dépassé"""
+    failures = [r for r in check_import_budgets() if not r[3]]
+    assert not failures, f"Budgets d'import dépassés: {failures}"
+
+
+def main():
+    """Fonction principale de vérification"""
+    print("⏱️ Vérification des budgets d'import (python -X importtime)")
+    print("=" * 60)
+
+    results = check_import_budgets()
+    failures = [r for r in results if not r[3]]
+
+    print("\n" + "=" * 60)
+    if failures:
+        print(f"❌ {len(failures)} budget(s) d'import dépassé(s)")
+        return False
+    print("🎉 Tous les budgets d'import sont respectés")
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    exit(0 if success else 1)
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Script pour vérifier le comptage incrémental des mots-clés
+Après ajouts, modifications et suppressions, les fréquences doivent être celles d'un recomptage complet
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pandas as pd
+
+from keyword_engine import KeywordFrequencyEngine
+
+CSV_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'produits_original.csv')
+N_PRODUCTS = 60
+
+
+def _catalog() -> pd.DataFrame:
+    return pd.read_csv(CSV_PATH, nrows=N_PRODUCTS)
+
+
+def _recount(df: pd.DataFrame) -> pd.DataFrame:
+    engine = KeywordFrequencyEngine()
+    engine.add_products(df, max_workers=1)
+    return engine.to_dataframe()
+
+
+def test_incremental_add_matches_recount():
+    """Ajouter le catalogue en deux fois donne les fréquences d'un comptage en une fois"""
+    df = _catalog()
+    engine = KeywordFrequencyEngine()
+    assert engine.add_products(df.iloc[:25], max_workers=1) == 25
+    assert engine.add_products(df, max_workers=1) == len(df) - 25
+    assert engine.add_products(df, max_workers=1) == 0
+    pd.testing.assert_frame_equal(engine.to_dataframe(), _recount(df))
+
+
+def test_remove_and_modify_match_recount():
+    """Retirer et modifier des produits ajuste les fréquences sans recompter tout le catalogue"""
+    df = _catalog()
+    engine = KeywordFrequencyEngine()
+    engine.add_products(df, max_workers=1)
+    version = engine.data_version
+
+    removed_ids = df['uniq_id'].iloc[:10].tolist()
+    assert engine.remove_products(removed_ids + ['inconnu']) == 10
+    remaining = df.iloc[10:].copy()
+    pd.testing.assert_frame_equal(engine.to_dataframe(), _recount(remaining))
+
+    remaining.loc[remaining.index[0], 'description'] = 'zyxwvu zyxwvu zyxwvu'
+    assert engine.add_products(remaining, max_workers=1) == 1
+    pd.testing.assert_frame_equal(engine.to_dataframe(), _recount(remaining))
+    assert engine.data_version != version
+
+
+def test_sync_follows_catalog():
+    """sync retire les produits disparus et compte les nouveaux"""
+    df = _catalog()
+    engine = KeywordFrequencyEngine()
+    engine.add_products(df.iloc[:40], max_workers=1)
+    assert engine.sync(df.iloc[20:], max_workers=1) == {'removed': 20, 'updated': len(df) - 40}
+    assert len(engine) == len(df) - 20
+    pd.testing.assert_frame_equal(engine.to_dataframe(), _recount(df.iloc[20:]))
+
+
+def test_save_load_round_trip():
+    """L'état compacté et rechargé garde les fréquences, la version et reste incrémental"""
+    df = _catalog()
+    engine = KeywordFrequencyEngine()
+    engine.add_products(df, max_workers=1)
+    engine.remove_products(df['uniq_id'].iloc[:5])
+    engine.synced_catalog_version = 'v1'
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'keyword_counts.json.gz')
+        engine.save(path)
+        restored = KeywordFrequencyEngine.load(path)
+    pd.testing.assert_frame_equal(restored.to_dataframe(), engine.to_dataframe())
+    assert restored.data_version == engine.data_version
+    assert restored.synced_catalog_version == 'v1'
+    assert restored.add_products(df, max_workers=1) == 5
+    pd.testing.assert_frame_equal(restored.to_dataframe(), _recount(df))
+
+
+def main():
+    """Fonction principale de vérification"""
+    print("🧪 Vérification du comptage incrémental des mots-clés")
+    print("=" * 60)
+
+    success = True
+    for test in (test_incremental_add_matches_recount, test_remove_and_modify_match_recount,
+                 test_sync_follows_catalog, test_save_load_round_trip):
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except Exception as e:
+            print(f"❌ {test.__name__}: {type(e).__name__} {str(e)}")
+            success = False
+
+    print("\n" + "=" * 60)
+    print("🎉 Comptage conforme" if success else "❌ Comptage en échec")
+    return success
+
+
+if __name__ == "__main__":
+    success = main()
+    exit(0 if success else 1)
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Script pour vérifier l'encodage des échanges avec l'endpoint /score
+Aller-retour du format binaire compact, décodage selon le Content-Type et négociation de la compression
+"""
+
+import os
+import sys
+import json
+import gzip
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from payload_codec import (COMPACT_CONTENT_TYPE, PayloadNegotiator, decode_compact_results,
+                           encode_compact_results)
+
+CATEGORIES = ['Baby Care', 'Beauty and Personal Care', 'Computers', 'Home Decor & Festive Needs',
+              'Home Furnishing', 'Kitchen & Dining', 'Watches']
+
+
+class FakeResponse:
+    """Réponse HTTP minimale (en-têtes, statut et corps)"""
+
+    def __init__(self, content: bytes, content_type: str = 'application/json', status_code: int = 200, headers=None):
+        self.content = content
+        self.status_code = status_code
+        self.headers = {'Content-Type': content_type, **(headers or {})}
+
+
+def _result(category: str, with_scores: bool = True) -> dict:
+    result = {'predicted_category': category, 'confidence': 0.75}
+    if with_scores:
+        result['category_scores'] = {name: (0.75 if name == category else 0.25 / 6) for name in CATEGORIES}
+    return result
+
+
+def test_compact_round_trip():
+    """Catégories, confiances et scores survivent à l'aller-retour (précision float32)"""
+    for with_scores in (True, False):
+        results = [_result('Watches', with_scores), _result('Computers', with_scores)]
+        decoded = decode_compact_results(encode_compact_results(results, CATEGORIES, 'azure_ml_pytorch_real'))
+        assert decoded['source'] == 'azure_ml_pytorch_real'
+        assert [r['predicted_category'] for r in decoded['results']] == ['Watches', 'Computers']
+        assert all(abs(r['confidence'] - 0.75) < 1e-6 for r in decoded['results'])
+        assert ('category_scores' in decoded['results'][0]) == with_scores
+        if with_scores:
+            assert abs(decoded['results'][0]['category_scores']['Watches'] - 0.75) < 1e-6
+
+
+def test_compact_smaller_than_json():
+    """Le format compact d'un résultat avec scores est plus petit que le JSON équivalent"""
+    result = {**_result('Watches'), 'source': 'azure_ml_pytorch_real'}
+    compact = encode_compact_results([result], CATEGORIES, result['source'])
+    assert len(compact) < len(json.dumps(result).encode('utf-8'))
+
+
+def test_decode_single_product():
+    """decode rend la forme JSON historique, quel que soit le Content-Type"""
+    negotiator = PayloadNegotiator()
+    expected = {'predicted_category': 'Watches', 'source': 'azure_ml_pytorch_real'}
+    body = encode_compact_results([_result('Watches')], CATEGORIES, 'azure_ml_pytorch_real')
+    for response in (FakeResponse(json.dumps({**_result('Watches'), 'source': 'azure_ml_pytorch_real'}).encode()),
+                     FakeResponse(body, f'{COMPACT_CONTENT_TYPE}; charset=binary')):
+        decoded = negotiator.decode(response)
+        assert {key: decoded[key] for key in expected} == expected
+
+
+def test_decode_rejects_multiple_results():
+    """Une réponse compacte de plusieurs produits à une requête d'un produit est une erreur"""
+    body = encode_compact_results([_result('Watches'), _result('Computers')], CATEGORIES, 'azure_ml_pytorch_real')
+    try:
+        PayloadNegotiator().decode(FakeResponse(body, COMPACT_CONTENT_TYPE))
+    except ValueError:
+        return
+    raise AssertionError("réponse de 2 résultats acceptée")
+
+
+def test_compression_negotiation():
+    """auto : compression dès que le serveur annonce gzip ; gzip forcé : abandon après un 415"""
+    negotiator = PayloadNegotiator(mode='auto', min_bytes=100)
+    assert not negotiator.should_compress(10_000)
+    negotiator.observe_response(FakeResponse(b'{}', headers={'Accept-Encoding': 'gzip, br'}), compressed=False)
+    assert negotiator.should_compress(10_000) and not negotiator.should_compress(50)
+    body = b'{"image": "' + b'A' * 5000 + b'"}'
+    assert gzip.decompress(negotiator.compress(body)) == body
+    assert negotiator.headers(compressed=True)['Content-Encoding'] == 'gzip'
+
+    forced = PayloadNegotiator(mode='gzip', min_bytes=100)
+    assert forced.should_compress(10_000)
+    forced.observe_response(FakeResponse(b'', status_code=415), compressed=True)
+    assert not forced.should_compress(10_000)
+    assert not PayloadNegotiator(mode='off', min_bytes=0).should_compress(10_000)
+
+
+def main():
+    """Fonction principale de vérification"""
+    print("🧪 Vérification de l'encodage des échanges avec /score")
+    print("=" * 60)
+
+    success = True
+    for test in (test_compact_round_trip, test_compact_smaller_than_json, test_decode_single_product,
+                 test_decode_rejects_multiple_results, test_compression_negotiation):
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except Exception as e:
+            print(f"❌ {test.__name__}: {type(e).__name__} {str(e)}")
+            success = False
+
+    print("\n" + "=" * 60)
+    print("🎉 Encodage conforme" if success else "❌ Encodage en échec")
+    return success
+
+
+if __name__ == "__main__":
+    success = main()
+    exit(0 if success else 1)
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Benchmarks des chemins chauds du prétraitement (texte, mots-clés, image)
+Mesure sur de vraies lignes de produits_original.csv et de vraies images de Images/,
+comparaison à des références enregistrées ; échoue si un chemin ralentit au-delà du seuil
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import subprocess
+from statistics import median
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(ROOT, 'benchmark_baselines.json')
+RESULTS_DIR = os.path.join(ROOT, 'cache', 'benchmarks')
+
+# Échantillon mesuré (lignes du CSV et images, dans l'ordre du fichier)
+N_ROWS = 200
+N_IMAGES = 50
+
+# Nombre de passes par benchmark (on garde la plus rapide pour limiter le bruit)
+REPEATS = 7
+
+# Ralentissement toléré par rapport à la référence, multipliable pour les machines partagées
+REGRESSION_THRESHOLD = float(os.getenv('BENCHMARK_REGRESSION_THRESHOLD', '1.3'))
+
+
+def load_samples(n_rows: int = N_ROWS, n_images: int = N_IMAGES) -> dict:
+    """
+    Charger l'échantillon de benchmark (hors chronométrage)
+
+    Args:
+        n_rows (int): Nombre de lignes du CSV
+        n_images (int): Nombre d'images chargées en mémoire
+
+    Returns:
+        dict: Champs texte des produits et images PIL décodées
+    """
+    import pandas as pd
+    from PIL import Image
+
+    df = pd.read_csv(os.path.join(ROOT, 'produits_original.csv'), nrows=n_rows).fillna('')
+    rows = [
+        (str(r['brand']), str(r['product_name']), str(r['description']), str(r['product_specifications']))
+        for _, r in df.iterrows()
+    ]
+    images = []
+    for name in df['image']:
+        path = os.path.join(ROOT, 'Images', str(name))
+        if len(images) < n_images and os.path.exists(path):
+            with Image.open(path) as image:
+                image.load()
+                images.append(image.copy())
+    return {'rows': rows, 'images': images}
+
+
+def build_benchmarks(client, samples: dict) -> dict:
+    """
+    Associer à chaque chemin chaud une fonction qui traite tout l'échantillon
+
+    Args:
+        client (AzureMLClient): Client fournissant les fonctions du notebook
+        samples (dict): Échantillon issu de load_samples
+
+    Returns:
+        dict: Nom du benchmark -> (fonction sans argument, nombre d'appels par passe)
+    """
+    rows = samples['rows']
+    images = samples['images']
+    specs = [specifications for _, _, _, specifications in rows]
+    combined = [f"{name.lower()}. {brand.lower()}. {description.lower()}" for brand, name, description, _ in rows]
+    cleaned = [client._clean_text_like_notebook(text) for text in combined]
+
+    return {
+        'clean_text': (lambda: [client._clean_text_like_notebook(t) for t in combined], len(combined)),
+        'extract_keywords': (lambda: [client._extract_keywords_like_notebook(t) for t in cleaned], len(cleaned)),
+        'process_specs': (lambda: [client._process_specs_like_notebook(s) for s in specs], len(specs)),
+        'preprocess_text': (lambda: [client._preprocess_text_like_notebook(*r) for r in rows], len(rows)),
+        'predict_local_keywords': (lambda: [client._predict_local_keywords(*r) for r in rows], len(rows)),
+        'preprocess_image': (lambda: [client._preprocess_image_like_notebook(i) for i in images], len(images)),
+    }
+
+
+def _calibration_workload():
+    """Charge de référence fixe (boucle Python, regex, tri) mesurant la vitesse de la machine"""
+    import re
+
+    text = "Elegance Polyester Multicolor Abstract Eyelet Door Curtain 213 cm " * 20
+    for _ in range(200):
+        words = sorted(re.sub(r'[^\w\s]', '', text.lower()).split())
+        sum(len(word) for word in words)
+
+
+def run_benchmarks(repeats: int = REPEATS) -> dict:
+    """
+    Exécuter tous les benchmarks
+
+    Les passes sont entrelacées (une passe de chaque benchmark à tour de rôle, calibration comprise)
+    pour que chacun profite des mêmes périodes calmes de la machine
+
+    Args:
+        repeats (int): Nombre de passes par benchmark
+
+    Returns:
+        dict: Nom -> temps par appel en µs (min, médiane) et nombre d'appels
+    """
+    sys.path.insert(0, ROOT)
+    from azure_client import AzureMLClient
+
+    client = AzureMLClient(show_warning=False)
+    benchmarks = build_benchmarks(client, load_samples())
+    benchmarks['_calibration'] = (_calibration_workload, 1)
+    timings = {name: [] for name in benchmarks}
+    for run, _ in benchmarks.values():
+        run()  # Passe de chauffe (caches des regex, imports paresseux)
+    for _ in range(repeats):
+        for name, (run, calls) in benchmarks.items():
+            start = time.perf_counter()
+            run()
+            timings[name].append((time.perf_counter() - start) / calls * 1e6)
+    return {
+        name: {'us_per_call_min': min(values), 'us_per_call_median': median(values), 'calls': benchmarks[name][1]}
+        for name, values in timings.items()
+    }
+
+
+def _commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True).stdout.strip() or 'unknown'
+    except Exception:
+        return 'unknown'
+
+
+def load_baselines() -> dict:
+    """Références enregistrées (vide si aucune)"""
+    if not os.path.exists(BASELINE_PATH):
+        return {}
+    with open(BASELINE_PATH, 'r', encoding='utf-8') as f:
+        return json.load(f).get('benchmarks', {})
+
+
+def save_results(results: dict, path: str):
+    """Enregistrer des mesures avec le commit et la machine"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'commit': _commit(),
+            'machine': f"{platform.machine()} {platform.processor() or ''}".strip(),
+            'python': platform.python_version(),
+            'benchmarks': results
+        }, f, indent=2)
+
+
+def compare(results: dict, baselines: dict, threshold: float = REGRESSION_THRESHOLD) -> list:
+    """
+    Comparer les mesures aux références
+
+    Args:
+        results (dict): Mesures courantes
+        baselines (dict): Références
+        threshold (float): Ratio maximal mesure / référence
+
+    Returns:
+        list: Tuples (benchmark, mesure µs, référence µs ou None, OK)
+    """
+    # Ratios corrigés de la vitesse relative de la machine (charge de calibration)
+    speed = 1.0
+    if '_calibration' in results and '_calibration' in baselines:
+        speed = results['_calibration']['us_per_call_min'] / baselines['_calibration']['us_per_call_min']
+        print(f"🧮 Vitesse relative de la machine: x{speed:.2f} (calibration)")
+
+    rows = []
+    for name, measured in results.items():
+        if name.startswith('_'):
+            continue
+        reference = baselines.get(name, {}).get('us_per_call_min')
+        value = measured['us_per_call_min']
+        ok = reference is None or value / speed <= reference * threshold
+        rows.append((name, value, reference, ok))
+        if reference is None:
+            print(f"🆕 {name}: {value:.1f} µs/appel (pas de référence)")
+        else:
+            status = "✅" if ok else "❌"
+            print(f"{status} {name}: {value:.1f} µs/appel "
+                  f"(référence {reference:.1f}, x{value / speed / reference:.2f} corrigé)")
+    return rows
+
+
+def test_preprocessing_benchmarks():
+    """Point d'entrée pytest : aucun chemin chaud ne doit régresser au-delà du seuil"""
+    failures = [r for r in compare(run_benchmarks(), load_baselines()) if not r[3]]
+    assert not failures, f"Régressions de performance: {failures}"
+
+
+def main():
+    """Fonction principale des benchmarks"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmarks du prétraitement")
+    parser.add_argument('--save-baseline', action='store_true', help="Remplacer les références par ces mesures")
+    parser.add_argument('--repeats', type=int, default=REPEATS, help="Passes par benchmark")
+    args = parser.parse_args()
+
+    print(f"⏱️ Benchmarks du prétraitement ({N_ROWS} produits, {N_IMAGES} images, seuil x{REGRESSION_THRESHOLD})")
+    print("=" * 60)
+    results = run_benchmarks(args.repeats)
+    save_results(results, os.path.join(RESULTS_DIR, f"preprocessing_{_commit()}.json"))
+
+    if args.save_baseline:
+        save_results(results, BASELINE_PATH)
+        for name, measured in results.items():
+            if name.startswith('_'):
+                continue
+            print(f"📌 {name}: {measured['us_per_call_min']:.1f} µs/appel")
+        print(f"💾 Références enregistrées: {BASELINE_PATH}")
+        return True
+
+    failures = [r for r in compare(results, load_baselines()) if not r[3]]
+    print("\n" + "=" * 60)
+    if failures:
+        print(f"❌ {len(failures)} régression(s) au-delà de x{REGRESSION_THRESHOLD}")
+        return False
+    print("🎉 Aucune régression de performance")
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    exit(0 if success else 1)
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Script pour vérifier l'enregistrement anonymisé du trafic et son rejeu
+Client réel contre le serveur /score de substitution : empreintes salées, latences et planning du rejeu
+"""
+
+import os
+import sys
+import json
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from PIL import Image
+
+from trace_logging import configure_trace_log
+
+configure_trace_log('')
+
+from azure_client import AzureMLClient
+from load_harness import start_stub_server
+from replay_traffic import build_requests
+from traffic_recorder import TrafficRecorder, load_traffic
+
+CSV_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'produits_original.csv')
+SECRET_TEXT = 'Montre Zyxwvu en acier brossé'
+PRODUCTS = [
+    (Image.new('RGB', (300, 200), (200, 30, 30)), 'Zyxwvu', SECRET_TEXT, 'description secrète', ''),
+    (Image.new('RGB', (300, 200), (200, 30, 30)), 'Zyxwvu', SECRET_TEXT, 'description secrète', ''),
+    (Image.new('RGB', (120, 160), (10, 90, 200)), 'Autre', 'Tapis de bain', 'coton', '{"Couleur": "bleu"}')
+]
+
+
+def _record(salt: str):
+    """Classer les produits via le serveur de substitution et relire l'enregistrement"""
+    process, url = start_stub_server(latency_ms=5, jitter_ms=0)
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'traffic.jsonl')
+            client = AzureMLClient(show_warning=False)
+            client.backend = 'azure'
+            client.endpoint_url = url
+            client.recorder = TrafficRecorder(path, salt=salt)
+            for product in PRODUCTS:
+                assert client.predict_category(*product)['success']
+            client.recorder.close()
+            with open(path, encoding='utf-8') as f:
+                raw = f.read()
+            return load_traffic(path), raw
+    finally:
+        process.kill()
+        process.wait()
+
+
+def test_recording_is_anonymous_and_complete():
+    """Une ligne par requête, sans contenu en clair ; latence enregistrée = étape 'total' de la trace"""
+    entries, raw = _record('sel-fixe')
+    assert len(entries) == 3 and json.loads(raw.splitlines()[0])['header']['v'] == 1
+    for secret in ('Zyxwvu', 'acier', 'secrète', 'Tapis'):
+        assert secret not in raw
+    assert [entry['tl'] for entry in entries] == [[len(text) for text in product[1:]] for product in PRODUCTS]
+    assert [entry['img'] for entry in entries] == [[300, 200], [300, 200], [120, 160]]
+    for entry in entries:
+        assert entry['ok'] and entry['http'] == 200 and entry['pb'] > 0
+        assert entry['lat'] == entry['st']['total']
+    assert entries[0]['dt'] is None and entries[1]['dt'] >= 0
+    assert [entry['t'] for entry in entries] == sorted(entry['t'] for entry in entries)
+
+
+def test_salted_hashes():
+    """Répétitions reconnaissables ; même sel, mêmes empreintes d'un enregistrement à l'autre ; autre sel, autres empreintes"""
+    first, _ = _record('sel-fixe')
+    again, _ = _record('sel-fixe')
+    other, _ = _record('autre-sel')
+    assert first[0]['ih'] == first[1]['ih'] != first[2]['ih']
+    assert first[0]['th'] == first[1]['th'] != first[2]['th']
+    assert [(e['ih'], e['th']) for e in first] == [(e['ih'], e['th']) for e in again]
+    assert all(a['ih'] != b['ih'] and a['th'] != b['th'] for a, b in zip(first, other))
+
+
+def test_replay_schedule():
+    """Le rejeu reproduit écarts, dimensions, longueurs et répétitions de l'enregistrement"""
+    entries = [
+        {'t': 100.0, 'img': [300, 200], 'ih': 'aa01', 'tl': [6, 29, 19, 0], 'th': 'bb01'},
+        {'t': 100.5, 'img': [300, 200], 'ih': 'aa01', 'tl': [6, 29, 19, 0], 'th': 'bb01'},
+        {'t': 160.5, 'img': [120, 160], 'ih': 'aa02', 'tl': [5, 13, 5, 19], 'th': 'bb02'}
+    ]
+    requests = build_requests(entries, speed=2.0, max_gap_s=10.0, csv_path=CSV_PATH)
+    assert [request['at'] for request in requests] == [0.0, 0.25, 5.25]
+    assert requests[0]['inputs'][0] is requests[1]['inputs'][0]
+    assert requests[0]['inputs'][1:] == requests[1]['inputs'][1:]
+    for request, entry in zip(requests, entries):
+        image, texts = request['inputs'][0], request['inputs'][1:]
+        assert list(image.size) == entry['img']
+        assert [len(text) for text in texts] == entry['tl']
+        assert request['entry'] is entry
+
+
+def main():
+    """Fonction principale de vérification"""
+    print("🧪 Vérification de l'enregistrement et du rejeu du trafic")
+    print("=" * 60)
+
+    success = True
+    for test in (test_recording_is_anonymous_and_complete, test_salted_hashes, test_replay_schedule):
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except Exception as e:
+            print(f"❌ {test.__name__}: {type(e).__name__} {str(e)}")
+            success = False
+
+    print("\n" + "=" * 60)
+    print("🎉 Enregistrement conforme" if success else "❌ Enregistrement en échec")
+    return success
+
+
+if __name__ == "__main__":
+    success = main()
+    exit(0 if success else 1)
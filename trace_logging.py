@@ -0,0 +1,282 @@
+"""
+Journal structuré des prédictions (une ligne JSON par requête)
+Identifiant de requête propagé à l'endpoint, empreinte du contenu, durées des étapes, tailles et statut HTTP ;
+écriture asynchrone (QueueHandler) et échantillonnage du volume
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, Any, Optional
+
+# logging, hashlib et datetime ne sont importés qu'à la première trace écrite (import du client plus rapide)
+
+# Part des prédictions réussies journalisées ; les erreurs, replis et requêtes lentes le sont toujours
+SAMPLE_RATE = float(os.getenv('TRACE_LOG_SAMPLE_RATE', '0.1'))
+SLOW_MS = float(os.getenv('TRACE_LOG_SLOW_MS', '2000'))
+
+# Destination : fichier JSONL (cache/traces.jsonl par défaut), 'stderr', ou 'off' pour ne rien journaliser
+# (jamais la sortie d'erreur par défaut : elle se mêlerait à la progression des outils en ligne de commande)
+LOG_FILE = os.getenv('TRACE_LOG_FILE', os.path.join('cache', 'traces.jsonl'))
+DISABLED_VALUES = ('', 'off', 'none', '0')
+
+# En-têtes de corrélation envoyés à l'endpoint /score
+REQUEST_ID_HEADERS = ('X-Request-ID', 'x-ms-client-request-id')
+
+LOGGER_NAME = 'clip_client.trace'
+
+_current_trace = contextvars.ContextVar('clip_prediction_trace', default=None)
+
+
+class PredictionTrace:
+    """
+    Contexte d'une prédiction : identifiant, durées des étapes et champs ajoutés le long du chemin
+    """
+
+    def __init__(self, request_id: str, sampled: bool, shadow: bool = False):
+        """
+        Args:
+            request_id (str): Identifiant de la requête
+            sampled (bool): Journaliser la requête même si elle réussit rapidement
+            shadow (bool): Appel fantôme de la cascade (hors métriques du client)
+        """
+        self.request_id = request_id
+        self.sampled = sampled
+        self.shadow = shadow
+        self.started = time.perf_counter()
+        self.stages_ms: Dict[str, float] = {}
+        self.fields: Dict[str, Any] = {}
+        # Image prétraitée (128 px max) déposée par le prétraitement, et fonction de prétraitement
+        # utilisée à défaut : l'empreinte ne parcourt jamais les pixels de l'image d'origine
+        self.processed_image = None
+        self.preprocess_image = None
+        self._digests: Optional[Dict[str, str]] = None
+        self._lock = threading.Lock()
+
+    def add_stage(self, stage: str, seconds: float):
+        """Cumuler la durée d'une étape (une étape peut être traversée plusieurs fois)"""
+        with self._lock:
+            self.stages_ms[stage] = self.stages_ms.get(stage, 0.0) + seconds * 1000
+
+    def set(self, **fields):
+        """Ajouter des champs au futur enregistrement (taille du corps, statut HTTP...)"""
+        with self._lock:
+            self.fields.update(fields)
+
+    def content_digests(self, image, texts=()) -> Dict[str, str]:
+        """
+        Empreintes du contenu de la requête, calculées une seule fois (journal des traces et enregistreur de trafic)
+
+        Args:
+            image (Image.Image): Image soumise (remplacée par sa version prétraitée)
+            texts (tuple): Champs texte soumis
+
+        Returns:
+            Dict[str, str]: Empreintes 'image', 'text' et 'content' (les deux réunies)
+        """
+        with self._lock:
+            if self._digests is not None:
+                return self._digests
+            processed = self.processed_image
+        if processed is None and image is not None and self.preprocess_image is not None:
+            processed = self.preprocess_image(image)
+        digests = {
+            'image': image_digest(processed if processed is not None else image),
+            'text': text_digest(*texts)
+        }
+        digests['content'] = _blake2b(digests['image'].encode('ascii'), digests['text'].encode('ascii'))
+        with self._lock:
+            if self._digests is None:
+                self._digests = digests
+            return self._digests
+
+
+def current_trace() -> Optional[PredictionTrace]:
+    """Trace de la prédiction en cours dans ce contexte (None hors prédiction)"""
+    return _current_trace.get()
+
+
+def request_headers() -> Dict[str, str]:
+    """En-têtes de corrélation de la prédiction en cours (vide hors prédiction)"""
+    trace = current_trace()
+    return {header: trace.request_id for header in REQUEST_ID_HEADERS} if trace else {}
+
+
+def _blake2b(*chunks: bytes) -> str:
+    import hashlib
+
+    digest = hashlib.blake2b(digest_size=8)
+    for chunk in chunks:
+        digest.update(chunk)
+        digest.update(b'\x00')
+    return digest.hexdigest()
+
+
+def image_digest(image) -> str:
+    """Empreinte courte des pixels d'une image (à appeler sur l'image prétraitée, pas sur l'original)"""
+    try:
+        return _blake2b(f"{image.mode}:{image.size}".encode('utf-8'), image.tobytes())
+    except Exception:
+        return _blake2b(b'')
+
+
+def text_digest(*texts: str) -> str:
+    """Empreinte courte des champs texte"""
+    return _blake2b(*((text or '').encode('utf-8') for text in texts))
+
+
+def content_hash(image, *texts: str) -> str:
+    """
+    Empreinte courte du contenu soumis (pixels de l'image et champs texte)
+
+    Args:
+        image (Image.Image): Image du produit (de préférence prétraitée)
+        *texts (str): Champs texte du produit
+
+    Returns:
+        str: Empreinte BLAKE2b de 16 caractères hexadécimaux
+    """
+    return _blake2b(image_digest(image).encode('ascii'), text_digest(*texts).encode('ascii'))
+
+
+_listener = None
+_listener_lock = threading.Lock()
+
+
+def trace_log_enabled() -> bool:
+    """Les traces sont-elles journalisées (TRACE_LOG_FILE ou configure_trace_log)"""
+    return LOG_FILE.lower() not in DISABLED_VALUES
+
+
+def configure_trace_log(path: str):
+    """
+    Choisir la destination des traces (outils en ligne de commande, avant la première prédiction)
+
+    Args:
+        path (str): Fichier JSONL, 'stderr', ou '' / 'off' pour désactiver
+    """
+    global LOG_FILE
+    with _listener_lock:
+        if _listener is not None:
+            print(f"⚠️ Journal des traces déjà ouvert ({LOG_FILE}), destination inchangée")
+            return
+        LOG_FILE = path
+
+
+def get_trace_logger():
+    """
+    Logger des traces, branché au premier appel sur une file et un thread d'écriture
+    (l'appelant ne bloque jamais sur l'écriture du fichier ou du terminal)
+
+    Returns:
+        logging.Logger: Logger des traces
+    """
+    import logging
+
+    global _listener
+    logger = logging.getLogger(LOGGER_NAME)
+    if _listener is None:
+        with _listener_lock:
+            if _listener is None:
+                import atexit
+                import queue
+                from logging.handlers import QueueHandler, QueueListener
+
+                if LOG_FILE.lower() == 'stderr':
+                    handler = logging.StreamHandler(sys.stderr)
+                else:
+                    os.makedirs(os.path.dirname(LOG_FILE) or '.', exist_ok=True)
+                    handler = logging.FileHandler(LOG_FILE, encoding='utf-8')
+                handler.setFormatter(logging.Formatter('%(message)s'))
+                log_queue = queue.SimpleQueue()
+                logger.addHandler(QueueHandler(log_queue))
+                logger.setLevel(logging.INFO)
+                logger.propagate = False
+                _listener = QueueListener(log_queue, handler)
+                _listener.start()
+                atexit.register(_listener.stop)
+    return logger
+
+
+@contextmanager
+def trace_prediction(sample_rate: float = SAMPLE_RATE, shadow: bool = False):
+    """
+    Ouvrir la trace d'une prédiction pour le contexte courant
+
+    Args:
+        sample_rate (float): Part des prédictions réussies journalisées
+        shadow (bool): Appel fantôme (identifiant propre, durées et compteurs exclus des métriques du client)
+
+    Returns:
+        PredictionTrace: Trace à compléter puis à émettre avec emit_trace
+    """
+    trace = PredictionTrace(os.urandom(16).hex(), random.random() < sample_rate, shadow)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+def emit_trace(trace: PredictionTrace, result: Dict[str, Any], image=None, texts=()) -> bool:
+    """
+    Journaliser une prédiction si elle est échantillonnée, en erreur, en repli ou lente
+
+    Args:
+        trace (PredictionTrace): Trace de la prédiction
+        result (Dict[str, Any]): Résultat renvoyé à l'appelant
+        image (Image.Image): Image soumise (empreinte calculée seulement si la trace est écrite, une fois par requête)
+        texts (tuple): Champs texte soumis
+
+    Returns:
+        bool: True si l'enregistrement a été écrit
+    """
+    if not trace_log_enabled():
+        return False
+    duration_ms = (time.perf_counter() - trace.started) * 1000
+    fallback_reason = result.get('fallback_reason')
+    if not result.get('success'):
+        reason = 'error'
+    elif fallback_reason:
+        reason = 'fallback'
+    elif duration_ms >= SLOW_MS:
+        reason = 'slow'
+    elif trace.sampled:
+        reason = 'sampled'
+    else:
+        return False
+
+    from datetime import datetime, timezone
+
+    with trace._lock:
+        stages_ms = {stage: round(ms, 3) for stage, ms in trace.stages_ms.items()}
+        fields = dict(trace.fields)
+    record = {
+        'ts': datetime.now(timezone.utc).isoformat(timespec='milliseconds'),
+        'event': 'prediction',
+        'request_id': trace.request_id,
+        'content_hash': trace.content_digests(image, texts)['content'] if image is not None else None,
+        'log_reason': reason,
+        'duration_ms': round(duration_ms, 3),
+        'stages_ms': stages_ms,
+        'payload_bytes': fields.get('payload_bytes'),
+        'payload_wire_bytes': fields.get('payload_wire_bytes'),
+        'request_encoding': fields.get('request_encoding'),
+        'response_bytes': fields.get('response_bytes'),
+        'response_encoding': fields.get('response_encoding'),
+        'http_status': fields.get('http_status'),
+        'fallback_reason': fallback_reason,
+        'cascade_tier': result.get('cascade_tier'),
+        'source': result.get('source'),
+        'success': bool(result.get('success')),
+        'predicted_category': result.get('predicted_category'),
+        'confidence': result.get('confidence'),
+        'error': result.get('error')
+    }
+    get_trace_logger().info(json.dumps(record, ensure_ascii=False))
+    return True
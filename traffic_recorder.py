@@ -0,0 +1,164 @@
+"""
+Enregistrement anonymisé du trafic de prédiction (rejouable avec replay_traffic.py)
+Une ligne JSON compacte par requête : instant d'arrivée et écart avec la précédente, dimensions de l'image,
+longueur des champs texte, tailles des corps, empreintes salées du contenu, réponse et latences — jamais le contenu lui-même
+"""
+
+import os
+import json
+import time
+import threading
+from typing import Dict, Any, Optional
+
+# Fichier d'enregistrement (vide = enregistrement désactivé)
+RECORD_FILE = os.getenv('TRAFFIC_RECORD_FILE', '')
+
+# Sel des empreintes : fixe pour relier plusieurs enregistrements entre eux, aléatoire par processus sinon
+RECORD_SALT = os.getenv('TRAFFIC_RECORD_SALT', '')
+
+FORMAT_VERSION = 1
+
+
+class TrafficRecorder:
+    """
+    Journal d'empreintes des requêtes, partagé par les threads d'un client
+    """
+
+    def __init__(self, path: str, salt: str = RECORD_SALT):
+        """
+        Args:
+            path (str): Fichier JSONL (ajout en fin de fichier)
+            salt (str): Sel des empreintes du contenu
+        """
+        self.path = path
+        self._key = salt.encode('utf-8')[:64] if salt else os.urandom(16)
+        self._lock = threading.Lock()
+        self._last_arrival: Optional[float] = None
+        self._file = None
+        self.records = 0
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self._file = open(self.path, 'a', encoding='utf-8')
+        self._file.write(json.dumps({
+            'header': {'v': FORMAT_VERSION, 'started': round(time.time(), 3), 'pid': os.getpid()}
+        }, separators=(',', ':')) + "\n")
+        import atexit
+        atexit.register(self.close)
+
+    def _hash(self, *chunks: bytes) -> str:
+        import hashlib
+
+        digest = hashlib.blake2b(digest_size=8, key=self._key)
+        for chunk in chunks:
+            digest.update(chunk)
+            digest.update(b'\x00')
+        return digest.hexdigest()
+
+    def arrival(self) -> Dict[str, float]:
+        """
+        Noter l'arrivée d'une requête (à appeler au début de la prédiction)
+
+        Returns:
+            Dict[str, float]: Instant d'arrivée et écart avec l'arrivée précédente (ms)
+        """
+        now = time.time()
+        with self._lock:
+            previous, self._last_arrival = self._last_arrival, now
+        return {'t': now, 'dt': (now - previous) * 1000 if previous is not None else None}
+
+    def record(self, arrival: Dict[str, float], trace, result: Dict[str, Any], image, texts: tuple):
+        """
+        Ajouter l'empreinte d'une requête terminée
+
+        Args:
+            arrival (Dict[str, float]): Retour de arrival()
+            trace (PredictionTrace): Trace de la prédiction (durées des étapes, tailles et statut HTTP)
+            result (Dict[str, Any]): Résultat renvoyé à l'appelant
+            image (Image.Image): Image soumise (seules ses dimensions et une empreinte salée sont gardées)
+            texts (tuple): Marque, nom, description et spécifications (longueurs et empreinte salée)
+        """
+        # Empreintes de la trace (image prétraitée, calculées une fois par requête), salées ici
+        digests = trace.content_digests(image, texts)
+        try:
+            image_size = list(image.size)
+            image_hash = self._hash(digests['image'].encode('ascii'))
+        except Exception:
+            image_size, image_hash = None, None
+        texts = [text or '' for text in texts]
+        with trace._lock:
+            fields = dict(trace.fields)
+            stages_ms = dict(trace.stages_ms)
+        entry = {
+            't': round(arrival['t'], 3),
+            'dt': round(arrival['dt'], 1) if arrival['dt'] is not None else None,
+            'img': image_size,
+            'ih': image_hash,
+            'tl': [len(text) for text in texts],
+            'th': self._hash(digests['text'].encode('ascii')),
+            'pb': fields.get('payload_bytes'),
+            'pw': fields.get('payload_wire_bytes'),
+            'rb': fields.get('response_bytes'),
+            'http': fields.get('http_status'),
+            'ok': bool(result.get('success')),
+            'src': result.get('source'),
+            'tier': result.get('cascade_tier'),
+            'cat': result.get('predicted_category'),
+            'conf': round(result['confidence'], 4) if isinstance(result.get('confidence'), float) else None,
+            'lat': round(stages_ms['total'], 2) if 'total' in stages_ms else None,
+            'st': {stage: round(ms, 2) for stage, ms in stages_ms.items()}
+        }
+        line = json.dumps(entry, separators=(',', ':'), ensure_ascii=False) + "\n"
+        with self._lock:
+            try:
+                if self._file is None:
+                    self._open()
+                self._file.write(line)
+                self.records += 1
+                # Écriture tamponnée : vidage périodique (et à la sortie du processus)
+                if self.records % 20 == 0:
+                    self._file.flush()
+            except OSError as e:
+                print(f"⚠️ Enregistrement du trafic impossible ({self.path}): {str(e)}")
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def create_traffic_recorder() -> Optional[TrafficRecorder]:
+    """
+    Enregistreur configuré par TRAFFIC_RECORD_FILE
+
+    Returns:
+        TrafficRecorder: Enregistreur, ou None si l'enregistrement est désactivé
+    """
+    if not RECORD_FILE:
+        return None
+    print(f"📼 Enregistrement anonymisé du trafic dans {RECORD_FILE}")
+    return TrafficRecorder(RECORD_FILE)
+
+
+def load_traffic(path: str) -> list:
+    """
+    Relire un enregistrement (plusieurs processus possibles), trié par instant d'arrivée
+
+    Args:
+        path (str): Fichier JSONL
+
+    Returns:
+        list: Entrées des requêtes (les en-têtes et lignes tronquées sont ignorés)
+    """
+    entries = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if 'header' not in entry:
+                entries.append(entry)
+    entries.sort(key=lambda entry: entry['t'])
+    return entries